@@ -0,0 +1,31 @@
+import os
+
+from celery import Celery
+
+# Seconds between checks for new jobs with the filesystem transport
+FILESYSTEM_POLLING_INTERVAL = 0.05
+
+# The Celery app is configured here, apart from the tasks in `worker`, so the
+# webservice can dispatch jobs by name without importing the ASR engines
+celery = Celery("app.worker")
+celery.conf.broker_connection_retry_on_startup = True
+celery.conf.broker_url = os.environ.get("CELERY_BROKER_URL", "sqla+sqlite:///celery.sqlite")
+celery.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "db+sqlite:///results.sqlite")
+celery.conf.worker_hijack_root_logger = False
+celery.conf.worker_redirect_stdouts_level = "DEBUG"
+
+# The filesystem transport keeps messages as files in a local directory. It
+# needs no database, and is polled often so jobs are picked up promptly.
+if celery.conf.broker_url.startswith("filesystem://"):
+    queue_directory = os.path.abspath(os.environ.get("ASR_QUEUE_DIRECTORY", "queue"))
+    celery.conf.broker_transport_options = {
+        "data_folder_in": f"{queue_directory}/messages",
+        "data_folder_out": f"{queue_directory}/messages",
+        "control_folder": f"{queue_directory}/control",
+        "polling_interval": FILESYSTEM_POLLING_INTERVAL,
+    }
+    os.makedirs(f"{queue_directory}/messages", exist_ok=True)
+    os.makedirs(f"{queue_directory}/control", exist_ok=True)
+
+if celery.conf.result_backend.startswith("file://"):
+    os.makedirs(celery.conf.result_backend[len("file://"):], exist_ok=True)
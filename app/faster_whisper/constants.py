@@ -5,4 +5,5 @@ ASR_ENGINE_OPTIONS = frozenset([
     "initial_prompt",
     "vad_filter",
     "word_timestamps",
+    "batch_size",
 ])
@@ -22,76 +22,175 @@
 # SOFTWARE.
 
 import os
+from bisect import bisect_right
 from io import StringIO
-from threading import Lock
-from typing import Union, BinaryIO
+from threading import local
+from typing import BinaryIO, Callable, Union
 
+import numpy as np
 import torch
-import whisper
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import collect_chunks, get_speech_timestamps
 
+from ..util.audio import SAMPLE_RATE
+from ..util.model_cache import CPU_THREADS, WORKER_CONCURRENCY, ModelKey, model_cache
 from .utils import ResultWriter, WriteTXT, WriteSRT, WriteVTT, WriteTSV, WriteJSON
 from .constants import ASR_ENGINE_OPTIONS
 
-model_name = os.getenv("ASR_MODEL", "small")
 model_path = os.getenv("ASR_MODEL_PATH", os.path.join(os.path.expanduser("~"), ".cache", "whisper"))
 
-model_lock = Lock()
+# The model pool selected by the last call to `load_model` in each job thread
+current = local()
 
-model = None
 def load_model(next_model_name: str):
-    with model_lock:
-        global model_name, model
+    if torch.cuda.is_available():
+        key = ModelKey(next_model_name, "cuda", "float32")
+    else:
+        key = ModelKey(next_model_name, "cpu", "int8")
 
-        if model and next_model_name == model_name:
-            return model
+    # CTranslate2 runs concurrent requests on a single instance with num_workers
+    current.pool = model_cache.get(key, lambda: WhisperModel(
+        model_size_or_path=key.model_name,
+        device=key.device,
+        compute_type=key.compute_type,
+        cpu_threads=CPU_THREADS,
+        num_workers=WORKER_CONCURRENCY,
+        download_root=model_path,
+    ), shared=True)
 
-        if torch.cuda.is_available():
-            model = WhisperModel(model_size_or_path=next_model_name, device="cuda", compute_type="float32", download_root=model_path)
-        else:
-            model = WhisperModel(model_size_or_path=next_model_name, device="cpu", compute_type="int8", download_root=model_path)
+    return current.pool
 
-        model_name = next_model_name
 
-        return model
+def transcribe(audio, asr_options, output):
+    result = transcribe_result(audio, asr_options)
 
+    output_file = StringIO()
+    write_result(result, output_file, output)
+    output_file.seek(0)
 
-def transcribe(audio, asr_options, output):
+    return output_file
+
+
+def transcribe_result(audio, asr_options, on_segment: Union[Callable[[dict], None], None] = None):
     options_dict = {k: v for k, v in asr_options.items() if k in ASR_ENGINE_OPTIONS}
+    batch_size = options_dict.pop("batch_size", None)
 
-    with model_lock:
+    with current.pool.checkout() as model:
         segments = []
         text = ""
-        segment_generator, info = model.transcribe(audio, beam_size=5, **options_dict)
+        if batch_size:
+            # Batched inference decodes VAD-split speech segments in parallel.
+            # If the worker has already found the speech, VAD isn't run again.
+            if asr_options.get("speech_clips"):
+                options_dict["vad_filter"] = False
+                options_dict["clip_timestamps"] = batch_clip_timestamps(
+                    asr_options["speech_clips"], model.feature_extractor.chunk_length)
+            else:
+                options_dict["vad_filter"] = True
+            pipeline = BatchedInferencePipeline(model=model)
+            segment_generator, info = pipeline.transcribe(audio, beam_size=5, batch_size=batch_size, **options_dict)
+        else:
+            segment_generator, info = model.transcribe(audio, beam_size=5, **options_dict)
         for segment in segment_generator:
             segment_dict = segment._asdict()
             if segment.words:
                 segment_dict["words"] = [word._asdict() for word in segment.words]
             segments.append(segment_dict)
             text = text + segment.text
-        result = {
-            "language": options_dict.get("language", info.language),
-            "segments": segments,
-            "text": text
-        }
+            if on_segment:
+                on_segment(segment_dict)
 
-    output_file = StringIO()
-    write_result(result, output_file, output)
-    output_file.seek(0)
+    return {
+        "language": options_dict.get("language") or info.language,
+        "segments": segments,
+        "text": text
+    }
 
-    return output_file
 
+def batch_clip_timestamps(clips: list, max_seconds: float) -> list:
+    """Split speech clips, in seconds, into pieces short enough for the batched pipeline, in samples."""
+    timestamps = []
+    for start, end in clips:
+        while start < end:
+            piece_end = min(start + max_seconds, end)
+            timestamps.append({"start": int(start * SAMPLE_RATE), "end": int(piece_end * SAMPLE_RATE)})
+            start = piece_end
+    return timestamps
 
-def language_detection(audio):
-    # load audio and pad/trim it to fit 30 seconds
-    audio = whisper.pad_or_trim(audio)
 
-    # detect the spoken language
-    with model_lock:
-        segments, info = model.transcribe(audio, beam_size=5)
-        detected_lang_code = info.language
+def can_batch(asr_options: dict) -> bool:
+    # A batch shares one tokenizer, so the language can't be detected per clip
+    return bool(asr_options.get("language")) and not asr_options.get("batch_size")
+
+
+def transcribe_batch(audios: list, asr_options: dict) -> list:
+    """
+    Transcribe several clips of up to 30 seconds in one batched pass, as
+    `transcribe_result` would each one. Returns a result for each clip.
+    """
+    options_dict = {k: v for k, v in asr_options.items() if k in ASR_ENGINE_OPTIONS}
+    options_dict.pop("batch_size", None)
+    options_dict.pop("vad_filter", None)
+
+    # The clips are laid end to end and each decoded as one element of the batch
+    offsets = np.cumsum([0] + [len(audio) for audio in audios])
+    clip_timestamps = [{"start": int(start), "end": int(end)} for start, end in zip(offsets[:-1], offsets[1:])]
+    clip_starts = [int(start) / SAMPLE_RATE for start in offsets[:-1]]
+
+    results = [{"language": options_dict.get("language"), "segments": [], "text": ""} for _ in audios]
+
+    with current.pool.checkout() as model:
+        pipeline = BatchedInferencePipeline(model=model)
+        segment_generator, info = pipeline.transcribe(
+            np.concatenate(audios), beam_size=5, batch_size=len(audios), clip_timestamps=clip_timestamps, **options_dict)
 
-    return detected_lang_code
+        for segment in segment_generator:
+            index = bisect_right(clip_starts, segment.start + 0.001) - 1
+            offset = clip_starts[index]
+            result = results[index]
+
+            segment_dict = segment._asdict()
+            segment_dict.update(
+                id=len(result["segments"]) + 1,
+                seek=0,
+                start=segment.start - offset,
+                end=segment.end - offset,
+            )
+            if segment.words:
+                segment_dict["words"] = [
+                    dict(word._asdict(), start=word.start - offset, end=word.end - offset)
+                    for word in segment.words
+                ]
+            result["segments"].append(segment_dict)
+            result["text"] += segment.text
+
+    return results
+
+
+def language_probabilities(audio) -> list:
+    """
+    Return (language code, probability) pairs for the first 30 seconds of
+    speech in `audio`, most likely first. Only the encoder and the language
+    token step run, without decoding any text.
+    """
+    # Speech found by VAD gives a better guess than leading silence or music
+    speech_chunks = get_speech_timestamps(audio)
+    if speech_chunks:
+        audio = np.concatenate(collect_chunks(audio, speech_chunks)[0])
+    # The model can't judge a window without samples, so give it one of silence
+    if audio.size == 0:
+        audio = np.zeros(30 * SAMPLE_RATE, dtype=np.float32)
+
+    with current.pool.checkout() as model:
+        if not model.model.is_multilingual:
+            return [("en", 1.0)]
+        _, _, probabilities = model.detect_language(audio)
+
+    return probabilities
+
+
+def language_detection(audio):
+    return language_probabilities(audio)[0][0]
 
 
 def write_result(
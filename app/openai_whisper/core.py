@@ -23,42 +23,39 @@
 
 import os
 from io import StringIO
-from threading import Lock
-from typing import BinaryIO, Union
+from threading import local
+from typing import BinaryIO, Callable, Union
 
 import torch
 import whisper
 from whisper.utils import ResultWriter, WriteTXT, WriteSRT, WriteVTT, WriteTSV, WriteJSON
+
+from ..util.model_cache import CPU_THREADS, WORKER_CONCURRENCY, ModelKey, model_cache
 from .constants import ASR_ENGINE_OPTIONS
 
-model_name = os.getenv("ASR_MODEL", "small")
 model_path = os.getenv("ASR_MODEL_PATH", os.path.join(os.path.expanduser("~"), ".cache", "whisper"))
 
-model_lock = Lock()
-
-model = None
-def load_model(next_model_name: str):
-    with model_lock:
-        global model_name, model
+if CPU_THREADS:
+    torch.set_num_threads(CPU_THREADS)
 
-        if model and next_model_name == model_name:
-            return model
+# The model pool selected by the last call to `load_model` in each job thread
+current = local()
 
-        if torch.cuda.is_available():
-            model = whisper.load_model(next_model_name, download_root=model_path).cuda()
-        else:
-            model = whisper.load_model(next_model_name, download_root=model_path)
+def load_model(next_model_name: str):
+    if torch.cuda.is_available():
+        key = ModelKey(next_model_name, "cuda", "float32")
+    else:
+        key = ModelKey(next_model_name, "cpu", "float32")
 
-        model_name = next_model_name
+    current.pool = model_cache.get(key, lambda: whisper.load_model(
+        key.model_name, device=key.device, download_root=model_path
+    ), replicas=WORKER_CONCURRENCY)
 
-        return model
+    return current.pool
 
 
 def transcribe(audio, asr_options, output):
-    options_dict = {k: v for k, v in asr_options.items() if k in ASR_ENGINE_OPTIONS}
-
-    with model_lock:
-        result = model.transcribe(audio, **options_dict)
+    result = transcribe_result(audio, asr_options)
 
     output_file = StringIO()
     write_result(result, output_file, output)
@@ -67,19 +64,90 @@ def transcribe(audio, asr_options, output):
     return output_file
 
 
-def language_detection(audio):
-    # load audio and pad/trim it to fit 30 seconds
-    audio = whisper.pad_or_trim(audio)
+def transcribe_result(audio, asr_options, on_segment: Union[Callable[[dict], None], None] = None):
+    options_dict = {k: v for k, v in asr_options.items() if k in ASR_ENGINE_OPTIONS}
+
+    with current.pool.checkout() as model:
+        result = model.transcribe(audio, **options_dict)
 
-    # make log-Mel spectrogram and move to the same device as the model
-    mel = whisper.log_mel_spectrogram(audio).to(model.device)
+    # whisper's transcribe only returns segments once it has finished
+    if on_segment:
+        for segment in result["segments"]:
+            on_segment(segment)
+
+    return result
+
+
+def can_batch(asr_options: dict) -> bool:
+    # Batched decoding gives one segment per clip, without word timings,
+    # and shares one language between the clips
+    return bool(asr_options.get("language")) and not asr_options.get("word_timestamps")
+
+
+def transcribe_batch(audios: list, asr_options: dict) -> list:
+    """
+    Transcribe several clips of up to 30 seconds in one batched decoder
+    pass. Returns a result for each clip, with one segment per clip.
+    """
+    language = asr_options.get("language")
+
+    with current.pool.checkout() as model:
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), model.dims.n_mels)
+            for audio in audios
+        ]).to(model.device)
+        options = whisper.DecodingOptions(
+            task=asr_options.get("task") or "transcribe",
+            language=language,
+            prompt=asr_options.get("initial_prompt"),
+            without_timestamps=True,
+            fp16=model.device.type == "cuda",
+        )
+        decoded = whisper.decode(model, mel, options)
+
+    results = []
+    for audio, result in zip(audios, decoded):
+        segments = []
+        # Skip clips that are likely silent, as whisper's transcribe does
+        if result.text.strip() and not (result.no_speech_prob > 0.6 and result.avg_logprob < -1.0):
+            segments.append({
+                "id": 0,
+                "seek": 0,
+                "start": 0.0,
+                "end": len(audio) / whisper.audio.SAMPLE_RATE,
+                "text": result.text,
+                "tokens": result.tokens,
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            })
+        results.append({
+            "language": language,
+            "segments": segments,
+            "text": "".join(segment["text"] for segment in segments),
+        })
+
+    return results
+
+
+def language_probabilities(audio) -> list:
+    """
+    Return (language code, probability) pairs for the first 30 seconds of
+    `audio`, most likely first.
+    """
+    audio = whisper.pad_or_trim(audio)
 
-    # detect the spoken language
-    with model_lock:
+    with current.pool.checkout() as model:
+        # make log-Mel spectrogram and move to the same device as the model
+        mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels).to(model.device)
         _, probs = model.detect_language(mel)
-    detected_lang_code = max(probs, key=probs.get)
 
-    return detected_lang_code
+    return sorted(probs.items(), key=lambda item: item[1], reverse=True)
+
+
+def language_detection(audio):
+    return language_probabilities(audio)[0][0]
 
 
 def write_result(
@@ -3,20 +3,33 @@
 import argparse
 import os
 import signal
+import socket
 import subprocess
 import sys
 import time
 
 argmap = {
+    '--mode': {
+        'default': os.getenv('ASR_MODE', 'all'),
+        'choices': ['all', 'api', 'worker'],
+        'help': 'Processes to start: the API and a worker, or only one of them for multi-node deployments (default: %(default)s)' },
+    '--worker-name': {
+        'default': os.getenv('ASR_WORKER_NAME') or socket.gethostname(),
+        'help': 'Name of this worker node, unique among nodes sharing a queue (default: %(default)s)' },
     '--port': {
         'default': os.getenv('PORT', '9000'),
         'help': 'Port to listen on (default: %(default)s)' },
+    '--queue': {
+        'default': os.getenv('ASR_QUEUE', 'sqlite'),
+        'choices': ['sqlite', 'filesystem'],
+        'help': 'Job queue to use when no Celery URLs are given. The filesystem queue picks up jobs faster on a single node (default: %(default)s)' },
+    '--queue-directory': {
+        'default': os.getenv('ASR_QUEUE_DIRECTORY', 'queue'),
+        'help': 'Directory for the filesystem queue; a tmpfs such as /dev/shm avoids disk writes (default: %(default)s)' },
     '--celery-broker-url': {
-        'default': 'sqla+sqlite:///celery.sqlite',
-        'help': 'Celery broker URL (default: %(default)s)' },
+        'help': 'Celery broker URL (default: set by --queue)' },
     '--celery-result-backend-url': {
-        'default': 'db+sqlite:///results.sqlite',
-        'help': 'Celery result backend URL (default: %(default)s)' },
+        'help': 'Celery result backend URL (default: set by --queue)' },
     '--output-directory': {
         'default': 'app/output',
         'help': 'Output directory (default: %(default)s)' },
@@ -32,6 +45,45 @@ argmap = {
     '--asr-model': {
         'default': os.getenv('ASR_MODEL', 'small'),
         'help': 'ASR model to use (default: %(default)s)' },
+    '--model-cache-mb': {
+        'default': os.getenv('ASR_MODEL_CACHE_MB', '0'),
+        'help': 'Memory budget in MB for keeping multiple models loaded; 0 keeps only the last used model (default: %(default)s)' },
+    '--worker-concurrency': {
+        'default': os.getenv('ASR_WORKER_CONCURRENCY', '1'),
+        'help': 'Number of jobs the worker runs in parallel, each with its own model replica (default: %(default)s)' },
+    '--cpu-threads': {
+        'default': os.getenv('ASR_CPU_THREADS', '0'),
+        'help': 'CPU threads per model replica; 0 lets the ASR engine decide (default: %(default)s)' },
+    '--parallel-chunks': {
+        'default': os.getenv('ASR_PARALLEL_CHUNKS', '0'),
+        'help': 'Split long files at silences and transcribe the chunks in this many processes; 0 disables (default: %(default)s)' },
+    '--chunk-seconds': {
+        'default': os.getenv('ASR_CHUNK_SECONDS', '300'),
+        'help': 'Approximate chunk length in seconds for --parallel-chunks (default: %(default)s)' },
+    '--micro-batch-size': {
+        'default': os.getenv('ASR_MICRO_BATCH_SIZE', '0'),
+        'help': 'Transcribe short clips from concurrent jobs together in batches of up to this many; 0 disables (default: %(default)s)' },
+    '--micro-batch-wait-ms': {
+        'default': os.getenv('ASR_MICRO_BATCH_WAIT_MS', '50'),
+        'help': 'Milliseconds a short clip waits for others to batch with (default: %(default)s)' },
+    '--result-cache-path': {
+        'default': os.getenv('ASR_RESULT_CACHE_PATH', os.path.join(os.getcwd(), 'cache', 'result_cache.sqlite')),
+        'help': 'SQLite file for cached transcription results (default: %(default)s)' },
+    '--result-cache-mb': {
+        'default': os.getenv('ASR_RESULT_CACHE_MB', '0'),
+        'help': 'Size limit in MB for cached transcription results; 0 disables the cache (default: %(default)s)' },
+    '--media-directory': {
+        'default': os.getenv('ASR_MEDIA_DIRECTORY', os.path.join(os.getcwd(), 'media')),
+        'help': 'Directory for uploaded media kept for reuse (default: %(default)s)' },
+    '--media-cache-mb': {
+        'default': os.getenv('ASR_MEDIA_CACHE_MB', '0'),
+        'help': 'Size limit in MB for uploaded media kept for reuse; 0 disables reuse (default: %(default)s)' },
+    '--preload-models': {
+        'default': os.getenv('ASR_PRELOAD_MODELS', ''),
+        'help': 'Comma-separated models to load, warm up and keep in memory before taking jobs, e.g. small,large-v3' },
+    '--state-directory': {
+        'default': os.getenv('ASR_STATE_DIRECTORY', os.path.join(os.getcwd(), 'state')),
+        'help': 'Directory where worker nodes report their state; must be shared by all nodes (default: %(default)s)' },
     '--build-reascripts': {
         'const': 'publish5.4',
         'nargs': '?',
@@ -47,13 +99,35 @@ for arg, kwargs in argmap.items():
 
 args = parser.parse_args()
 
-os.environ['CELERY_BROKER_URL'] = args.celery_broker_url
-os.environ['CELERY_RESULT_BACKEND'] = args.celery_result_backend_url
+queue_directory = os.path.abspath(args.queue_directory)
+queue_urls = {
+    'sqlite': ('sqla+sqlite:///celery.sqlite', 'db+sqlite:///results.sqlite'),
+    'filesystem': ('filesystem://', f'file://{queue_directory}/results'),
+}
+default_broker_url, default_result_backend_url = queue_urls[args.queue]
+
+os.environ['CELERY_BROKER_URL'] = args.celery_broker_url or default_broker_url
+os.environ['CELERY_RESULT_BACKEND'] = args.celery_result_backend_url or default_result_backend_url
+os.environ['ASR_QUEUE_DIRECTORY'] = queue_directory
 os.environ['OUTPUT_DIRECTORY'] = args.output_directory
 os.environ['OUTPUT_URL_PREFIX'] = args.output_url_prefix
 os.environ['FFMPEG_BIN'] = args.ffmpeg_bin
 os.environ['ASR_ENGINE'] = args.asr_engine
 os.environ['ASR_MODEL'] = args.asr_model
+os.environ['ASR_MODEL_CACHE_MB'] = args.model_cache_mb
+os.environ['ASR_WORKER_CONCURRENCY'] = args.worker_concurrency
+os.environ['ASR_CPU_THREADS'] = args.cpu_threads
+os.environ['ASR_PARALLEL_CHUNKS'] = args.parallel_chunks
+os.environ['ASR_CHUNK_SECONDS'] = args.chunk_seconds
+os.environ['ASR_MICRO_BATCH_SIZE'] = args.micro_batch_size
+os.environ['ASR_MICRO_BATCH_WAIT_MS'] = args.micro_batch_wait_ms
+os.environ['ASR_RESULT_CACHE_PATH'] = args.result_cache_path
+os.environ['ASR_RESULT_CACHE_MB'] = args.result_cache_mb
+os.environ['ASR_MEDIA_DIRECTORY'] = args.media_directory
+os.environ['ASR_MEDIA_CACHE_MB'] = args.media_cache_mb
+os.environ['ASR_PRELOAD_MODELS'] = args.preload_models
+os.environ['ASR_STATE_DIRECTORY'] = args.state_directory
+os.environ['ASR_WORKER_NAME'] = args.worker_name
 
 if args.build_reascripts:
     print('Building ReaScripts...', file=sys.stderr)
@@ -78,27 +152,36 @@ signal.signal(signal.SIGTERM, signal_handler)
 processes = {}
 
 # Start Celery
-print('Starting worker...', file=sys.stderr)
-processes['celery'] = \
-    subprocess.Popen([
-        'celery',
-        '-A', 'app.worker.celery',
-        'worker',
-        '--pool=solo',
-        '--loglevel=info'
-    ], start_new_session=True)
+# Concurrent jobs run in threads so they share the worker's model cache
+if int(args.worker_concurrency) > 1:
+    celery_pool_args = ['--pool=threads', f'--concurrency={args.worker_concurrency}']
+else:
+    celery_pool_args = ['--pool=solo']
+
+if args.mode in ('all', 'worker'):
+    print('Starting worker...', file=sys.stderr)
+    processes['celery'] = \
+        subprocess.Popen([
+            'celery',
+            '-A', 'app.worker.celery',
+            'worker',
+            '-n', f'{args.worker_name}@%h',
+            *celery_pool_args,
+            '--loglevel=info'
+        ], start_new_session=True)
 
 # Start Gunicorn
-print('Starting application...', file=sys.stderr)
-processes['gunicorn'] = \
-    subprocess.Popen([
-        'gunicorn',
-        '--bind', f"0.0.0.0:{args.port}",
-        '--workers', '1',
-        '--timeout', '0',
-        'app.webservice:app',
-        '-k', 'uvicorn.workers.UvicornWorker'
-    ], start_new_session=True)
+if args.mode in ('all', 'api'):
+    print('Starting application...', file=sys.stderr)
+    processes['gunicorn'] = \
+        subprocess.Popen([
+            'gunicorn',
+            '--bind', f"0.0.0.0:{args.port}",
+            '--workers', '1',
+            '--timeout', '0',
+            'app.webservice:app',
+            '-k', 'uvicorn.workers.UvicornWorker'
+        ], start_new_session=True)
 
 exitcode = 0
 process_name = '<unknown>'
@@ -1,14 +1,16 @@
 from fastapi.responses import JSONResponse
 
 class APIError(Exception):
-    def __init__(self, error):
+    def __init__(self, error, status_code=500, headers=None):
         self.error = error
+        self.status_code = status_code
+        self.headers = headers
 
     def to_response(self):
-        return error_response(self.error)
+        return error_response(self.error, self.status_code, self.headers)
 
 def error_dict(error):
     return {"error": str(error)}
 
-def error_response(error):
-    return JSONResponse(status_code=500, content=error_dict(error))
+def error_response(error, status_code=500, headers=None):
+    return JSONResponse(status_code=status_code, content=error_dict(error), headers=headers)
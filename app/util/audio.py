@@ -21,8 +21,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from typing import BinaryIO, Union
+from threading import Thread
+from typing import BinaryIO, Iterator, Union
 import os
+import shutil
 
 import ffmpeg
 import numpy as np
@@ -30,11 +32,24 @@ import numpy as np
 SAMPLE_RATE = 16000
 
 FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", os.path.join(os.path.dirname(FFMPEG_BIN), "ffprobe"))
 
-def load_audio(file: Union[BinaryIO, str], encode=True, sr: int = SAMPLE_RATE):
+# Bytes of PCM read from ffmpeg at a time
+BLOCK_SIZE = 1024 * 1024
+
+# Length of the windows yielded by `stream_audio`
+WINDOW_SECONDS = 30
+
+# Buffer length to start with when the input duration can't be probed
+DEFAULT_BUFFER_SECONDS = 60
+
+def load_audio(file: Union[BinaryIO, str], encode=True, sr: int = SAMPLE_RATE,
+               start: float = 0, duration: Union[float, None] = None):
     """
     Open an audio file object or file path and read as mono waveform, resampling as necessary.
     Modified from https://github.com/openai/whisper/blob/main/whisper/audio.py to accept a file object or file path.
+    PCM is read in blocks and converted in place into a single float32 buffer. Raw PCM files are
+    memory-mapped rather than read into memory.
     Parameters
     ----------
     file: Union[BinaryIO, str]
@@ -43,34 +58,183 @@ def load_audio(file: Union[BinaryIO, str], encode=True, sr: int = SAMPLE_RATE):
         If true, encode audio stream to WAV before sending to whisper
     sr: int
         The sample rate to resample the audio if necessary
+    start: float
+        Seconds into the audio to start reading from
+    duration: Union[float, None]
+        Most seconds of audio to read, or None to read to the end. Only this
+        range is decoded, so reading part of a long file takes constant time.
     Returns
     -------
     A NumPy array containing the audio waveform, in float32 dtype.
     """
-    is_path = isinstance(file, str)
+    samples = _estimate_samples(file, encode, sr)
+    if duration is not None:
+        samples = min(samples, int(duration * sr))
+    audio = np.empty(samples, np.float32)
+    length = 0
+    for block in _pcm_blocks(file, encode, sr, start, duration):
+        if length + len(block) > len(audio):
+            # Grows in place where the allocator allows it
+            audio.resize(max(int(len(audio) * 1.5), length + len(block)), refcheck=False)
+        _convert(block, audio[length:length + len(block)])
+        length += len(block)
+    audio.resize(length, refcheck=False)
+    return audio
+
+def stream_audio(file: Union[BinaryIO, str], encode=True, sr: int = SAMPLE_RATE,
+                 window_seconds: float = WINDOW_SECONDS,
+                 start: float = 0, duration: Union[float, None] = None) -> Iterator[np.ndarray]:
+    """
+    Like `load_audio`, but yield the waveform as consecutive float32 windows of
+    `window_seconds` (the last one may be shorter), so the whole file never has
+    to be held in memory. Closing the generator early stops decoding.
+    `start` and `duration` select a range of the audio as for `load_audio`.
+    """
+    window = np.empty(int(window_seconds * sr), np.float32)
+    length = 0
+    for block in _pcm_blocks(file, encode, sr, start, duration):
+        while len(block):
+            count = min(len(block), len(window) - length)
+            _convert(block[:count], window[length:length + count])
+            length += count
+            block = block[count:]
+            if length == len(window):
+                yield window
+                window = np.empty_like(window)
+                length = 0
+    if length:
+        yield window[:length]
+
+def _convert(pcm: np.ndarray, out: np.ndarray):
+    # 1 / 32768 is a power of two, so this matches dividing exactly
+    np.multiply(pcm, np.float32(1 / 32768), out=out)
+
+def _estimate_samples(file: Union[BinaryIO, str], encode: bool, sr: int) -> int:
+    if isinstance(file, str):
+        if not encode:
+            return os.path.getsize(file) // 2
+        if shutil.which(FFPROBE_BIN):
+            try:
+                duration = float(ffmpeg.probe(file, cmd=FFPROBE_BIN)["format"]["duration"])
+                return int((duration + 1) * sr)
+            except (ffmpeg.Error, KeyError, ValueError):
+                pass
+    return DEFAULT_BUFFER_SECONDS * sr
+
+def _pcm_blocks(file: Union[BinaryIO, str], encode: bool, sr: int,
+                start: float = 0, duration: Union[float, None] = None) -> Iterator[np.ndarray]:
+    """
+    Yield the mono s16le PCM of `file` as int16 array blocks, from `start`
+    seconds for at most `duration` seconds. Blocks may be views of a reused
+    buffer, valid only until the next block is read.
+    """
     if encode:
-        input_source = file if is_path else "pipe:"
-        pipe_input = None if is_path else file.read()
-        try:
-            # This launches a subprocess to decode audio while down-mixing and resampling as necessary.
-            # Requires the ffmpeg CLI and `ffmpeg-python` package to be installed.
-            out, _ = (
-                ffmpeg.input(input_source, threads=0)
-                .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=sr)
-                .run(cmd=FFMPEG_BIN, capture_stdout=True, capture_stderr=True, input=pipe_input)
-            )
-        except ffmpeg.Error as e:
-            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
-    elif is_path:
-        with open(file, 'rb') as f:
-            out = f.read()
-    else:
-        out = file.read()
+        # ffmpeg seeks in the input and stops after the duration
+        return _decode_blocks(file, sr, start, duration)
+
+    blocks = _mapped_blocks(file) if isinstance(file, str) else _read_blocks(file)
+    if start or duration is not None:
+        blocks = _slice_blocks(blocks, int(start * sr), None if duration is None else int(duration * sr))
+    return blocks
 
+def _slice_blocks(blocks: Iterator[np.ndarray], skip: int, count: Union[int, None]) -> Iterator[np.ndarray]:
+    """Skip `skip` samples of `blocks`, then yield at most `count` samples."""
+    for block in blocks:
+        if skip >= len(block):
+            skip -= len(block)
+            continue
+        block = block[skip:]
+        skip = 0
+
+        if count is not None:
+            block = block[:count]
+            count -= len(block)
+        if len(block):
+            yield block
+        if count == 0:
+            return
+
+def _mapped_blocks(path: str) -> Iterator[np.ndarray]:
+    # The page cache backs the mapping, so raw uploads are never copied
+    # into process memory as a whole; a trailing odd byte is ignored
+    samples = os.path.getsize(path) // 2
+    if not samples:
+        return
+    pcm = np.memmap(path, np.int16, mode="r", shape=(samples,))
+    step = BLOCK_SIZE // 2
+    for start in range(0, samples, step):
+        yield pcm[start:start + step]
+
+def _decode_blocks(file: Union[BinaryIO, str], sr: int,
+                   start: float = 0, duration: Union[float, None] = None) -> Iterator[np.ndarray]:
+    is_path = isinstance(file, str)
+    input_source = file if is_path else "pipe:"
+
+    input_options = {"threads": 0}
+    if start:
+        input_options["ss"] = start
+    if duration is not None:
+        input_options["t"] = duration
+
+    # This launches a subprocess to decode audio while down-mixing and resampling as necessary.
+    # Requires the ffmpeg CLI and `ffmpeg-python` package to be installed.
+    process = (
+        ffmpeg.input(input_source, **input_options)
+        .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=sr)
+        .run_async(cmd=FFMPEG_BIN, pipe_stdin=not is_path, pipe_stdout=True, pipe_stderr=True)
+    )
+
+    # Feed stdin and drain stderr in the background so ffmpeg never blocks on a full pipe
+    stderr = []
+    threads = [Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)]
+    if not is_path:
+        threads.append(Thread(target=_feed, args=(file, process.stdin), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    finished = False
+    try:
+        yield from _read_blocks(process.stdout)
+        finished = True
+    finally:
+        if not finished:
+            process.kill()
+        returncode = process.wait()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+        process.stderr.close()
+
+    if returncode != 0:
+        raise RuntimeError(f"Failed to load audio: {b''.join(stderr).decode(errors='replace')}")
+
+def _read_blocks(stream: BinaryIO) -> Iterator[np.ndarray]:
+    buffer = bytearray(BLOCK_SIZE)
+    view = memoryview(buffer)
+    filled = 0
+    while True:
+        count = stream.readinto(view[filled:])
+        if count:
+            filled += count
+            if filled < len(buffer):
+                continue
+        # Keep an odd trailing byte for the next block
+        usable = filled - filled % 2
+        if usable:
+            yield np.frombuffer(buffer, np.int16, count=usable // 2)
+        if not count:
+            return
+        buffer[:filled - usable] = buffer[usable:filled]
+        filled -= usable
+
+def _feed(file: BinaryIO, stdin):
     try:
-        return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
-    except Exception as e:
-        # TODO: Unsupported file formats can raise the following exception:
-        # ValueError: buffer size must be a multiple of element size
-        # This should be made more robust.
-        raise RuntimeError("Failed to load audio") from e
+        while chunk := file.read(BLOCK_SIZE):
+            stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
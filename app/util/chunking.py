@@ -0,0 +1,83 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+# Length of the frames used to measure loudness
+FRAME_SECONDS = 0.02
+
+# Loudness is averaged over this long, so a boundary lands in a pause rather
+# than between two syllables
+SMOOTHING_SECONDS = 0.5
+
+
+def split_on_silence(audio: np.ndarray, chunk_seconds: float, sr: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    Split `audio` into chunks of about `chunk_seconds`, moving each boundary
+    to the quietest point within a quarter chunk of its target position.
+    Returns a list of (start, end) sample offsets covering the whole input.
+    """
+    chunk_samples = int(chunk_seconds * sr)
+    if len(audio) <= chunk_samples:
+        return [(0, len(audio))]
+
+    frame = int(FRAME_SECONDS * sr)
+    frame_count = len(audio) // frame
+    energy = np.square(audio[:frame_count * frame].reshape(frame_count, frame)).mean(axis=1)
+    smoothing = max(int(SMOOTHING_SECONDS / FRAME_SECONDS), 1)
+    energy = np.convolve(energy, np.ones(smoothing) / smoothing, mode="same")
+
+    search = chunk_samples // 4 // frame
+    boundaries = [0]
+    target = chunk_samples
+    while len(audio) - boundaries[-1] > chunk_samples * 1.25:
+        center = target // frame
+        low = max(center - search, boundaries[-1] // frame + 1)
+        high = min(center + search, frame_count - 1)
+        window = energy[low:high + 1]
+        # Of the quietest frames, take the one nearest the target
+        candidates = low + np.flatnonzero(window <= window.min() * 1.1 + 1e-10)
+        quietest = int(candidates[np.argmin(np.abs(candidates - center))])
+        boundaries.append(quietest * frame + frame // 2)
+        target = boundaries[-1] + chunk_samples
+    boundaries.append(len(audio))
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def shift_segment(segment: dict, offset: float) -> dict:
+    """
+    Return a copy of a segment with its timestamps shifted by `offset`
+    seconds. Timestamps shifted before the start of the audio become 0.
+    """
+    segment = dict(segment)
+    segment["start"] = max(segment["start"] + offset, 0)
+    segment["end"] = max(segment["end"] + offset, 0)
+    if "seek" in segment:
+        # seek is counted in mel frames, 100 per second
+        segment["seek"] = max(segment["seek"] + round(offset * 100), 0)
+    if segment.get("words"):
+        segment["words"] = [
+            dict(word, start=max(word["start"] + offset, 0), end=max(word["end"] + offset, 0))
+            for word in segment["words"]
+        ]
+    return segment
+
+def merge_results(results: List[dict], offsets: List[float]) -> dict:
+    """
+    Combine per-chunk transcription results into one, shifting segment and
+    word timestamps by each chunk's offset in seconds.
+    """
+    segments = []
+    for result, offset in zip(results, offsets):
+        for segment in result["segments"]:
+            segment = shift_segment(segment, offset)
+            segment["id"] = len(segments) + 1
+            segments.append(segment)
+
+    return {
+        "language": next((result["language"] for result in results if result.get("language")), None),
+        "segments": segments,
+        "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+    }
@@ -0,0 +1,83 @@
+from typing import List, Tuple, Union
+import os
+
+import numpy as np
+
+from .audio import SAMPLE_RATE, stream_audio
+
+# Frames per second of the energy envelopes compared
+ENVELOPE_RATE = 100
+
+# Lowest correlation between two envelopes for the audio to count as the same
+DUPLICATE_THRESHOLD = float(os.getenv("ASR_DEDUP_THRESHOLD", "0.95"))
+
+# Largest time offset between duplicates that is searched for
+MAX_OFFSET_SECONDS = 2.0
+
+# Duplicates must be about the same length
+MIN_LENGTH_RATIO = 0.9
+
+
+def energy_envelope(audio_file_path: str, encode: bool, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Return the loudness of an audio file over time, at `ENVELOPE_RATE`
+    frames per second, decoding it a window at a time.
+    """
+    frame = sr // ENVELOPE_RATE
+    envelopes = []
+    for window in stream_audio(audio_file_path, encode, sr):
+        frame_count = len(window) // frame
+        frames = window[:frame_count * frame].reshape(frame_count, frame)
+        envelopes.append(np.sqrt(np.square(frames).mean(axis=1)))
+    return np.concatenate(envelopes) if envelopes else np.zeros(0, dtype=np.float32)
+
+
+def envelope_similarity(a: np.ndarray, b: np.ndarray, max_offset: float = MAX_OFFSET_SECONDS) -> Tuple[float, float]:
+    """
+    Cross-correlate two envelopes. Returns their highest correlation, from
+    -1 to 1, within `max_offset` seconds, and the offset in seconds at which
+    it is found: the time of a sound in `a` less its time in `b`.
+    """
+    if not len(a) or not len(b):
+        return 0.0, 0.0
+
+    a = a - a.mean()
+    b = b - b.mean()
+    norm = np.sqrt(np.dot(a, a) * np.dot(b, b))
+    if norm == 0:
+        return 0.0, 0.0
+
+    n = len(a) + len(b)
+    correlation = np.fft.irfft(np.fft.rfft(a, n) * np.conj(np.fft.rfft(b, n)), n) / norm
+
+    # Positive lags are at the start of the result, negative ones wrap round to the end
+    max_lag = int(max_offset * ENVELOPE_RATE)
+    lags = np.concatenate([np.arange(0, min(max_lag, len(a) - 1) + 1), -np.arange(1, min(max_lag, len(b) - 1) + 1)])
+    best = lags[np.argmax(correlation[lags])]
+    return float(correlation[best]), float(best / ENVELOPE_RATE)
+
+
+def find_duplicates(envelopes: List[np.ndarray], threshold: float = DUPLICATE_THRESHOLD) -> List[Union[Tuple[int, float], None]]:
+    """
+    Group audio with matching envelopes. For each envelope, returns None if
+    it is the first of its group, or else the index of the first one and the
+    offset in seconds to add to that one's timestamps.
+    """
+    duplicates = []
+    originals = []
+    for index, envelope in enumerate(envelopes):
+        match = None
+        for original in originals:
+            lengths = sorted([len(envelope), len(envelopes[original])])
+            if not lengths[1] or lengths[0] / lengths[1] < MIN_LENGTH_RATIO:
+                continue
+            similarity, offset = envelope_similarity(envelope, envelopes[original])
+            if similarity >= threshold:
+                match = (original, offset)
+                break
+
+        if match is None:
+            originals.append(index)
+        duplicates.append(match)
+
+    return duplicates
@@ -0,0 +1,98 @@
+from typing import AsyncIterator, Callable, Union
+import asyncio
+import json
+import os
+import time
+
+EVENTS_FILENAME = "events.ndjson"
+
+# Events after which a job produces no more events
+TERMINAL_EVENTS = frozenset(["success", "failure", "revoked"])
+
+
+class JobEventLog:
+    """
+    Append-only log of a job's events, one JSON object per line, kept in the
+    job's output directory. The worker writes it as the job runs, and the
+    webservice follows it to push events to clients.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, EVENTS_FILENAME)
+        self.last_state = None
+
+    def append(self, event: str, **data):
+        if event == "progress" and data.get("state") != self.last_state:
+            self.append("state", state=data.get("state"))
+        if "state" in data:
+            self.last_state = data["state"]
+
+        line = json.dumps({"event": event, "time": time.time(), **data}, default=str)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Lines are written with a single append, so readers never see them interleaved
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+async def follow_events(
+    path: str,
+    finished_event: Callable[[], Union[dict, None]],
+    poll_interval: float = 0.25,
+    check_interval: float = 5.0,
+    timeout: Union[float, None] = None,
+) -> AsyncIterator[dict]:
+    """
+    Yield events from the log at `path` as they are written, ending after a
+    terminal event. Whenever the log has been quiet for `check_interval`
+    seconds, `finished_event` is called to find jobs that ended without
+    writing one, e.g. because they expired before a worker picked them up.
+    It returns a terminal event for such jobs, or None.
+
+    With a `timeout`, asyncio.TimeoutError is raised if the job hasn't
+    ended that many seconds after following began, e.g. because its worker
+    died, so waiting clients aren't held forever.
+    """
+    position = 0
+    partial = ""
+    quiet_since = time.monotonic()
+    deadline = None if timeout is None else quiet_since + timeout
+    final_event = None
+
+    while True:
+        lines = []
+        try:
+            with open(path, "r") as f:
+                f.seek(position)
+                data = f.read()
+                position = f.tell()
+            lines = (partial + data).split("\n")
+            partial = lines.pop()
+        except FileNotFoundError:
+            pass
+
+        for line in lines:
+            if not line:
+                continue
+            event = json.loads(line)
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+        if final_event is not None:
+            # The log was read once more after the job finished, in case
+            # its terminal event was written meanwhile
+            yield final_event
+            return
+
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            raise asyncio.TimeoutError(f"Job did not finish within {timeout:g} seconds")
+        if lines:
+            quiet_since = now
+        elif now - quiet_since >= check_interval:
+            final_event = await asyncio.to_thread(finished_event)
+            quiet_since = now
+            if final_event is not None:
+                continue
+
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,107 @@
+from threading import Lock
+from typing import Union
+import logging
+import os
+import re
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+MEDIA_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Job links and uploads left behind this long, e.g. by expired jobs, are removed
+STALE_SECONDS = 24 * 60 * 60
+
+
+class MediaStore:
+    """
+    Uploaded media stored on disk under the SHA-256 of its content, so
+    clients can refer to media the server already has instead of sending it
+    again. Jobs receive a hard link to the stored file, which they may
+    delete when done without affecting the store. Files are evicted least
+    recently used first once the total size exceeds `max_size`. A
+    `max_size` of 0 disables the store.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def path(self, media_hash: str) -> str:
+        return os.path.join(self.directory, media_hash)
+
+    def size(self, media_hash: str) -> Union[int, None]:
+        if not MEDIA_HASH_PATTERN.match(media_hash):
+            return None
+        try:
+            return os.path.getsize(self.path(media_hash))
+        except FileNotFoundError:
+            return None
+
+    def upload_path(self) -> str:
+        """Return a new temporary path in the store for an upload in progress."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix="upload-", dir=self.directory)
+        os.close(fd)
+        return path
+
+    def add(self, upload_path: str, media_hash: str):
+        """Move a completed upload into the store under its hash."""
+        with self._lock:
+            os.replace(upload_path, self.path(media_hash))
+            self._evict(keep=media_hash)
+
+    def checkout(self, media_hash: str) -> Union[str, None]:
+        """
+        Return a new path to stored media for a job to consume and delete,
+        or None if the media is not in the store.
+        """
+        with self._lock:
+            path = self.path(media_hash)
+            if self.size(media_hash) is None:
+                return None
+            # Mark as recently used
+            os.utime(path)
+
+            fd, job_path = tempfile.mkstemp(prefix="job-", dir=self.directory)
+            os.close(fd)
+            os.remove(job_path)
+            os.link(path, job_path)
+            return job_path
+
+    def _evict(self, keep: str):
+        entries = []
+        total = 0
+        stale = time.time() - STALE_SECONDS
+        for entry in os.scandir(self.directory):
+            stat = entry.stat()
+            if not MEDIA_HASH_PATTERN.match(entry.name):
+                if stat.st_mtime < stale:
+                    os.remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+            total += stat.st_size
+
+        for _, name, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            if name == keep:
+                continue
+            # Jobs holding a hard link keep their copy until they finish
+            os.remove(self.path(name))
+            total -= size
+            logger.info(f"Evicted media {name}")
+
+
+media_store = MediaStore(
+    os.getenv("ASR_MEDIA_DIRECTORY", os.path.join(os.getcwd(), "media")),
+    int(os.getenv("ASR_MEDIA_CACHE_MB", "0")) * MEGABYTE,
+)
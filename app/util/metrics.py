@@ -0,0 +1,126 @@
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class WorkerMetrics:
+    """
+    Totals of the jobs a worker node has run and the time spent in each of
+    their stages. Workers publish these with their heartbeats, and the
+    webservice serves them in Prometheus format, so they count from when
+    the worker started.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = buckets
+        self._jobs = {}
+        self._stages = {}
+        self._lock = Lock()
+
+    def observe_job(self, task_name: str, status: str, stages: Dict[str, dict]):
+        with self._lock:
+            key = f"{task_name}:{status}"
+            self._jobs[key] = self._jobs.get(key, 0) + 1
+
+            for name, stage in stages.items():
+                totals = self._stages.setdefault(name, {
+                    "buckets": [0] * len(self.buckets),
+                    "count": 0,
+                    "sum": 0.0,
+                    "cpu": 0.0,
+                })
+                for index, bound in enumerate(self.buckets):
+                    if stage["wall"] <= bound:
+                        totals["buckets"][index] += 1
+                totals["count"] += 1
+                totals["sum"] += stage["wall"]
+                totals["cpu"] += stage.get("cpu", 0.0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "jobs": dict(self._jobs),
+                "stages": {name: dict(totals, buckets=list(totals["buckets"])) for name, totals in self._stages.items()},
+            }
+
+
+def _labels(**labels) -> str:
+    text = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + text + "}" if text else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    # Exact for counters and byte counts, which `:g` would round to six digits
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _metric(lines: List[str], name: str, kind: str, description: str, samples: Iterable[Tuple[str, dict, float]]):
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    for suffix, labels, value in samples:
+        lines.append(f"{name}{suffix}{_labels(**labels)} {_format(value)}")
+
+
+def render_metrics(workers: List[dict], scheduler_stats: dict) -> str:
+    """Render the scheduler's queues and the state of live worker nodes in Prometheus text format."""
+    lines = []
+
+    _metric(lines, "reaspeech_queued_jobs", "gauge", "Jobs held by the webservice until a worker slot is free.", [
+        ("", {"job_class": job_class}, count) for job_class, count in scheduler_stats["queued"].items()
+    ])
+    _metric(lines, "reaspeech_queued_clients", "gauge", "Clients with jobs held by the webservice.", [
+        ("", {}, scheduler_stats["clients"]),
+    ])
+    _metric(lines, "reaspeech_workers", "gauge", "Worker nodes that have sent a recent heartbeat.", [
+        ("", {}, len(workers)),
+    ])
+    _metric(lines, "reaspeech_worker_active_jobs", "gauge", "Jobs running on each worker node.", [
+        ("", {"worker": worker["name"]}, worker["active"]) for worker in workers
+    ])
+    _metric(lines, "reaspeech_worker_capacity", "gauge", "Jobs each worker node can run at once.", [
+        ("", {"worker": worker["name"]}, worker["capacity"]) for worker in workers
+    ])
+
+    model_caches = [(worker["name"], worker["model_cache"]) for worker in workers if "model_cache" in worker]
+    _metric(lines, "reaspeech_model_cache_models", "gauge", "Models loaded on each worker node.", [
+        ("", {"worker": name}, len(stats["models"])) for name, stats in model_caches
+    ])
+    _metric(lines, "reaspeech_model_cache_memory_bytes", "gauge", "Memory used by loaded models on each worker node.", [
+        ("", {"worker": name}, stats["memory_used_mb"] * 1024 * 1024) for name, stats in model_caches
+    ])
+    for counter in ("hits", "misses", "evictions"):
+        _metric(lines, f"reaspeech_model_cache_{counter}_total", "counter", f"Model cache {counter} on each worker node.", [
+            ("", {"worker": name}, stats[counter]) for name, stats in model_caches
+        ])
+
+    worker_metrics = [(worker["name"], worker["metrics"]) for worker in workers if "metrics" in worker]
+    job_samples = []
+    for name, metrics in worker_metrics:
+        for key, count in metrics["jobs"].items():
+            task_name, status = key.rsplit(":", 1)
+            job_samples.append(("", {"worker": name, "task": task_name, "status": status}, count))
+    _metric(lines, "reaspeech_jobs_total", "counter", "Jobs finished by each worker node, by task and status.", job_samples)
+
+    stage_samples = []
+    cpu_samples = []
+    for name, metrics in worker_metrics:
+        for stage, totals in metrics["stages"].items():
+            labels = {"worker": name, "stage": stage}
+            for bound, count in zip(metrics["buckets"], totals["buckets"]):
+                stage_samples.append(("_bucket", dict(labels, le=f"{bound:g}"), count))
+            stage_samples.append(("_bucket", dict(labels, le="+Inf"), totals["count"]))
+            stage_samples.append(("_sum", labels, totals["sum"]))
+            stage_samples.append(("_count", labels, totals["count"]))
+            cpu_samples.append(("", labels, totals["cpu"]))
+    _metric(lines, "reaspeech_stage_seconds", "histogram", "Wall time of each stage of the jobs run by each worker node.", stage_samples)
+    _metric(lines, "reaspeech_stage_cpu_seconds_total", "counter", "Worker process CPU time during each stage of its jobs.", cpu_samples)
+
+    return "\n".join(lines) + "\n"
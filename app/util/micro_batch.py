@@ -0,0 +1,68 @@
+from concurrent.futures import Future
+from threading import Event, Lock
+from typing import Any, Callable, Hashable, List
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.futures = []
+        self.full = Event()
+
+
+class MicroBatcher:
+    """
+    Groups calls from concurrent jobs into batches. Calls with the same key
+    made within `max_wait` seconds of the first are passed together to
+    `run_batch(key, items)`, which returns a result for each item, in order.
+
+    The first caller for a key waits for others to join, then runs the batch
+    in its own thread; the rest wait for their results. A batch runs early
+    once it has `max_size` items.
+    """
+
+    def __init__(self, run_batch: Callable[[Hashable, List[Any]], List[Any]], max_size: int, max_wait: float):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._run_batch = run_batch
+        self._pending = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 1
+
+    def submit(self, key: Hashable, item: Any) -> Any:
+        future = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _Batch()
+
+            batch.items.append(item)
+            batch.futures.append(future)
+
+            if len(batch.items) >= self.max_size:
+                del self._pending[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+            self._run(key, batch)
+
+        return future.result()
+
+    def _run(self, key: Hashable, batch: _Batch):
+        try:
+            results = self._run_batch(key, batch.items)
+        except BaseException as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            raise
+
+        for future, result in zip(batch.futures, results):
+            future.set_result(result)
@@ -0,0 +1,268 @@
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from threading import Condition, Event, Lock, local
+from typing import Any, Callable
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+# Number of jobs the worker runs at once, and the number of model replicas
+# (or inference workers, for engines that support them) kept per model
+WORKER_CONCURRENCY = max(int(os.getenv("ASR_WORKER_CONCURRENCY", "1")), 1)
+
+# CPU threads per model replica; 0 lets the engine decide
+CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "0"))
+
+# Approximate parameter counts of the standard Whisper checkpoints, used to
+# estimate how much memory a loaded model occupies. Checked in order, so more
+# specific names must come before the names they contain.
+MODEL_PARAMETERS = [
+    ("turbo", 809_000_000),
+    ("distil-large", 756_000_000),
+    ("distil-medium", 394_000_000),
+    ("distil-small", 166_000_000),
+    ("large", 1_550_000_000),
+    ("medium", 769_000_000),
+    ("small", 244_000_000),
+    ("base", 74_000_000),
+    ("tiny", 39_000_000),
+]
+
+BYTES_PER_PARAMETER = {
+    "float32": 4,
+    "float16": 2,
+    "int8_float16": 1,
+    "int8": 1,
+    "ggml": 2,
+}
+
+ModelKey = namedtuple("ModelKey", ["model_name", "device", "compute_type"])
+
+
+def estimate_model_size(key: ModelKey) -> int:
+    """
+    Estimate the resident size in bytes of the model identified by `key`.
+    Local model paths are measured on disk; known checkpoint names are
+    estimated from their parameter count and compute type.
+    """
+    if os.path.isfile(key.model_name):
+        return os.path.getsize(key.model_name)
+    if os.path.isdir(key.model_name):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(key.model_name)
+            for name in names
+        )
+
+    bytes_per_parameter = BYTES_PER_PARAMETER.get(key.compute_type, 4)
+    for name, parameters in MODEL_PARAMETERS:
+        if name in key.model_name:
+            return parameters * bytes_per_parameter
+
+    # Unknown model: assume the worst case
+    return MODEL_PARAMETERS[0][1] * bytes_per_parameter
+
+
+class ModelPool:
+    """
+    Replicas of a single model. Exclusive pools hand each replica to one job
+    at a time, loading more replicas on demand up to `replicas`. Shared pools
+    hold one instance that handles concurrent jobs itself.
+
+    The first instance is loaded by `load`, which other jobs wanting the
+    model wait for with `wait_loaded`.
+    """
+
+    def __init__(self, key: ModelKey, loader: Callable[[], Any], replicas: int = 1, shared: bool = False):
+        self.key = key
+        self.replicas = 1 if shared else replicas
+        self.shared = shared
+        self.in_use = 0
+        # Jobs holding the pool, from getting it until they end
+        self.references = 0
+        self.pinned = False
+        self._loader = loader
+        self._idle = []
+        self._loaded = 0
+        self._condition = Condition()
+        self._ready = Event()
+        self._error = None
+
+    def load(self):
+        try:
+            self._idle.append(self._loader())
+            self._loaded = 1
+        except BaseException as e:
+            self._error = e
+            raise
+        finally:
+            self._ready.set()
+
+    def wait_loaded(self):
+        self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Failed to load model {self.key.model_name}") from self._error
+
+    @contextmanager
+    def checkout(self):
+        instance = self._acquire()
+        try:
+            yield instance
+        finally:
+            self._release(instance)
+
+    def _acquire(self):
+        with self._condition:
+            self.in_use += 1
+            if self.shared:
+                return self._idle[0]
+
+            while not self._idle:
+                if self._loaded < self.replicas:
+                    self._loaded += 1
+                    break
+                self._condition.wait()
+            else:
+                return self._idle.pop()
+
+        # Load the new replica outside the lock so other jobs can return theirs
+        logger.info(f"Loading replica {self._loaded} of model {self.key.model_name}")
+        try:
+            return self._loader()
+        except BaseException:
+            with self._condition:
+                self._loaded -= 1
+                self.in_use -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, instance):
+        with self._condition:
+            self.in_use -= 1
+            if not self.shared:
+                self._idle.append(instance)
+                self._condition.notify()
+
+
+class ModelCache:
+    """
+    Least-recently-used cache of model pools, bounded by an estimated memory
+    budget. The most recently requested model is always kept, even if it
+    alone exceeds the budget, so a budget of 0 keeps a single model. Models
+    held by a running job, or pinned, are never evicted.
+
+    Jobs run inside `job()`, which holds every model the job gets until it
+    ends. Models got outside a job are only held while they load.
+    """
+
+    def __init__(self, memory_budget: int):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._local = local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: ModelKey, loader: Callable[[], Any], replicas: int = 1, shared: bool = False) -> ModelPool:
+        # Only the bookkeeping is done under the lock, so jobs using models
+        # already loaded don't wait for another job's model to load
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                pool = self._entries[key][0]
+                pool.references += 1
+                loading = False
+            else:
+                self.misses += 1
+                # Reserve room for every replica the pool may grow to
+                size = estimate_model_size(key) * (1 if shared else replicas)
+
+                # Make room before loading, so two large models are never resident at once
+                self._evict(self.memory_budget - size)
+
+                pool = ModelPool(key, loader, replicas, shared)
+                pool.references += 1
+                self._entries[key] = (pool, size)
+                loading = True
+
+        try:
+            if loading:
+                logger.info(f"Loading model {key.model_name} ({key.device}, {key.compute_type}), ~{size // MEGABYTE} MB")
+                pool.load()
+            else:
+                pool.wait_loaded()
+        except BaseException:
+            with self._lock:
+                pool.references -= 1
+                if loading and self._entries.get(key, (None,))[0] is pool:
+                    del self._entries[key]
+            raise
+
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            held.append(pool)
+        else:
+            self._release([pool])
+        return pool
+
+    @contextmanager
+    def job(self):
+        """Hold the models got in this thread until the block ends, so they can't be evicted meanwhile."""
+        self._local.held = held = []
+        try:
+            yield
+        finally:
+            self._local.held = None
+            self._release(held)
+
+    def _release(self, pools):
+        with self._lock:
+            for pool in pools:
+                pool.references -= 1
+
+    def pin(self, key: ModelKey):
+        with self._lock:
+            self._entries[key][0].pinned = True
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def memory_used(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": [key.model_name for key in self._entries],
+                "pinned": [key.model_name for key, (pool, _) in self._entries.items() if pool.pinned],
+                "memory_used_mb": self.memory_used() // MEGABYTE,
+                "memory_budget_mb": self.memory_budget // MEGABYTE,
+            }
+
+    def _evict(self, target: int):
+        evicted = False
+        for key in list(self._entries.keys()):
+            if self.memory_used() <= max(target, 0):
+                break
+            pool, _ = self._entries[key]
+            if pool.references or pool.in_use or pool.pinned:
+                continue
+            logger.info(f"Evicting model {key.model_name} ({key.device}, {key.compute_type})")
+            del self._entries[key]
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+
+model_cache = ModelCache(int(os.getenv("ASR_MODEL_CACHE_MB", "0")) * MEGABYTE)
@@ -0,0 +1,74 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+# Files written in a profiled job's output directory: the profile, for
+# pstats or a viewer such as snakeviz, and a text summary
+PROFILE_FILENAME = "profile.prof"
+SUMMARY_FILENAME = "profile.txt"
+
+# Profiles larger than this are not written, leaving only the summary
+MAX_PROFILE_MB = float(os.getenv("ASR_PROFILE_MAX_MB", "10"))
+
+# Number of functions listed in the summary, by cumulative time
+SUMMARY_FUNCTIONS = 50
+
+
+@contextmanager
+def profiled(directory: str) -> Iterator[Dict[str, str]]:
+    """
+    Profile the code run in the block, in the current thread, with cProfile,
+    and write the profile to `directory`. Yields a dict that, after the
+    block, maps "profile" and "summary" to the names of the files written.
+    """
+    files = {}
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Only one profiler can be active at a time on newer Pythons
+        logger.warning(f"Not profiling: {e}")
+        profiler = None
+
+    try:
+        yield files
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            try:
+                files.update(write_profile(profiler, directory))
+            except Exception:
+                logger.exception(f"Failed to write profile to {directory}")
+
+
+def write_profile(profiler: cProfile.Profile, directory: str) -> Dict[str, str]:
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(SUMMARY_FUNCTIONS)
+    with open(os.path.join(directory, SUMMARY_FILENAME), "w") as f:
+        f.write(summary.getvalue())
+    files["summary"] = SUMMARY_FILENAME
+
+    # Same format as Stats.dump_stats, but the size is known before writing
+    data = marshal.dumps(stats.stats)
+    if len(data) > MAX_PROFILE_MB * MEGABYTE:
+        logger.warning(f"Profile is {len(data) / MEGABYTE:.1f} MB, more than {MAX_PROFILE_MB} MB; only writing the summary")
+    else:
+        with open(os.path.join(directory, PROFILE_FILENAME), "wb") as f:
+            f.write(data)
+        files["profile"] = PROFILE_FILENAME
+
+    logger.info(f"Wrote profile to {directory}")
+    return files
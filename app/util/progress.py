@@ -0,0 +1,106 @@
+from threading import Condition, Thread
+from typing import Callable, Union
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress reports for a job
+PROGRESS_INTERVAL = float(os.getenv("ASR_PROGRESS_INTERVAL", "1.0"))
+
+# Minimum progress, as a fraction of the total, between reports
+PROGRESS_DELTA = float(os.getenv("ASR_PROGRESS_DELTA", "0.01"))
+
+
+class ProgressReporter:
+    """
+    Coalesces progress updates from a job's inner loop. Calls only record the
+    latest progress; a background thread passes it to `report` at most every
+    `min_interval` seconds, and only once it has advanced by `min_delta` of
+    the total. `close` reports any remaining progress and stops the thread.
+    """
+
+    def __init__(
+        self,
+        report: Callable[[dict], None],
+        min_interval: float = PROGRESS_INTERVAL,
+        min_delta: float = PROGRESS_DELTA,
+    ):
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+        self._report = report
+        self._started = time.monotonic()
+        self._latest = None
+        self._reported = None
+        self._reported_at = None
+        self._closed = False
+        self._condition = Condition()
+        self._thread = Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+
+    def __call__(self, units: str, total: Union[int, float], current: Union[int, float]):
+        with self._condition:
+            self._latest = (units, total, current)
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._latest == self._reported and not self._closed:
+                    self._condition.wait()
+
+                if self._closed:
+                    if self._latest != self._reported:
+                        self._send(self._latest)
+                    return
+
+                if self._reported_at is not None:
+                    remaining = self._reported_at + self.min_interval - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                        continue
+
+                if not self._advanced(self._latest):
+                    # Wait for more progress, or for close
+                    self._condition.wait()
+                    continue
+
+                progress = self._latest
+
+            self._send(progress)
+
+    def _advanced(self, progress) -> bool:
+        if self._reported is None:
+            return True
+        units, total, current = progress
+        reported_units, reported_total, reported_current = self._reported
+        return (
+            units != reported_units
+            or total != reported_total
+            or current >= total
+            or current - reported_current >= self.min_delta * total
+        )
+
+    def _send(self, progress):
+        units, total, current = progress
+        elapsed = time.monotonic() - self._started
+        eta = elapsed * (total - current) / current if 0 < current < total else None
+        self._reported = progress
+        self._reported_at = time.monotonic()
+        try:
+            self._report({
+                "units": units,
+                "total": total,
+                "current": current,
+                "elapsed": round(elapsed, 1),
+                "eta": round(eta, 1) if eta is not None else None,
+            })
+        except Exception:
+            logger.exception("Failed to report progress")
@@ -0,0 +1,135 @@
+from contextlib import closing
+from typing import Union
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MEGABYTE = 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ResultCache:
+    """
+    Transcription results stored in SQLite, keyed by a hash of the audio
+    content, engine, model and result-affecting options. Entries are
+    compressed and evicted least-recently-used first once the total size
+    exceeds `max_size`. A `max_size` of 0 disables the cache.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(audio_hash: str, engine: str, model_name: str, options: dict) -> str:
+        normalized = {k: v for k, v in sorted(options.items()) if v is not None and v != ""}
+        identity = json.dumps([audio_hash, engine, model_name, normalized], sort_keys=True)
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def get(self, key: str) -> Union[dict, None]:
+        with self._connect() as db:
+            row = db.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(db, "misses")
+                return None
+            db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._count(db, "hits")
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: str, result: dict):
+        data = zlib.compress(json.dumps(result).encode())
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, result, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._evict(db)
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._connect() as db:
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            counts = dict(db.execute("SELECT name, value FROM stats").fetchall())
+        return {
+            "enabled": True,
+            "entries": entries,
+            "size_mb": round(size / MEGABYTE, 2),
+            "max_size_mb": self.max_size // MEGABYTE,
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "evictions": counts.get("evictions", 0),
+        }
+
+    def _evict(self, db):
+        size = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if size <= self.max_size:
+            return
+        evicted = 0
+        for key, entry_size in db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if size <= self.max_size:
+                break
+            db.execute("DELETE FROM results WHERE key = ?", (key,))
+            size -= entry_size
+            evicted += 1
+        self._count(db, "evictions", evicted)
+        logger.info(f"Evicted {evicted} cached results")
+
+    def _count(self, db, name: str, amount: int = 1):
+        db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def _connect(self):
+        if not self._initialized and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, result BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.commit()
+            self._initialized = True
+        return _Transaction(db)
+
+
+class _Transaction(closing):
+    """Commit on success, roll back on error, and always close the connection."""
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.thing.commit()
+        else:
+            self.thing.rollback()
+        return super().__exit__(exc_type, *exc_info)
+
+
+result_cache = ResultCache(
+    os.getenv("ASR_RESULT_CACHE_PATH", os.path.join(os.getcwd(), "cache", "result_cache.sqlite")),
+    int(os.getenv("ASR_RESULT_CACHE_MB", "0")) * MEGABYTE,
+)
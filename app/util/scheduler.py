@@ -0,0 +1,213 @@
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Union
+import asyncio
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Limits on jobs waiting in the webservice, overall and for each client
+MAX_QUEUED_JOBS = int(os.getenv("ASR_MAX_QUEUED_JOBS", "1000"))
+MAX_CLIENT_JOBS = int(os.getenv("ASR_MAX_CLIENT_JOBS", "200"))
+
+# Worker slots kept free of batch jobs, so short jobs needn't wait for them
+INTERACTIVE_SLOTS = int(os.getenv("ASR_INTERACTIVE_SLOTS", "1"))
+
+# Scheduling classes, highest priority first
+JOB_CLASSES = ("detect", "interactive", "batch")
+
+# Seconds between checks for free worker slots while jobs are waiting
+POLL_INTERVAL = 0.25
+
+# Seconds of dispatch history used to estimate when a full queue will drain
+RATE_WINDOW = 60.0
+DEFAULT_RETRY_AFTER = 10
+MAX_RETRY_AFTER = 300
+
+
+class QueueFull(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """
+    Holds jobs in the webservice until a worker slot is free, so that the
+    order jobs run in is decided here rather than by the Celery queue.
+
+    Jobs are dispatched by class, in the order of `JOB_CLASSES`. Within a
+    class, clients take turns, one job each, so a client with many jobs
+    queued can't hold up the others. Batch jobs are never given the last
+    `INTERACTIVE_SLOTS` free slots.
+
+    `slots` returns the number of free and total worker slots, or None when
+    the workers' capacity isn't known, in which case jobs are dispatched as
+    soon as they are submitted.
+    """
+
+    def __init__(
+        self,
+        slots: Callable[[], Union[tuple[int, int], None]],
+        max_queued: int = MAX_QUEUED_JOBS,
+        max_client_queued: int = MAX_CLIENT_JOBS,
+        interactive_slots: int = INTERACTIVE_SLOTS,
+    ):
+        self.max_queued = max_queued
+        self.max_client_queued = max_client_queued
+        self.interactive_slots = interactive_slots
+        self._slots = slots
+        self._queues = {job_class: OrderedDict() for job_class in JOB_CLASSES}
+        self._jobs = {}
+        self._cancel_callbacks = {}
+        self._client_counts = {}
+        self._dispatch_times = deque()
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def admit(self, client: str):
+        """Raise QueueFull if `client` may not queue another job now."""
+        if len(self._jobs) >= self.max_queued:
+            raise QueueFull("Too many jobs are waiting, try again later", self.retry_after(len(self._jobs)))
+
+        client_count = self._client_counts.get(client, 0)
+        if client_count >= self.max_client_queued:
+            raise QueueFull(f"Too many jobs from {client} are waiting, try again later", self.retry_after(client_count))
+
+    def submit(
+        self, job_class: str, client: str, job_id: str, send: Callable[[], None],
+        cancel: Union[Callable[[], None], None] = None
+    ):
+        """
+        Queue a job, to be dispatched by calling `send`. If the job is
+        cancelled before then, `cancel` is called to clean up after it.
+        """
+        if job_class not in self._queues:
+            raise ValueError(f"Unknown job class: {job_class}")
+
+        self._queues[job_class].setdefault(client, deque()).append((job_id, send))
+        self._jobs[job_id] = (job_class, client)
+        if cancel is not None:
+            self._cancel_callbacks[job_id] = cancel
+        self._client_counts[client] = self._client_counts.get(client, 0) + 1
+
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wake.set()
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a job that hasn't been dispatched yet. Returns whether it was queued."""
+        if job_id not in self._jobs:
+            return False
+
+        job_class, client = self._jobs[job_id]
+        jobs = self._queues[job_class][client]
+        for job in jobs:
+            if job[0] == job_id:
+                jobs.remove(job)
+                break
+        if not jobs:
+            del self._queues[job_class][client]
+
+        cancel = self._cancel_callbacks.get(job_id)
+        self._forget(job_id)
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception:
+                logger.exception(f"Failed to clean up cancelled job {job_id}")
+        return True
+
+    def is_queued(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def retry_after(self, queued: int) -> int:
+        """Estimate the seconds until `queued` jobs have been dispatched."""
+        cutoff = time.monotonic() - RATE_WINDOW
+        while self._dispatch_times and self._dispatch_times[0] < cutoff:
+            self._dispatch_times.popleft()
+
+        if not self._dispatch_times:
+            return DEFAULT_RETRY_AFTER
+
+        rate = len(self._dispatch_times) / RATE_WINDOW
+        return min(max(math.ceil(queued / rate), 1), MAX_RETRY_AFTER)
+
+    def stats(self) -> Dict[str, Union[int, dict]]:
+        return {
+            "queued": {
+                job_class: sum(len(jobs) for jobs in queues.values())
+                for job_class, queues in self._queues.items()
+            },
+            "clients": len(self._client_counts),
+        }
+
+    def _next_job(self, include_batch: bool):
+        for job_class in JOB_CLASSES:
+            if job_class == "batch" and not include_batch:
+                continue
+
+            queues = self._queues[job_class]
+            if not queues:
+                continue
+
+            # Take from the client at the front, then send it to the back
+            client, jobs = next(iter(queues.items()))
+            job = jobs.popleft()
+            if jobs:
+                queues.move_to_end(client)
+            else:
+                del queues[client]
+
+            self._forget(job[0])
+            return job
+
+        return None
+
+    def _forget(self, job_id: str):
+        _, client = self._jobs.pop(job_id)
+        self._cancel_callbacks.pop(job_id, None)
+        self._client_counts[client] -= 1
+        if not self._client_counts[client]:
+            del self._client_counts[client]
+
+    async def _run(self):
+        while True:
+            if not self._jobs:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            try:
+                await self._dispatch()
+            except Exception:
+                logger.exception("Failed to dispatch jobs")
+
+            # Not wait_for, which before Python 3.12 loses a cancellation
+            # that arrives as the event is set, so the loop never stops
+            wake = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait({wake}, timeout=POLL_INTERVAL)
+            finally:
+                wake.cancel()
+            self._wake.clear()
+
+    async def _dispatch(self):
+        slots = await asyncio.to_thread(self._slots)
+        if slots is None:
+            free, reserved = len(self._jobs), 0
+        else:
+            free, total = slots
+            reserved = min(self.interactive_slots, total - 1)
+
+        while free > 0:
+            job = self._next_job(include_batch=free > reserved)
+            if job is None:
+                break
+
+            _, send = job
+            await asyncio.to_thread(send)
+            self._dispatch_times.append(time.monotonic())
+            free -= 1
@@ -0,0 +1,52 @@
+import json
+
+# Media types of streamed output; JSON is streamed as one segment object per line
+STREAM_MEDIA_TYPES = {
+    "json": "application/x-ndjson",
+    "srt": "text/plain",
+    "vtt": "text/plain",
+    "tsv": "text/plain",
+    "txt": "text/plain",
+}
+
+
+def format_timestamp(seconds: float, always_include_hours: bool = False, decimal_marker: str = "."):
+    milliseconds = round(seconds * 1000.0)
+
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1_000)
+
+    hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+    return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def stream_header(output: str) -> str:
+    if output == "vtt":
+        return "WEBVTT\n\n"
+    elif output == "tsv":
+        return "start\tend\ttext\n"
+    return ""
+
+
+def format_segment(segment: dict, index: int, output: str) -> str:
+    """
+    Format one segment for streaming, matching the layout of the complete
+    output written by the ASR engines. `index` counts from 1.
+    """
+    text = segment["text"].strip()
+
+    if output == "json":
+        return json.dumps(segment) + "\n"
+    elif output == "srt":
+        start = format_timestamp(segment["start"], always_include_hours=True, decimal_marker=",")
+        end = format_timestamp(segment["end"], always_include_hours=True, decimal_marker=",")
+        return f"{index}\n{start} --> {end}\n{text.replace('-->', '->')}\n\n"
+    elif output == "vtt":
+        start = format_timestamp(segment["start"])
+        end = format_timestamp(segment["end"])
+        return f"{start} --> {end}\n{text.replace('-->', '->')}\n\n"
+    elif output == "tsv":
+        text = text.replace("\t", " ")
+        return f"{round(1000 * segment['start'])}\t{round(1000 * segment['end'])}\t{text}\n"
+    return text + "\n"
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator, Union
+import resource
+import time
+
+# Stages of a job, in the order they happen
+STAGES = ("queue_wait", "upload", "decode", "vad", "find_duplicates", "model_load", "inference", "write")
+
+
+def reset_peak_rss(pid: Union[int, str] = "self"):
+    """Reset a process's peak RSS, on Linux, so the peak of what follows can be read."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid: Union[int, str] = "self") -> Union[float, None]:
+    """
+    Return a process's peak RSS in megabytes, since it was last reset where
+    possible, or None if it can't be read.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == "self":
+        # ru_maxrss can't be reset, so it is the peak over the whole process
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+
+class JobTimings:
+    """
+    Wall time, CPU time and peak memory of each stage of a job. A stage that
+    runs more than once, such as for each file of a batch, adds up its times
+    and keeps its highest peak.
+
+    CPU time is for the whole worker process, so it includes the inference
+    threads of the engine, and any jobs running alongside. Peak RSS is
+    reset for each stage (`peak_rss_mb`) only with `per_stage_rss`, since
+    the reset applies to the whole process, and would spoil the readings of
+    other jobs running at the same time. Otherwise the process's peak since
+    it started is reported (`process_peak_rss_mb`). Stages measured outside
+    the worker, like the upload, have only a wall time.
+    """
+
+    def __init__(self, stages: Union[Dict[str, dict], None] = None, per_stage_rss: bool = True):
+        self.stages = {name: dict(stage) for name, stage in (stages or {}).items()}
+        self.per_stage_rss = per_stage_rss
+        self._lock = Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.per_stage_rss:
+            reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu, peak_rss_mb())
+
+    def add(self, name: str, wall: float, cpu: Union[float, None] = None, peak_mb: Union[float, None] = None):
+        rss_key = "peak_rss_mb" if self.per_stage_rss else "process_peak_rss_mb"
+        with self._lock:
+            stage = self.stages.setdefault(name, {"wall": 0.0})
+            stage["wall"] = round(stage["wall"] + wall, 4)
+            if cpu is not None:
+                stage["cpu"] = round(stage.get("cpu", 0.0) + cpu, 4)
+            if peak_mb is not None:
+                stage[rss_key] = round(max(stage.get(rss_key, 0.0), peak_mb), 1)
+
+    def as_dict(self) -> Dict[str, dict]:
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+        order = {name: index for index, name in enumerate(STAGES)}
+        return dict(sorted(stages.items(), key=lambda item: order.get(item[0], len(order))))
@@ -0,0 +1,142 @@
+from bisect import bisect_right
+from typing import List, Tuple
+import logging
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Pauses shorter than this are kept, so words aren't clipped mid-sentence
+MIN_SILENCE_SECONDS = 0.5
+
+# Speech regions are widened by this much on each side
+SPEECH_PAD_SECONDS = 0.2
+
+# Silence left between speech regions in the compacted audio
+GAP_SECONDS = 0.2
+
+# Audio is only compacted if that would remove at least this fraction of it
+MIN_REMOVED_FRACTION = 0.1
+
+# Frames used by the energy detector, and how far above the noise floor,
+# or the absolute level in dBFS, that counts as speech
+ENERGY_FRAME_SECONDS = 0.03
+ENERGY_MARGIN_DB = 15
+ENERGY_MIN_DB = -50
+
+
+def speech_regions(audio: np.ndarray, sr: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    Find the speech in `audio`, as sorted (start, end) sample offsets. Uses
+    the Silero VAD model bundled with faster_whisper when it is installed,
+    and otherwise an energy detector.
+    """
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+    except ImportError:
+        regions = energy_regions(audio, sr)
+    else:
+        options = VadOptions(
+            min_silence_duration_ms=int(MIN_SILENCE_SECONDS * 1000),
+            speech_pad_ms=int(SPEECH_PAD_SECONDS * 1000),
+        )
+        regions = [(chunk["start"], chunk["end"]) for chunk in get_speech_timestamps(audio, options, sampling_rate=sr)]
+
+    return regions
+
+
+def energy_regions(audio: np.ndarray, sr: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """Find the stretches of `audio` loud enough to be speech, as (start, end) sample offsets."""
+    frame = int(ENERGY_FRAME_SECONDS * sr)
+    frame_count = len(audio) // frame
+    if not frame_count:
+        return [(0, len(audio))] if len(audio) else []
+
+    energy = np.square(audio[:frame_count * frame].reshape(frame_count, frame)).mean(axis=1)
+    level = 10 * np.log10(energy + 1e-10)
+    threshold = max(np.percentile(level, 10) + ENERGY_MARGIN_DB, ENERGY_MIN_DB)
+    loud = np.flatnonzero(level > threshold)
+    if not len(loud):
+        return []
+
+    pad = int(SPEECH_PAD_SECONDS * sr)
+    min_silence_frames = MIN_SILENCE_SECONDS / ENERGY_FRAME_SECONDS
+    regions = []
+    region_start = previous = loud[0]
+    for index in loud[1:]:
+        if index - previous > min_silence_frames:
+            regions.append((region_start, previous))
+            region_start = index
+        previous = index
+    regions.append((region_start, previous))
+
+    return [
+        (max(int(start) * frame - pad, 0), min((int(end) + 1) * frame + pad, len(audio)))
+        for start, end in regions
+    ]
+
+
+class SpeechTimeline:
+    """
+    Maps times in audio with its silences removed back to the original.
+    Each entry gives a speech region's start in the compacted audio, its
+    start in the original and its length, all in seconds.
+    """
+
+    def __init__(self, entries: List[Tuple[float, float, float]]):
+        self.entries = entries
+        self._compact_starts = [compact_start for compact_start, _, _ in entries]
+
+    def clips(self) -> List[Tuple[float, float]]:
+        """The speech regions, as (start, end) times in the compacted audio."""
+        return [(compact_start, compact_start + length) for compact_start, _, length in self.entries if length]
+
+    def restore(self, time: float) -> float:
+        index = max(bisect_right(self._compact_starts, time) - 1, 0)
+        compact_start, original_start, _ = self.entries[index]
+        return original_start + time - compact_start
+
+    def restore_segment(self, segment: dict) -> dict:
+        """Return a copy of a segment with its timestamps, and its words', restored."""
+        segment = dict(segment)
+        start = segment["start"]
+        segment["start"] = self.restore(start)
+        segment["end"] = self.restore(segment["end"])
+        if "seek" in segment:
+            # seek is counted in mel frames, 100 per second
+            segment["seek"] += round((segment["start"] - start) * 100)
+        if segment.get("words"):
+            segment["words"] = [
+                dict(word, start=self.restore(word["start"]), end=self.restore(word["end"]))
+                for word in segment["words"]
+            ]
+        return segment
+
+
+def compact_speech(audio: np.ndarray, sr: int = SAMPLE_RATE) -> Tuple[np.ndarray, SpeechTimeline]:
+    """
+    Remove the silence between speech regions of `audio`, leaving a short
+    gap between regions. Returns the compacted audio and the timeline for
+    restoring times in it. If there is too little silence to be worth
+    removing, the audio is returned unchanged, with a timeline that only
+    records where the speech is.
+    """
+    regions = speech_regions(audio, sr)
+    speech_samples = sum(end - start for start, end in regions)
+    if speech_samples > len(audio) * (1 - MIN_REMOVED_FRACTION):
+        return audio, SpeechTimeline([(start / sr, start / sr, (end - start) / sr) for start, end in regions])
+
+    gap = int(GAP_SECONDS * sr)
+    compacted = np.zeros(speech_samples + gap * max(len(regions) - 1, 0), dtype=np.float32)
+    entries = []
+    position = 0
+    for start, end in regions:
+        compacted[position:position + end - start] = audio[start:end]
+        entries.append((position / sr, start / sr, (end - start) / sr))
+        position += end - start + gap
+
+    logger.info(f"VAD kept {speech_samples / sr:.1f}s of speech in {len(regions)} regions from {len(audio) / sr:.1f}s of audio")
+
+    return compacted, SpeechTimeline(entries or [(0.0, 0.0, 0.0)])
@@ -0,0 +1,128 @@
+from threading import Event, Thread
+from typing import Callable, Dict, List, Union
+import json
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+# Directory where workers publish their state for the webservice. With
+# several worker nodes, it must be shared by all of them and the webservice.
+STATE_DIRECTORY = os.getenv("ASR_STATE_DIRECTORY", os.path.join(os.getcwd(), "state"))
+
+# Name of this worker node, which must be unique among the nodes
+WORKER_NAME = os.getenv("ASR_WORKER_NAME") or socket.gethostname()
+
+# Seconds between heartbeats; workers silent for three intervals are ignored
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+
+# Seconds a job sent to a worker node counts against the node's load, unless
+# the node reports having started it sooner. Nodes list the jobs they started
+# over this long in their heartbeats.
+DISPATCH_TIMEOUT = 60.0
+
+
+def node_queue(worker_name: str) -> str:
+    """Name of the queue for jobs routed to one worker node."""
+    return f"node.{worker_name}"
+
+
+def state_path(worker_name: str) -> str:
+    return os.path.join(STATE_DIRECTORY, "workers", f"{worker_name}.json")
+
+
+def write_state(worker_name: str, state: dict):
+    path = state_path(worker_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename, so readers never see a partial file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(dict(state, name=worker_name, time=time.time()), f)
+    os.replace(temp_path, path)
+
+
+def remove_state(worker_name: str):
+    try:
+        os.remove(state_path(worker_name))
+    except FileNotFoundError:
+        pass
+
+
+def read_workers() -> List[dict]:
+    """Return the state of every worker node that has sent a recent heartbeat."""
+    directory = os.path.join(STATE_DIRECTORY, "workers")
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+
+    workers = []
+    cutoff = time.time() - HEARTBEAT_TIMEOUT
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        if state.get("time", 0) >= cutoff:
+            workers.append(state)
+    return workers
+
+
+def choose_worker(workers: List[dict], model_name: str, pending: Union[Dict[str, int], None] = None) -> Union[dict, None]:
+    """
+    Pick the worker node for a job needing `model_name`: the least loaded
+    node that has the model loaded and a free slot, or else the least loaded
+    node overall. `pending` counts jobs sent to each node that it hasn't
+    reported starting yet. Returns None if there are no nodes.
+    """
+    pending = pending or {}
+
+    def load(worker):
+        return (worker["active"] + pending.get(worker["name"], 0)) / max(worker["capacity"], 1)
+
+    warm = [worker for worker in workers if model_name in worker["models"] and load(worker) < 1]
+    if warm:
+        return min(warm, key=load)
+    if workers:
+        return min(workers, key=lambda worker: (load(worker), model_name not in worker["models"]))
+    return None
+
+
+class Heartbeat:
+    """
+    Publishes a worker node's state, as returned by `state`, every
+    `HEARTBEAT_INTERVAL` seconds, or sooner when `beat` is called.
+    """
+
+    def __init__(self, worker_name: str, state: Callable[[], dict]):
+        self.worker_name = worker_name
+        self._state = state
+        self._wake = Event()
+        self._stopped = False
+        self._thread = Thread(target=self._run, name="heartbeat", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def beat(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        remove_state(self.worker_name)
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                write_state(self.worker_name, self._state())
+            except Exception:
+                logger.exception("Failed to write worker heartbeat")
+            self._wake.wait(HEARTBEAT_INTERVAL)
+            self._wake.clear()
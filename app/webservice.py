@@ -22,23 +22,34 @@
 # SOFTWARE.
 
 from typing import Union, Annotated
+import asyncio
+import hashlib
+import hmac
 import importlib.metadata
+import json
 import logging
 import os
 import re
 import tempfile
+import time
+import uuid
 
-from celery.result import AsyncResult
 from fastapi import FastAPI, File, Query, Request, UploadFile, applications
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from whisper import tokenizer
 import aiofiles
 
+from .celery_app import celery
 from .util import apierror
-from .worker import transcribe, detect_language as detect_language_task
+from .util.job_events import EVENTS_FILENAME, JobEventLog, follow_events
+from .util.languages import LANGUAGE_CODES
+from .util.media_store import media_store
+from .util.metrics import render_metrics
+from .util.scheduler import JobScheduler, QueueFull
+from .util.segment_stream import STREAM_MEDIA_TYPES, format_segment, stream_header
+from .util.worker_state import DISPATCH_TIMEOUT, choose_worker, read_workers
 
 logging.basicConfig(format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s', level=logging.INFO, force=True)
 logger = logging.getLogger(__name__)
@@ -58,6 +69,9 @@ ASR_OPTIONS = frozenset([
     "vad_filter",
     "word_timestamps",
     "model_name",
+    "batch_size",
+    "start",
+    "duration",
 ])
 
 if ASR_ENGINE == "faster_whisper":
@@ -69,10 +83,18 @@ else:
 
 DEFAULT_MODEL_NAME = os.getenv("ASR_MODEL", "small")
 
-LANGUAGE_CODES = sorted(list(tokenizer.LANGUAGES.keys()))
-
 TASK_EXPIRATION_SECONDS = 30
 
+# Seconds a synchronous /asr request waits for its job, which may have been
+# lost with its worker, before giving up and leaving the client to follow it
+SYNC_JOB_TIMEOUT = float(os.getenv("ASR_SYNC_JOB_TIMEOUT", "3600"))
+
+# Most files accepted in one /asr_batch request
+MAX_BATCH_FILES = int(os.getenv("ASR_MAX_BATCH_FILES", "100"))
+
+# Token required for admin-only options, which are refused if it isn't set
+ADMIN_TOKEN = os.getenv("ASR_ADMIN_TOKEN", "")
+
 projectMetadata = importlib.metadata.metadata('reaspeech')
 docs_url = os.getenv('ENABLE_SWAGGER_UI', '')
 
@@ -110,6 +132,19 @@ if os.path.exists(assets_path + "/swagger-ui.css") and os.path.exists(assets_pat
 static_path = os.getcwd() + "/app/static"
 app.mount("/static", StaticFiles(directory=static_path), name="static")
 
+class RequestTimer:
+    """Records when each request arrived, before its body is received, for timing uploads."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["received_at"] = time.perf_counter()
+        await self.app(scope, receive, send)
+
+app.add_middleware(RequestTimer)
+
 templates_path = os.getcwd() + "/app/templates"
 templates = Jinja2Templates(directory=templates_path)
 
@@ -171,84 +206,431 @@ async def test_multiple_upload(
         }
     })
 
+async def save_upload(audio_file: UploadFile) -> tuple[str, Union[str, None]]:
+    """
+    Save an uploaded file for a job, adding it to the media store when
+    enabled. Returns the path for the job and the media hash, if stored.
+    """
+    if not media_store.enabled:
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            temp_file_path = temp_file.name
+
+        async with aiofiles.open(temp_file_path, 'wb') as out_file:
+            while content := await audio_file.read(1024 * 1024):  # Read in chunks of 1MB
+                await out_file.write(content)
+
+        return temp_file_path, None
+
+    media_hash = await store_upload(audio_file)
+    return media_store.checkout(media_hash), media_hash
+
+async def store_upload(audio_file: UploadFile) -> str:
+    upload_path = media_store.upload_path()
+    sha256 = hashlib.sha256()
+    try:
+        async with aiofiles.open(upload_path, 'wb') as out_file:
+            while content := await audio_file.read(1024 * 1024):  # Read in chunks of 1MB
+                sha256.update(content)
+                await out_file.write(content)
+    except BaseException:
+        os.remove(upload_path)
+        raise
+
+    media_hash = sha256.hexdigest()
+    media_store.add(upload_path, media_hash)
+    return media_hash
+
+async def job_media(audio_file: Union[UploadFile, None], media_hash: Union[str, None]) -> tuple[str, Union[str, None]]:
+    if audio_file is not None:
+        return await save_upload(audio_file)
+
+    if not media_hash:
+        raise apierror.APIError("Either audio_file or media_hash is required", 400)
+
+    temp_file_path = media_store.checkout(media_hash) if media_store.enabled else None
+    if temp_file_path is None:
+        raise apierror.APIError(f"Media not found: {media_hash}", 404)
+
+    return temp_file_path, media_hash
+
+@app.post("/media", tags=["Endpoints"])
+async def upload_media(audio_file: UploadFile = File(...)):
+    if not media_store.enabled:
+        raise apierror.APIError("Media store is disabled", 501)
+
+    media_hash = await store_upload(audio_file)
+    return JSONResponse({"media_hash": media_hash, "size": media_store.size(media_hash)})
+
+@app.api_route("/media/{media_hash}", methods=["GET", "HEAD"], tags=["Endpoints"])
+async def media_info(media_hash: str):
+    size = media_store.size(media_hash) if media_store.enabled else None
+    if size is None:
+        raise apierror.APIError(f"Media not found: {media_hash}", 404)
+
+    return JSONResponse({"media_hash": media_hash, "size": size})
+
 @app.post("/detect_language", tags=["Endpoints"])
 async def detect_language(
-    audio_file: UploadFile = File(...),
+    request: Request,
+    audio_file: UploadFile = File(default=None),
+    media_hash: Union[str, None] = Query(default=None, description="SHA-256 of media previously uploaded, used instead of audio_file"),
     encode: bool = Query(default=True, description="Encode audio first through ffmpeg"),
+    model_name: Union[str, None] = Query(default=None, description="Model name to use for detection"),
+    top_k: int = Query(default=5, ge=1, le=len(LANGUAGE_CODES), description="Number of most likely languages to return"),
+    profile: bool = Query(default=False, include_in_schema=False),
 ):
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file_path = temp_file.name
+    if profile:
+        require_admin(request)
+    client = admit_client(request)
+    temp_file_path, media_hash = await job_media(audio_file, media_hash)
 
-    async with aiofiles.open(temp_file_path, 'wb') as out_file:
-        while content := await audio_file.read(1024 * 1024):  # Read in chunks of 1MB
-            await out_file.write(content)
+    model_name = model_name or DEFAULT_MODEL_NAME
+    job_id = schedule_job(
+        "detect", client, "detect_language", [temp_file_path, encode, model_name, top_k], model_name, [temp_file_path],
+        timings=upload_timings(request), profile=profile, expires=TASK_EXPIRATION_SECONDS)
 
-    job = detect_language_task \
-        .si(temp_file_path, encode) \
-        .apply_async(expires=TASK_EXPIRATION_SECONDS)
+    return JSONResponse({"job_id": job_id, "media_hash": media_hash})
 
-    return JSONResponse({"job_id": job.id})
+@app.get("/ready")
+async def ready():
+    # Workers only send heartbeats once their preloaded models are warm
+    workers = read_workers()
+    if not workers:
+        return JSONResponse({"ready": False}, status_code=503)
+
+    return JSONResponse({
+        "ready": True,
+        "workers": [
+            {k: worker[k] for k in ("name", "engine", "models", "active", "capacity")}
+            for worker in workers
+        ],
+    })
 
 @app.get("/asr_info")
 async def asr_info():
     return JSONResponse({
         "engine": ASR_ENGINE,
-        "options": list(ASR_ENGINE_OPTIONS),
+        # The worker filters out silence itself, whatever the engine
+        "options": list(ASR_ENGINE_OPTIONS | {"vad_filter"}),
+        # Results are cached by the workers, which publish their cache
+        # statistics with their heartbeats
+        "result_cache": {
+            worker["name"]: worker["result_cache"]
+            for worker in read_workers() if "result_cache" in worker
+        },
+        "scheduler": scheduler.stats(),
     })
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    # Workers publish their job and model cache totals with their heartbeats
+    return PlainTextResponse(
+        render_metrics(read_workers(), scheduler.stats()),
+        media_type="text/plain; version=0.0.4")
+
 @app.post("/asr", tags=["Endpoints"])
 async def asr(
+    request: Request,
     task: Union[str, None] = Query(default="transcribe", enum=["transcribe", "translate"]),
     language: Union[str, None] = Query(default=None, enum=LANGUAGE_CODES),
     hotwords: Union[str, None] = Query(default=None),
     initial_prompt: Union[str, None] = Query(default=None),
-    audio_file: UploadFile = File(...),
+    audio_file: UploadFile = File(default=None),
+    media_hash: Union[str, None] = Query(default=None, description="SHA-256 of media previously uploaded, used instead of audio_file"),
     encode: bool = Query(default=True, description="Encode audio first through ffmpeg"),
     output: Union[str, None] = Query(default="txt", enum=["txt", "vtt", "srt", "tsv", "json"]),
-    vad_filter: Annotated[bool | None, Query(
-        description="Enable the voice activity detection (VAD) to filter out parts of the audio without speech",
-        include_in_schema=(True if ASR_ENGINE == "faster_whisper" else False)
-    )] = False,
+    vad_filter: bool = Query(default=False, description="Skip the parts of the audio without speech, found by voice activity detection (VAD)"),
     word_timestamps: bool = Query(default=False, description="Word level timestamps"),
+    batch_size: Annotated[int | None, Query(
+        ge=1,
+        description="Transcribe speech segments found by VAD in batches of this size. Faster on long files, at some cost in accuracy",
+        include_in_schema=(True if ASR_ENGINE == "faster_whisper" else False)
+    )] = None,
     model_name: Union[str, None] = Query(default=None, description="Model name to use for transcription"),
-    use_async: bool = Query(default=False, description="Use asynchronous processing")
+    start: Union[float, None] = Query(default=None, ge=0, description="Transcribe from this many seconds into the audio, e.g. for a preview"),
+    duration: Union[float, None] = Query(default=None, gt=0, description="Transcribe at most this many seconds of audio"),
+    use_async: bool = Query(default=False, description="Use asynchronous processing"),
+    stream: bool = Query(default=False, description="Send each segment as soon as it is transcribed (json output is sent as NDJSON)"),
+    priority: str = Query(default="interactive", enum=["interactive", "batch"], description="Scheduling class for asynchronous jobs; batch jobs yield to interactive ones"),
+    profile: bool = Query(default=False, include_in_schema=False),
 ):
     asr_options = {k: v for k, v in locals().items() if k in ASR_OPTIONS}
     async_str = " (async)" if use_async else ""
-    logger.info(f"Transcribing{async_str} {audio_file.filename} with {asr_options}")
-
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file_path = temp_file.name
+    filename = audio_file.filename if audio_file is not None else media_hash
+    logger.info(f"Transcribing{async_str} {filename} with {asr_options}")
 
-    async with aiofiles.open(temp_file_path, 'wb') as out_file:
-        while content := await audio_file.read(1024 * 1024):  # Read in chunks of 1MB
-            await out_file.write(content)
+    if profile:
+        require_admin(request)
+    client = admit_client(request)
+    temp_file_path, media_hash = await job_media(audio_file, media_hash)
 
-    transcriber = transcribe.si(temp_file_path, audio_file.filename, asr_options)
+    transcribe_args = [temp_file_path, filename, asr_options, media_hash]
+    job_model_name = model_name or DEFAULT_MODEL_NAME
+    timings = upload_timings(request)
 
     if use_async:
-        job = transcriber.apply_async(expires=TASK_EXPIRATION_SECONDS)
-        return JSONResponse({"job_id": job.id})
+        job_id = schedule_job(
+            priority, client, "transcribe", transcribe_args, job_model_name, [temp_file_path],
+            timings=timings, profile=profile, expires=TASK_EXPIRATION_SECONDS)
+        return JSONResponse({"job_id": job_id, "media_hash": media_hash})
+
+    # Someone is waiting on the response, so the job is always interactive
+    job_id = schedule_job(
+        "interactive", client, "transcribe", transcribe_args, job_model_name, [temp_file_path],
+        timings=timings, profile=profile)
+
+    if stream:
+        headers = {
+            'Asr-Engine': ASR_ENGINE,
+            'Job-Id': job_id,
+        }
+        if media_hash:
+            headers['Media-Hash'] = media_hash
+
+        return StreamingResponse(
+            stream_segments(job_id, output),
+            media_type=STREAM_MEDIA_TYPES.get(output, "text/plain"),
+            headers=headers)
 
     else:
-        result = transcriber.apply().get()
+        result = await wait_for_job(job_id)
 
         def reader():
             with open(result['output_path'], "r") as file:
                 yield from file
 
         filename = result['output_filename']
+        headers = {
+            'Asr-Engine': ASR_ENGINE,
+            'Content-Disposition': f'attachment; filename="{filename}"'
+        }
+        if media_hash:
+            headers['Media-Hash'] = media_hash
+
         return StreamingResponse(
             reader(),
             media_type="text/plain",
-            headers={
-                'Asr-Engine': ASR_ENGINE,
-                'Content-Disposition': f'attachment; filename="{filename}"'
-            })
+            headers=headers)
+
+def admit_client(request: Request) -> str:
+    """
+    Identify the client making a request, and reject the request with status
+    429 if the client can't queue another job. Done before reading uploads,
+    so rejected clients don't send their media for nothing.
+    """
+    client = request.headers.get("X-ReaSpeech-Client") or (request.client.host if request.client else "unknown")
+
+    try:
+        scheduler.admit(client)
+    except QueueFull as e:
+        raise apierror.APIError(str(e), 429, headers={"Retry-After": str(e.retry_after)})
+
+    return client
+
+def require_admin(request: Request):
+    """Reject a request with status 403 unless it has the admin token in the X-ReaSpeech-Admin-Token header."""
+    token = request.headers.get("X-ReaSpeech-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise apierror.APIError("This option needs the admin token", 403)
+
+def upload_timings(request: Request) -> dict:
+    """Time from the arrival of a request until its media was saved, for the job's timings."""
+    return {"upload": {"wall": round(time.perf_counter() - request.state.received_at, 4)}}
+
+def schedule_job(
+    job_class: str, client: str, task_name: str, args: list, model_name: str, input_paths: list,
+    timings: Union[dict, None] = None, profile: bool = False, **options
+) -> str:
+    """
+    Queue a job in the scheduler and return its id, which it keeps once sent
+    to Celery. The worker adds `timings`, of stages before the job was
+    queued, to its own, and with `profile`, profiles the job.
+
+    `input_paths` are the job's media files, which the worker removes when
+    it is done with them. They are removed here if the job is cancelled
+    before it is sent.
+    """
+    job_id = str(uuid.uuid4())
+    # Sent with the job, so the worker can tell how long it waited
+    headers = {"submitted_at": time.time(), "timings": timings or {}}
+    if profile:
+        headers["profile"] = True
+
+    def send():
+        try:
+            send_job(task_name, args, model_name, task_id=job_id, headers=headers, **options)
+        except Exception as e:
+            logger.exception(f"Failed to send {task_name} job {job_id}")
+            JobEventLog(os.path.join(output_directory, job_id)).append("failure", state="FAILURE", error=str(e))
+
+    def cancel():
+        for path in input_paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    scheduler.submit(job_class, client, job_id, send, cancel)
+    return job_id
+
+@app.post("/asr_batch", tags=["Endpoints"])
+async def asr_batch(
+    request: Request,
+    task: Union[str, None] = Query(default="transcribe", enum=["transcribe", "translate"]),
+    language: Union[str, None] = Query(default=None, enum=LANGUAGE_CODES),
+    hotwords: Union[str, None] = Query(default=None),
+    initial_prompt: Union[str, None] = Query(default=None),
+    audio_files: list[UploadFile] = File(default=[]),
+    media_hashes: list[str] = Query(default=[], description="SHA-256 of media previously uploaded, transcribed after audio_files"),
+    encode: bool = Query(default=True, description="Encode audio first through ffmpeg"),
+    output: Union[str, None] = Query(default="txt", enum=["txt", "vtt", "srt", "tsv", "json"]),
+    vad_filter: bool = Query(default=False, description="Skip the parts of the audio without speech, found by voice activity detection (VAD)"),
+    word_timestamps: bool = Query(default=False, description="Word level timestamps"),
+    batch_size: Annotated[int | None, Query(
+        ge=1,
+        description="Transcribe speech segments found by VAD in batches of this size. Faster on long files, at some cost in accuracy",
+        include_in_schema=(True if ASR_ENGINE == "faster_whisper" else False)
+    )] = None,
+    model_name: Union[str, None] = Query(default=None, description="Model name to use for transcription"),
+    priority: str = Query(default="batch", enum=["interactive", "batch"], description="Scheduling class for the job"),
+    deduplicate: bool = Query(default=False, description="Transcribe files with the same audio, e.g. from several mics, only once"),
+):
+    asr_options = {k: v for k, v in locals().items() if k in ASR_OPTIONS}
+
+    file_count = len(audio_files) + len(media_hashes)
+    if file_count == 0:
+        raise apierror.APIError("Either audio_files or media_hashes is required", 400)
+    if file_count > MAX_BATCH_FILES:
+        raise apierror.APIError(f"Too many files: {file_count}, the limit is {MAX_BATCH_FILES}", 400)
+
+    logger.info(f"Transcribing batch of {file_count} files with {asr_options}")
+
+    client = admit_client(request)
+
+    # Each item is [audio file path, original filename, media hash]
+    items = []
+    try:
+        for audio_file in audio_files:
+            temp_file_path, media_hash = await job_media(audio_file, None)
+            items.append([temp_file_path, audio_file.filename, media_hash])
+        for media_hash in media_hashes:
+            temp_file_path, media_hash = await job_media(None, media_hash)
+            items.append([temp_file_path, media_hash, media_hash])
+    except BaseException:
+        for temp_file_path, _, _ in items:
+            os.remove(temp_file_path)
+        raise
+
+    job_id = schedule_job(
+        priority, client, "transcribe_batch", [items, asr_options, deduplicate], model_name or DEFAULT_MODEL_NAME,
+        [temp_file_path for temp_file_path, _, _ in items],
+        timings=upload_timings(request), expires=TASK_EXPIRATION_SECONDS)
+
+    return JSONResponse({"job_id": job_id, "media_hashes": [media_hash for _, _, media_hash in items]})
+
+# Jobs sent to each worker node, by id, with the time they were sent. A job
+# counts against the node's load until the node's heartbeat lists it as
+# started, so jobs sent between heartbeats aren't all routed to one node.
+dispatched = {}
+
+def worker_loads() -> tuple[list, dict]:
+    """
+    Return the worker nodes for this engine, and the number of jobs sent to
+    each that it hasn't reported starting yet.
+    """
+    workers = [worker for worker in read_workers() if worker["engine"] == ASR_ENGINE]
+
+    now = time.time()
+    pending = {}
+    for worker in workers:
+        started = set(worker.get("started", []))
+        jobs = {
+            job_id: sent_at
+            for job_id, sent_at in dispatched.get(worker["name"], {}).items()
+            if job_id not in started and sent_at > now - DISPATCH_TIMEOUT
+        }
+        dispatched[worker["name"]] = jobs
+        pending[worker["name"]] = len(jobs)
+
+    # Forget jobs sent to nodes that have stopped sending heartbeats
+    for name in list(dispatched):
+        if name not in pending:
+            del dispatched[name]
+
+    return workers, pending
+
+
+def worker_slots() -> Union[tuple[int, int], None]:
+    """Return the free and total job slots of the worker nodes, or None if none have reported in."""
+    workers, pending = worker_loads()
+    if not workers:
+        return None
+
+    total = sum(worker["capacity"] for worker in workers)
+    busy = sum(worker["active"] + pending[worker["name"]] for worker in workers)
+    return max(total - busy, 0), total
+
+scheduler = JobScheduler(worker_slots)
+
+def send_job(task_name: str, args: list, model_name: str, **options):
+    """
+    Send a job to the queue of the worker node best placed to run it, or to
+    the shared queue if no worker nodes have reported in.
+    """
+    workers, pending = worker_loads()
+
+    worker = choose_worker(workers, model_name, pending)
+    if worker is None:
+        return celery.send_task(task_name, args=args, **options)
+
+    logger.info(f"Routing {task_name} job to worker {worker['name']}")
+    result = celery.send_task(task_name, args=args, queue=worker["queue"], **options)
+    dispatched.setdefault(worker["name"], {})[result.id] = time.time()
+    return result
+
+async def wait_for_job(job_id: str) -> dict:
+    events_path = os.path.join(output_directory, job_id, EVENTS_FILENAME)
+
+    try:
+        async for event in follow_events(events_path, lambda: finished_job_event(job_id), timeout=SYNC_JOB_TIMEOUT):
+            if event["event"] == "success":
+                return event["result"]
+            elif event["event"] == "failure":
+                raise apierror.APIError(event["error"])
+            elif event["event"] == "revoked":
+                raise apierror.APIError(f"Job {job_id} was revoked")
+    except asyncio.TimeoutError:
+        raise apierror.APIError(
+            f"Job {job_id} did not finish within {SYNC_JOB_TIMEOUT:g} seconds, follow it at /jobs/{job_id}", 504,
+            headers={"Job-Id": job_id})
+
+async def stream_segments(job_id: str, output: str):
+    events_path = os.path.join(output_directory, job_id, EVENTS_FILENAME)
+
+    yield stream_header(output)
+
+    index = 0
+    try:
+        async for event in follow_events(events_path, lambda: finished_job_event(job_id), timeout=SYNC_JOB_TIMEOUT):
+            if event["event"] == "segment":
+                index += 1
+                yield format_segment(event["segment"], index, output)
+            elif event["event"] == "failure":
+                error = event["error"]
+                break
+        else:
+            return
+    except asyncio.TimeoutError:
+        error = f"Job {job_id} did not finish within {SYNC_JOB_TIMEOUT:g} seconds, follow it at /jobs/{job_id}"
+
+    logger.error(f"Streaming transcription {job_id} failed: {error}")
+    # The response has already started, so errors can only go in the body
+    if output == "json":
+        yield json.dumps(apierror.error_dict(error)) + "\n"
 
 @app.get("/jobs/{job_id}", tags=["Endpoints"])
 async def job_status(job_id: str):
-    job = AsyncResult(job_id)
+    job = celery.AsyncResult(job_id)
 
     result = {
         "job_id": job_id,
@@ -256,16 +638,55 @@ async def job_status(job_id: str):
         "job_result": job.result
     }
 
-    if job.status == "FAILURE":
+    if scheduler.is_queued(job_id):
+        result["job_result"] = {"queued": True}
+    elif job.status == "FAILURE":
         result["job_result"] = apierror.error_dict(result["job_result"])
 
     return JSONResponse(result)
 
+@app.get("/jobs/{job_id}/events", tags=["Endpoints"])
+async def job_events(job_id: str, request: Request):
+    if not re.fullmatch(r"[\w-]+", job_id):
+        raise apierror.APIError(f"Job not found: {job_id}", 404)
+
+    events_path = os.path.join(output_directory, job_id, EVENTS_FILENAME)
+
+    async def stream():
+        async for event in follow_events(events_path, lambda: finished_job_event(job_id)):
+            if await request.is_disconnected():
+                break
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+
+def finished_job_event(job_id: str) -> Union[dict, None]:
+    job = celery.AsyncResult(job_id)
+
+    if job.status == "SUCCESS":
+        return {"event": "success", "state": job.status, "result": job.result}
+    elif job.status == "FAILURE":
+        return {"event": "failure", "state": job.status, "error": str(job.result)}
+    elif job.status == "REVOKED":
+        return {"event": "revoked", "state": job.status}
+
+    return None
+
 @app.delete("/jobs/{job_id}", tags=["Endpoints"])
 async def revoke_job(job_id: str):
-    job = AsyncResult(job_id)
+    job = celery.AsyncResult(job_id)
+    scheduler.cancel(job_id)
     job.revoke(terminate=True)
 
+    if re.fullmatch(r"[\w-]+", job_id):
+        JobEventLog(os.path.join(output_directory, job_id)).append("revoked", state="REVOKED")
+
     result = {
         "job_id": job_id,
         "job_status": job.status
@@ -1,6 +1,6 @@
 from io import StringIO
-from threading import Lock
-from typing import Union, BinaryIO
+from threading import local
+from typing import BinaryIO, Callable, Union
 import json
 import logging
 import os
@@ -9,6 +9,7 @@ from pywhispercpp.utils import download_model
 import tqdm
 
 from ..util.audio import SAMPLE_RATE
+from ..util.model_cache import CPU_THREADS, WORKER_CONCURRENCY, ModelKey, model_cache
 from .constants import ASR_ENGINE_OPTIONS
 from .model import Model
 
@@ -17,28 +18,32 @@ logger = logging.getLogger(__name__)
 
 DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
-model_name = os.getenv("ASR_MODEL", "small")
 model_path = os.getenv("ASR_MODEL_PATH", os.path.join(os.path.expanduser("~"), ".cache", "whisper"))
 
-model_lock = Lock()
+# The model pool selected by the last call to `load_model` in each job thread
+current = local()
+
+system_info_logged = False
 
-model = None
 def load_model(next_model_name: str):
-    with model_lock:
-        global model_name, model
+    global system_info_logged
 
-        if model and next_model_name == model_name:
-            return model
+    if not system_info_logged:
+        logger.info(Model.system_info())
+        system_info_logged = True
 
-        if not model:
-            logger.info(Model.system_info())
+    key = ModelKey(next_model_name, "auto", "ggml")
 
-        downloaded_model = download_model(next_model_name, model_path, DOWNLOAD_CHUNK_SIZE)
-        model = Model(downloaded_model)
+    def load():
+        downloaded_model = download_model(key.model_name, model_path, DOWNLOAD_CHUNK_SIZE)
+        if CPU_THREADS:
+            return Model(downloaded_model, n_threads=CPU_THREADS)
+        return Model(downloaded_model)
 
-        model_name = next_model_name
+    # whisper.cpp contexts are not thread-safe, so each concurrent job gets its own replica
+    current.pool = model_cache.get(key, load, replicas=WORKER_CONCURRENCY)
 
-        return model
+    return current.pool
 
 
 def build_options(asr_options):
@@ -53,12 +58,22 @@ def build_options(asr_options):
 
 
 def transcribe(audio, asr_options, output):
+    result = transcribe_result(audio, asr_options)
+
+    output_file = StringIO()
+    write_result(result, output_file, output)
+    output_file.seek(0)
+
+    return output_file
+
+
+def transcribe_result(audio, asr_options, on_segment: Union[Callable[[dict], None], None] = None):
     options_dict = build_options(asr_options)
     logger.info(f"whisper.cpp options: {options_dict}")
 
     audio_duration = len(audio) / SAMPLE_RATE
 
-    with model_lock:
+    with current.pool.checkout() as model:
         segments = []
         text = ""
         with tqdm.tqdm(total=audio_duration, unit='sec') as tqdm_pbar:
@@ -66,6 +81,8 @@ def transcribe(audio, asr_options, output):
                 segment_start = float(segment.t0) / 100.0
                 segment_end = float(segment.t1) / 100.0
                 tqdm_pbar.update(segment_end - segment_start)
+                if on_segment:
+                    on_segment({"start": segment_start, "end": segment_end, "text": segment.text})
             options_dict['new_segment_callback'] = new_segment_callback
 
             for segment in model.transcribe(audio, **options_dict):
@@ -85,21 +102,27 @@ def transcribe(audio, asr_options, output):
                     segment_dict["words"].append(word_dict)
                 segments.append(segment_dict)
                 text = text + segment.text + " "
-        result = {
-            "language": options_dict.get("language"),
-            "segments": segments,
-            "text": text.strip()
-        }
 
-    output_file = StringIO()
-    write_result(result, output_file, output)
-    output_file.seek(0)
+    return {
+        "language": options_dict.get("language"),
+        "segments": segments,
+        "text": text.strip()
+    }
 
-    return output_file
+
+def language_probabilities(audio) -> list:
+    """
+    Return (language code, probability) pairs for the first 30 seconds of
+    `audio`, most likely first.
+    """
+    with current.pool.checkout() as model:
+        _, probabilities = model.auto_detect_language(audio, n_threads=CPU_THREADS or 4)
+
+    return sorted(((code, float(p)) for code, p in probabilities.items()), key=lambda item: item[1], reverse=True)
 
 
-def language_detection(_audio):
-    raise NotImplementedError("language detection not implemented for whisper.cpp")
+def language_detection(audio):
+    return language_probabilities(audio)[0][0]
 
 
 def write_result(
@@ -1,4 +1,5 @@
-from typing import List
+from threading import local
+from typing import Callable, List
 import numpy as np
 
 from pywhispercpp.model import Model as BaseModel
@@ -30,7 +31,31 @@ class Segment:
     def __repr__(self):
         return str(self)
 
+# pywhispercpp keeps a single global segment callback. whisper.cpp invokes it
+# on the thread that called whisper_full, so route it to that thread's handler
+# to let several replicas transcribe concurrently.
+_callbacks = local()
+
+def _dispatch_new_segment_callback(ctx, n_new, _user_data):
+    handler = getattr(_callbacks, "new_segment_callback", None)
+    if handler is None:
+        return
+    n = pw.whisper_full_n_segments(ctx)
+    for segment in BaseModel._get_segments(ctx, n - n_new, n):
+        handler(segment)
+
 class Model(BaseModel):
+    def transcribe(self, media: np.ndarray, n_processors: int = None,
+                   new_segment_callback: Callable = None, **params):
+        self._set_params(params)
+        _callbacks.new_segment_callback = new_segment_callback
+        if new_segment_callback:
+            pw.assign_new_segment_callback(self._params, _dispatch_new_segment_callback)
+        try:
+            return self._transcribe(media, n_processors=n_processors)
+        finally:
+            _callbacks.new_segment_callback = None
+
     def _transcribe(self, audio: np.ndarray, n_processors: int = None):
         if n_processors:
             pw.whisper_full_parallel(self._ctx, self._params, audio, audio.size, n_processors)
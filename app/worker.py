@@ -1,12 +1,32 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from threading import Lock, local
 import logging
+import multiprocessing
 import os
+import time
 
-from celery import Celery
+from celery import Task
+from celery.signals import celeryd_after_setup, worker_init, worker_ready, worker_shutdown
 from typing import Union, Callable
-from whisper import tokenizer
+import numpy as np
 import tqdm
 
-from .util.audio import load_audio
+from .celery_app import celery
+from .util.audio import SAMPLE_RATE, load_audio
+from .util.chunking import merge_results, shift_segment, split_on_silence
+from .util.dedup import energy_envelope, find_duplicates
+from .util.job_events import JobEventLog
+from .util.metrics import WorkerMetrics
+from .util.micro_batch import MicroBatcher
+from .util.model_cache import WORKER_CONCURRENCY, model_cache
+from .util.profiling import profiled
+from .util.progress import ProgressReporter
+from .util.result_cache import hash_file, result_cache
+from .util.timing import JobTimings
+from .util.vad import SpeechTimeline, compact_speech
+from .util import worker_state
 
 logging.basicConfig(format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s', level=logging.INFO, force=True)
 logger = logging.getLogger(__name__)
@@ -14,19 +34,20 @@ logger = logging.getLogger(__name__)
 # monkeypatch tqdm to fool whisper's `transcribe` function
 class _TQDM(tqdm.tqdm):
     _tqdm = tqdm.tqdm
-    progress_function = None
+    # progress functions are per thread, since jobs may run concurrently
+    _local = local()
 
     def __init__(self, *argv, total=0, unit="", **kwargs):
         logger.debug(f"Creating TQDM with total={total}, unit={unit}")
         self._total = total
         self._unit = unit
         self._progress = 0
-        self.progress_function = _TQDM.progress_function or None
+        self.progress_function = getattr(_TQDM._local, "progress_function", None)
         super().__init__(*argv, **kwargs)
 
     def set_progress_function(progress_function: Callable[[str, int, int], None]):
         logger.debug(f"Setting progress function to {progress_function}")
-        _TQDM.progress_function = progress_function
+        _TQDM._local.progress_function = progress_function
 
     def update(self, progress):
         logger.debug(f"Updating TQDM with progress={progress}")
@@ -46,60 +67,370 @@ elif ASR_ENGINE == "whisper_cpp":
 else:
     from .openai_whisper import core as asr_engine
 
-LANGUAGE_CODES = sorted(list(tokenizer.LANGUAGES.keys()))
-
 DEFAULT_MODEL_NAME = os.getenv("ASR_MODEL", "small")
 
+# Models loaded, warmed up and pinned in memory before the worker takes jobs
+PRELOAD_MODELS = [name.strip() for name in os.getenv("ASR_PRELOAD_MODELS", "").split(",") if name.strip()]
+
+# Number of processes that transcribe chunks of long files in parallel; 0 or 1 disables chunking
+PARALLEL_CHUNKS = int(os.getenv("ASR_PARALLEL_CHUNKS", "0"))
+CHUNK_SECONDS = int(os.getenv("ASR_CHUNK_SECONDS", "300"))
+
+# Short clips from concurrent jobs are transcribed together in batches of up
+# to this many, waiting this long for others to arrive; 0 disables batching
+MICRO_BATCH_SIZE = int(os.getenv("ASR_MICRO_BATCH_SIZE", "0"))
+MICRO_BATCH_WAIT = float(os.getenv("ASR_MICRO_BATCH_WAIT_MS", "50")) / 1000
+# Longest clip batched; Whisper decodes at most 30 seconds at once
+MICRO_BATCH_MAX_SECONDS = min(float(os.getenv("ASR_MICRO_BATCH_MAX_SECONDS", "20")), 30)
+
+# Options that, along with the audio, model and engine, determine a transcription result
+RESULT_OPTIONS = frozenset(["encode", "start", "duration", "vad_filter"]) | asr_engine.ASR_ENGINE_OPTIONS
+
+# Seconds of audio used to detect the language; only this much is decoded
+LANGUAGE_DETECTION_SECONDS = 30
+
+# Number of most likely languages returned by language detection
+LANGUAGE_TOP_K = 5
+
+# Profile every job, not only those the webservice asks to be profiled
+PROFILE_JOBS = os.getenv("ASR_PROFILE_JOBS", "").lower() in ("1", "true", "yes")
+
 STATES = {
     'loading_model': 'LOADING_MODEL',
     'encoding': 'ENCODING',
     'transcribing': 'TRANSCRIBING',
     'detecting_language': 'DETECTING_LANGUAGE',
+    'finding_duplicates': 'FINDING_DUPLICATES',
 }
-celery = Celery(__name__)
-celery.conf.broker_connection_retry_on_startup = True
-celery.conf.broker_url = os.environ.get("CELERY_BROKER_URL", "sqla+sqlite:///celery.sqlite")
-celery.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "db+sqlite:///results.sqlite")
-celery.conf.worker_hijack_root_logger = False
-celery.conf.worker_redirect_stdouts_level = "DEBUG"
-
-@celery.task(name="transcribe", bind=True)
+
+@celeryd_after_setup.connect
+def consume_node_queue(sender, instance, **kwargs):
+    # Besides the shared queue, take jobs the webservice routes to this node
+    instance.app.amqp.queues.select_add(worker_state.node_queue(worker_state.WORKER_NAME))
+
+@worker_init.connect
+def preload_models(**kwargs):
+    for model_name in PRELOAD_MODELS:
+        logger.info(f"Preloading model {model_name}")
+        pool = asr_engine.load_model(model_name)
+        model_cache.pin(pool.key)
+
+        # Run one inference so kernels are compiled and buffers allocated
+        # before the first real job
+        logger.info(f"Warming up model {model_name}")
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        asr_engine.transcribe_result(silence, {"language": "en"})
+
+# Totals of finished jobs and their stages, published with the heartbeats
+worker_metrics = WorkerMetrics()
+
+def worker_status() -> dict:
+    stats = model_cache.stats()
+    return {
+        "queue": worker_state.node_queue(worker_state.WORKER_NAME),
+        "engine": ASR_ENGINE,
+        "models": stats["models"],
+        "pinned": stats["pinned"],
+        "capacity": WORKER_CONCURRENCY,
+        "active": JobTask.active,
+        "started": JobTask.recently_started(),
+        "model_cache": stats,
+        "result_cache": result_cache.stats(),
+        "metrics": worker_metrics.snapshot(),
+    }
+
+# Heartbeats start once preloading is done, so they also signal readiness
+heartbeat = worker_state.Heartbeat(worker_state.WORKER_NAME, worker_status)
+
+@worker_ready.connect
+def start_heartbeat(**kwargs):
+    heartbeat.start()
+
+@worker_shutdown.connect
+def stop_heartbeat(**kwargs):
+    heartbeat.stop()
+
+class JobTask(Task):
+    """
+    Task that records its state changes, progress and results in an event
+    log in the job's output directory, for clients to follow as they happen.
+    """
+    _event_logs = {}
+    # Progress through the items of batch jobs, by task ID
+    batch_progress = {}
+    # Time spent in each stage of running jobs, by task ID
+    job_timings = {}
+    # Number of jobs running in this worker
+    active = 0
+    # IDs of jobs started lately, with their start times, so the webservice
+    # can stop counting them as sent but not yet started
+    _started = deque()
+    _active_lock = Lock()
+
+    def event_log(self, task_id: Union[str, None] = None) -> JobEventLog:
+        task_id = task_id or self.request.id
+        if task_id not in self._event_logs:
+            self._event_logs[task_id] = JobEventLog(get_output_path(task_id))
+        return self._event_logs[task_id]
+
+    def __call__(self, *args, **kwargs):
+        # Models the job loads can't be evicted by other jobs until it ends
+        with model_cache.job():
+            if not (PROFILE_JOBS or self.request.get("profile")):
+                return super().__call__(*args, **kwargs)
+
+            task_id = self.request.id
+            logger.info(f"Profiling job {task_id}")
+            with profiled(get_output_path(task_id)) as files:
+                result = super().__call__(*args, **kwargs)
+
+        # The profile is served with the job's other output
+        if isinstance(result, dict) and files:
+            result = dict(result, profile={name: f"{get_output_url_path(task_id)}/{filename}" for name, filename in files.items()})
+        return result
+
+    @classmethod
+    def recently_started(cls) -> list:
+        cutoff = time.time() - worker_state.DISPATCH_TIMEOUT
+        with cls._active_lock:
+            while cls._started and cls._started[0][0] < cutoff:
+                cls._started.popleft()
+            return [task_id for _, task_id in cls._started]
+
+    def timings(self, task_id: Union[str, None] = None) -> dict:
+        timings = self.job_timings.get(task_id or self.request.id)
+        return timings.as_dict() if timings else {}
+
+    def stage(self, name: str):
+        """Context manager that times a stage of the current job."""
+        timings = self.job_timings.get(self.request.id)
+        return timings.stage(name) if timings else nullcontext()
+
+    def before_start(self, task_id, args, kwargs):
+        with JobTask._active_lock:
+            JobTask.active += 1
+            JobTask._started.append((time.time(), task_id))
+        heartbeat.beat()
+
+        # The webservice sends the stages it timed, and when the job was queued
+        # Peak RSS can only be read per stage when no other job shares the process
+        timings = JobTimings(self.request.get("timings"), per_stage_rss=WORKER_CONCURRENCY == 1)
+        submitted_at = self.request.get("submitted_at")
+        if submitted_at:
+            timings.add("queue_wait", max(time.time() - submitted_at, 0))
+        self.job_timings[task_id] = timings
+
+        self.event_log(task_id).append("state", state="STARTED")
+
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        task_id = task_id or self.request.id
+        if task_id in self.batch_progress:
+            meta = dict(meta or {}, batch=self.batch_progress[task_id])
+        if task_id in self.job_timings:
+            meta = dict(meta or {}, timings=self.timings(task_id))
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        self.event_log(task_id).append("progress", state=state, **(meta or {}))
+
+    def on_success(self, retval, task_id, args, kwargs):
+        self.event_log(task_id).append("success", state="SUCCESS", result=retval)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        self.event_log(task_id).append("failure", state="FAILURE", error=str(exc))
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        timings = self.job_timings.pop(task_id, None)
+        if timings:
+            worker_metrics.observe_job(self.name, status.lower(), timings.as_dict())
+        self._event_logs.pop(task_id, None)
+        with JobTask._active_lock:
+            JobTask.active -= 1
+        heartbeat.beat()
+
+@celery.task(name="transcribe", bind=True, base=JobTask)
 def transcribe(
     self,
     audio_file_path: str,
     original_filename: str,
     asr_options: dict,
+    media_hash: Union[str, None] = None,
 ):
     logger.info(f"Transcribing {audio_file_path} with {asr_options}")
-    output_format = asr_options["output"]
 
-    model_name = asr_options.get("model_name") or DEFAULT_MODEL_NAME
+    result = transcribe_media(self, audio_file_path, asr_options, media_hash)
+
+    with self.stage("write"):
+        output = write_output(self.request.id, self.request.id, result, asr_options["output"])
+
+    return {
+        **output,
+        "timings": self.timings(),
+        "model_cache": model_cache.stats(),
+        "result_cache": result_cache.stats(),
+    }
+
+@celery.task(name="transcribe_batch", bind=True, base=JobTask)
+def transcribe_batch(self, items: list, asr_options: dict, deduplicate: bool = False):
+    """
+    Transcribe several files with the same options, one after another, so
+    they share one job and the loaded model. Each item is a list of the
+    audio file path, original filename and media hash. A failed item is
+    reported in the results without stopping the rest.
+
+    With `deduplicate`, files with the same audio, such as several mics
+    recording one take, are transcribed once, and the others given that
+    transcript shifted by their offset in time.
+    """
+    logger.info(f"Transcribing batch of {len(items)} files with {asr_options}")
+    task_id = self.request.id
+
+    if deduplicate:
+        with self.stage("find_duplicates"):
+            duplicates = find_batch_duplicates(self, items, asr_options)
+    else:
+        duplicates = [None] * len(items)
+
+    results = []
+    transcripts = {}
+    try:
+        for index, (audio_file_path, original_filename, media_hash) in enumerate(items):
+            self.batch_progress[task_id] = {"total": len(items), "current": index, "filename": original_filename}
+            item = {"index": index, "filename": original_filename, "media_hash": media_hash}
+            try:
+                duplicate = duplicates[index]
+                # If the original failed, the duplicate is transcribed after all
+                if duplicate is not None and duplicate[0] in transcripts:
+                    original, offset = duplicate
+                    logger.info(f"Using transcript of {items[original][1]} for duplicate {original_filename}")
+                    result = merge_results([transcripts[original]], [offset])
+                    on_segment = segment_recorder(self)
+                    for segment in result["segments"]:
+                        on_segment(segment)
+                    os.remove(audio_file_path)
+                    item.update(duplicate_of=original, offset=offset)
+                else:
+                    result = transcribe_media(self, audio_file_path, asr_options, media_hash)
+                    transcripts[index] = result
+                with self.stage("write"):
+                    item.update(write_output(task_id, f"{task_id}-{index}", result, asr_options["output"]))
+            except Exception as e:
+                logger.exception(f"Failed to transcribe {original_filename}")
+                item["error"] = str(e)
+                if os.path.exists(audio_file_path):
+                    os.remove(audio_file_path)
+            self.event_log(task_id).append("item", **item)
+            results.append(item)
+    finally:
+        self.batch_progress.pop(task_id, None)
+
+    logger.info(f"Batch transcription complete")
+
+    return {
+        "items": results,
+        # Outputs of the items that succeeded, in order, for clients that only fetch them
+        "url_paths": [item["url_path"] for item in results if "url_path" in item],
+        "timings": self.timings(),
+        "model_cache": model_cache.stats(),
+        "result_cache": result_cache.stats(),
+    }
+
+@celery.task(name="detect_language", bind=True, base=JobTask)
+def detect_language(
+    self,
+    audio_file_path: str,
+    encode: bool,
+    model_name: Union[str, None] = None,
+    top_k: int = LANGUAGE_TOP_K,
+):
+    logger.info(f"Detecting language of {audio_file_path}")
+
+    model_name = model_name or DEFAULT_MODEL_NAME
     logger.info(f"Loading model {model_name}")
     self.update_state(state=STATES["loading_model"], meta={"progress": {"units": "models", "total": 1, "current": 0}})
-    _TQDM.set_progress_function(update_progress(self, STATES["loading_model"]))
-    try:
+    with self.stage("model_load"):
         asr_engine.load_model(model_name)
-    finally:
-        _TQDM.set_progress_function(None)
 
     logger.info(f"Loading audio from {audio_file_path}")
     self.update_state(state=STATES["encoding"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
-    audio_data = load_audio(audio_file_path, asr_options.get("encode", False))
+    with self.stage("decode"):
+        audio_data = load_audio(audio_file_path, encode, duration=LANGUAGE_DETECTION_SECONDS)
+
+    logger.info(f"Detecting audio language")
+    self.update_state(state=STATES["detecting_language"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
+    with self.stage("inference"):
+        probabilities = asr_engine.language_probabilities(audio_data)[:top_k]
+
+    os.remove(audio_file_path)
 
-    logger.info(f"Transcribing audio")
-    self.update_state(state=STATES["transcribing"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
-    _TQDM.set_progress_function(update_progress(self, STATES["transcribing"]))
+    logger.info(f"Returning result in job state")
+
+    language_code, language_probability = probabilities[0]
+    result_object = {
+        "language_code": language_code,
+        "language_probability": round(float(language_probability), 4),
+        "languages": [
+            {"language_code": code, "probability": round(float(probability), 4)}
+            for code, probability in probabilities
+        ],
+    }
+
+    return {
+        "result": result_object,
+        "timings": self.timings(),
+        "model_cache": model_cache.stats(),
+    }
+
+def find_batch_duplicates(context, items: list, asr_options: dict) -> list:
+    """Compare the audio of a batch's items; see `find_duplicates` for the result."""
+    context.update_state(state=STATES["finding_duplicates"], meta={"progress": {"units": "files", "total": len(items), "current": 0}})
+    progress = update_progress(context, STATES["finding_duplicates"])
+    envelopes = []
     try:
-        result = asr_engine.transcribe(audio_data, asr_options, output_format)
+        for index, (audio_file_path, _, _) in enumerate(items):
+            try:
+                envelopes.append(energy_envelope(audio_file_path, asr_options.get("encode", False)))
+            except Exception:
+                # The item's own transcription will report the error
+                logger.exception(f"Failed to read {audio_file_path}")
+                envelopes.append(np.zeros(0, dtype=np.float32))
+            progress("files", len(items), index + 1)
     finally:
-        _TQDM.set_progress_function(None)
+        progress.close()
+
+    duplicates = find_duplicates(envelopes)
+    logger.info(f"Found {sum(1 for duplicate in duplicates if duplicate)} duplicates in batch of {len(items)}")
+    return duplicates
+
+def transcribe_media(context, audio_file_path: str, asr_options: dict, media_hash: Union[str, None] = None):
+    """Transcribe a job's audio file, or use a cached result, then remove the file."""
+    model_name = asr_options.get("model_name") or DEFAULT_MODEL_NAME
+
+    result = None
+    if result_cache.enabled:
+        cache_options = {k: v for k, v in asr_options.items() if k in RESULT_OPTIONS}
+        cache_key = result_cache.key(media_hash or hash_file(audio_file_path), ASR_ENGINE, model_name, cache_options)
+        result = result_cache.get(cache_key)
+
+    if result is not None:
+        logger.info(f"Using cached result")
+        # Clients streaming the transcript still expect its segments
+        on_segment = segment_recorder(context)
+        for segment in result["segments"]:
+            on_segment(segment)
+    else:
+        result = transcribe_file(context, audio_file_path, model_name, asr_options)
+
+        if result_cache.enabled:
+            result_cache.put(cache_key, result)
 
     logger.info(f"Transcription complete")
 
     os.remove(audio_file_path)
 
-    filename = f"{self.request.id}.{output_format}"
-    output_directory = get_output_path(self.request.id)
+    return result
+
+def write_output(job_id: str, name: str, result: dict, output_format: str) -> dict:
+    filename = f"{name}.{output_format}"
+    output_directory = get_output_path(job_id)
     output_path = f"{output_directory}/{filename}"
 
     logger.info(f"Writing result to {output_path}")
@@ -108,42 +439,155 @@ def transcribe(
         os.makedirs(output_directory)
 
     with open(output_path, "w") as f:
-        f.write(result.read())
-
-    url_path = f"{get_output_url_path(transcribe.request.id)}/{filename}"
+        asr_engine.write_result(result, f, output_format)
 
     return {
         "output_filename": filename,
         "output_path": output_path,
-        "url_path": url_path,
+        "url_path": f"{get_output_url_path(job_id)}/{filename}",
     }
 
-@celery.task(name="detect_language", bind=True)
-def detect_language(self, audio_file_path: str, encode: bool):
-    logger.info(f"Detecting language of {audio_file_path}")
+def transcribe_file(context, audio_file_path: str, model_name: str, asr_options: dict):
+    logger.info(f"Loading audio from {audio_file_path}")
+    context.update_state(state=STATES["encoding"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
+    # Previews transcribe only part of the file, but keep its timestamps
+    start = asr_options.get("start") or 0
+    with context.stage("decode"):
+        audio_data = load_audio(audio_file_path, asr_options.get("encode", False), start=start, duration=asr_options.get("duration"))
+
+    # Silence is cut out before any engine sees the audio, and the segment
+    # timestamps restored afterwards. Engines that split audio at speech
+    # themselves are given the speech clips, so VAD isn't run twice.
+    timeline = None
+    if asr_options.get("vad_filter"):
+        with context.stage("vad"):
+            audio_data, timeline = compact_speech(audio_data)
+        asr_options = dict(asr_options, vad_filter=False)
+
+    on_segment = segment_recorder(context, offset=start, timeline=timeline)
+
+    if not len(audio_data):
+        logger.info(f"No speech found")
+        return {"language": asr_options.get("language"), "segments": [], "text": ""}
+    elif PARALLEL_CHUNKS > 1 and len(audio_data) > 2 * CHUNK_SECONDS * SAMPLE_RATE:
+        # The chunk processes load their own models, so that is part of the inference time
+        with context.stage("inference"):
+            result = transcribe_chunked(context, model_name, audio_data, asr_options, on_segment)
+    else:
+        logger.info(f"Loading model {model_name}")
+        context.update_state(state=STATES["loading_model"], meta={"progress": {"units": "models", "total": 1, "current": 0}})
+        with context.stage("model_load"), tqdm_progress(context, STATES["loading_model"]):
+            asr_engine.load_model(model_name)
+
+        logger.info(f"Transcribing audio")
+        context.update_state(state=STATES["transcribing"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
+        with context.stage("inference"):
+            if use_micro_batch(audio_data, asr_options):
+                result = transcribe_micro_batched(model_name, audio_data, asr_options, on_segment)
+            else:
+                engine_options = dict(asr_options, speech_clips=timeline.clips()) if timeline else asr_options
+                with tqdm_progress(context, STATES["transcribing"]):
+                    result = asr_engine.transcribe_result(audio_data, engine_options, on_segment=on_segment)
+
+    if timeline:
+        result = dict(result, segments=[timeline.restore_segment(segment) for segment in result["segments"]])
+    if start:
+        result = merge_results([result], [start])
+
+    return result
+
+def transcribe_chunked(context, model_name: str, audio, asr_options: dict, on_segment: Callable[[dict], None]):
+    chunks = split_on_silence(audio, CHUNK_SECONDS)
+    logger.info(f"Transcribing audio in {len(chunks)} chunks across {PARALLEL_CHUNKS} processes")
+    executor = get_chunk_executor()
+
+    # Chunks after the first may be too short of speech to detect the language reliably
+    if not asr_options.get("language"):
+        context.update_state(state=STATES["detecting_language"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
+        detection_audio = audio[:LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE]
+        language = executor.submit(detect_chunk_language, model_name, detection_audio).result()
+        if language:
+            asr_options = dict(asr_options, language=language)
+
+    results = [None] * len(chunks)
+    futures = {}
+    # Chunks finish out of order, so their segments are held back until the
+    # chunks before them have been reported
+    next_chunk = 0
+    progress = update_progress(context, STATES["transcribing"])
+    try:
+        progress("chunks", len(chunks), 0)
+        for i, (start, end) in enumerate(chunks):
+            futures[executor.submit(transcribe_chunk, model_name, audio[start:end], asr_options)] = i
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            while next_chunk < len(chunks) and results[next_chunk] is not None:
+                for segment in merge_results([results[next_chunk]], [chunks[next_chunk][0] / SAMPLE_RATE])["segments"]:
+                    on_segment(segment)
+                next_chunk += 1
+            progress("chunks", len(chunks), done)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    finally:
+        progress.close()
 
-    model_name = DEFAULT_MODEL_NAME
-    logger.info(f"Loading model {model_name}")
-    self.update_state(state=STATES["loading_model"], meta={"progress": {"units": "models", "total": 1, "current": 0}})
-    asr_engine.load_model(model_name)
+    return merge_results(results, [start / SAMPLE_RATE for start, _ in chunks])
 
-    logger.info(f"Loading audio from {audio_file_path}")
-    self.update_state(state=STATES["encoding"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
-    audio_data = load_audio(audio_file_path, encode)
+def use_micro_batch(audio, asr_options: dict) -> bool:
+    return (
+        micro_batcher.enabled
+        and 0 < len(audio) <= MICRO_BATCH_MAX_SECONDS * SAMPLE_RATE
+        and hasattr(asr_engine, "transcribe_batch")
+        and asr_engine.can_batch(asr_options)
+    )
 
-    logger.info(f"Detecting audio language")
-    self.update_state(state=STATES["detecting_language"], meta={"progress": {"units": "files", "total": 1, "current": 0}})
-    result = asr_engine.language_detection(audio_data)
+def transcribe_micro_batched(model_name: str, audio, asr_options: dict, on_segment: Callable[[dict], None]):
+    # Only clips with the same model and options can share a batch
+    options = tuple(sorted((k, v) for k, v in asr_options.items() if k in asr_engine.ASR_ENGINE_OPTIONS))
+    result = micro_batcher.submit((model_name, options), audio)
 
-    os.remove(audio_file_path)
+    for segment in result["segments"]:
+        on_segment(segment)
 
-    logger.info(f"Returning result in job state")
+    return result
 
-    result_object = { "language_code": result }
+def run_micro_batch(key, audios: list) -> list:
+    model_name, options = key
+    logger.info(f"Transcribing batch of {len(audios)} clips")
+    asr_engine.load_model(model_name)
+    return asr_engine.transcribe_batch(audios, dict(options))
+
+# Batches only form when jobs run concurrently
+micro_batcher = MicroBatcher(run_micro_batch, MICRO_BATCH_SIZE if WORKER_CONCURRENCY > 1 else 0, MICRO_BATCH_WAIT)
+
+chunk_executor = None
+chunk_executor_lock = Lock()
+
+def get_chunk_executor():
+    global chunk_executor
+    with chunk_executor_lock:
+        # Each process keeps its own model loaded between jobs
+        if chunk_executor is None:
+            chunk_executor = ProcessPoolExecutor(PARALLEL_CHUNKS, mp_context=multiprocessing.get_context("spawn"))
+        return chunk_executor
+
+@worker_shutdown.connect
+def stop_chunk_executor(**kwargs):
+    global chunk_executor
+    with chunk_executor_lock:
+        if chunk_executor is not None:
+            chunk_executor.shutdown(wait=True, cancel_futures=True)
+            chunk_executor = None
+
+def transcribe_chunk(model_name: str, audio, asr_options: dict):
+    asr_engine.load_model(model_name)
+    return asr_engine.transcribe_result(audio, asr_options)
 
-    return {
-        "result": result_object
-    }
+def detect_chunk_language(model_name: str, audio):
+    asr_engine.load_model(model_name)
+    return asr_engine.language_detection(audio)
 
 def get_output_path(job_id: str):
     return os.environ.get("OUTPUT_DIRECTORY", os.getcwd() + "/app/output") + "/" + job_id
@@ -151,11 +595,33 @@ def get_output_path(job_id: str):
 def get_output_url_path(job_id: str):
     return os.environ.get("OUTPUT_URL_PREFIX", "/output") + "/" + job_id
 
-def update_progress(context, state):
-    def do_update(units, total, current):
-        logger.debug(f"Updating progress with units={units}, total={total}, current={current}")
-        context.update_state(
-            state=state,
-            meta={"progress": {"units": units, "total": total, "current": current}}
-        )
-    return do_update
+def segment_recorder(context, offset: float = 0, timeline: Union[SpeechTimeline, None] = None):
+    task_id = context.request.id
+    def record(segment):
+        if timeline:
+            segment = timeline.restore_segment(segment)
+        if offset:
+            segment = shift_segment(segment, offset)
+        # Segments of batch jobs say which item they belong to
+        batch = context.batch_progress.get(task_id)
+        item = {"item": batch["current"]} if batch else {}
+        context.event_log(task_id).append("segment", segment=segment, **item)
+    return record
+
+def update_progress(context, state) -> ProgressReporter:
+    # Reports are sent from the reporter's thread, so the task ID is passed explicitly
+    task_id = context.request.id
+    def do_update(progress):
+        logger.debug(f"Updating progress with {progress}")
+        context.update_state(task_id=task_id, state=state, meta={"progress": progress})
+    return ProgressReporter(do_update)
+
+@contextmanager
+def tqdm_progress(context, state):
+    reporter = update_progress(context, state)
+    _TQDM.set_progress_function(reporter)
+    try:
+        yield reporter
+    finally:
+        _TQDM.set_progress_function(None)
+        reporter.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Measure how long the webservice takes to import, and check that it does not
+import the ASR engines. Exits with an error if it does, or if importing takes
+longer than --max-seconds, so it can guard against regressions in CI.
+
+Run from the repository root:
+
+    python benchmarks/import_time.py
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+# Modules that only the worker should load
+ENGINE_MODULES = [
+    'torch',
+    'whisper',
+    'faster_whisper',
+    'ctranslate2',
+    'pywhispercpp',
+    'app.worker',
+]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$')
+
+def measure_import(module):
+    """Import the module in a fresh interpreter and return its import time and loaded modules"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT.format(module=module)],
+                            check=True,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement['slowest'] = slowest_imports(result.stderr)
+    return measurement
+
+def slowest_imports(importtime_output, count=10):
+    """Return the top-level packages with the largest cumulative import time, in seconds"""
+    packages = {}
+    for line in importtime_output.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative_us, name = int(match.group(2)), match.group(4)
+        package = name.split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative_us)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [{'package': package, 'seconds': round(us / 1e6, 3)} for package, us in slowest]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='app.webservice',
+                        help='Module to import (default: %(default)s)')
+    parser.add_argument('--max-seconds', type=float, default=3.0,
+                        help='Fail if importing takes longer than this (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Number of imports to measure; the fastest counts (default: %(default)s)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+
+    measurements = [measure_import(args.module) for _ in range(args.runs)]
+    fastest = min(measurements, key=lambda m: m['seconds'])
+    engine_modules = [m for m in ENGINE_MODULES if m in fastest['modules']]
+
+    result = {
+        'module': args.module,
+        'seconds': round(fastest['seconds'], 3),
+        'max_seconds': args.max_seconds,
+        'module_count': len(fastest['modules']),
+        'engine_modules': engine_modules,
+        'slowest': fastest['slowest'],
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Imported {args.module} in {result['seconds']:.3f}s ({result['module_count']} modules)")
+        for entry in result['slowest']:
+            print(f"  {entry['seconds']:7.3f}s  {entry['package']}")
+
+    failed = False
+    if engine_modules:
+        print(f"Error: {args.module} imports engine modules: {', '.join(engine_modules)}", file=sys.stderr)
+        failed = True
+    if result['seconds'] > args.max_seconds:
+        print(f"Error: import took {result['seconds']:.3f}s, more than {args.max_seconds}s", file=sys.stderr)
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Measure transcription speed and memory use for each ASR engine on the CPU.
+
+For audio of several lengths, times each stage of a job on its own, loading
+the audio, loading the model, transcribing and writing the result, and then
+the whole /asr request, sent through FastAPI's test client to a worker on a
+local filesystem queue. Reports real-time factors, peak RSS and p50/p95
+latencies as JSON. Exits with an error if any engine fails, or transcribes
+slower than --max-rtf, so it can guard against regressions before deploying.
+
+Each engine is measured in its own process, since the engine is chosen when
+the app is imported. Audio is synthesized unless --audio gives a recording;
+real speech gives more representative numbers.
+
+Run from the repository root:
+
+    python benchmarks/transcription.py --json
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_ROOT)
+
+from app.util.timing import peak_rss_mb, reset_peak_rss
+
+ENGINES = ['faster_whisper', 'openai_whisper', 'whisper_cpp']
+
+SAMPLE_RATE = 16000
+
+# Seconds to wait for the worker to start and for each request to finish
+WORKER_START_TIMEOUT = 120
+REQUEST_TIMEOUT = 600
+
+def synthesize_speech(seconds, seed=0):
+    """
+    Return audio with a rough likeness of speech: voiced syllables of varying
+    pitch, at about four a second, in phrases separated by pauses
+    """
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(audio):
+        for _ in range(rng.integers(3, 12)):
+            if position >= len(audio):
+                break
+            length = int(rng.uniform(0.15, 0.3) * SAMPLE_RATE)
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = rng.uniform(90, 220) * (1 + 0.1 * t)
+            syllable = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 8))
+            syllable *= np.hanning(length)
+            end = min(position + length, len(audio))
+            audio[position:end] += 0.1 * syllable[:end - position]
+            position = end + int(rng.uniform(0.02, 0.1) * SAMPLE_RATE)
+        position += int(rng.uniform(0.3, 1.0) * SAMPLE_RATE)
+    audio += 0.002 * rng.standard_normal(len(audio)).astype(np.float32)
+    return audio
+
+def reference_audio(audio_path, seconds):
+    """Return the first `seconds` of a recording, repeated if it is shorter"""
+    from app.util.audio import load_audio
+    audio = load_audio(audio_path, True, duration=seconds)
+    samples = int(seconds * SAMPLE_RATE)
+    return np.resize(audio, samples) if len(audio) < samples else audio
+
+def write_wav(path, audio):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+def summarize(seconds, peak_mb=None):
+    """Summarize the latencies of several runs of a stage"""
+    summary = {
+        'runs': len(seconds),
+        'p50': round(float(np.percentile(seconds, 50)), 4),
+        'p95': round(float(np.percentile(seconds, 95)), 4),
+        'mean': round(float(np.mean(seconds)), 4),
+    }
+    if peak_mb is not None:
+        summary['peak_rss_mb'] = round(peak_mb, 1)
+    return summary
+
+def measure(function, runs, pid='self'):
+    """Call a function `runs` times. Returns the summary of its latencies and its last result."""
+    reset_peak_rss(pid)
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - started)
+    return summarize(seconds, peak_rss_mb(pid)), result
+
+def start_worker(engine, environment):
+    worker = subprocess.Popen([
+        sys.executable, '-m', 'celery',
+        '-A', 'app.worker.celery',
+        'worker',
+        '-n', f'benchmark-{engine}@%h',
+        '--pool=solo',
+        '--loglevel=warning',
+    ], cwd=REPOSITORY_ROOT, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return worker
+
+def wait_for_worker(client, worker):
+    deadline = time.monotonic() + WORKER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if worker.poll() is not None:
+            raise RuntimeError(f'Worker exited with status {worker.returncode}')
+        if client.get('/ready').status_code == 200:
+            return
+        time.sleep(0.5)
+    raise RuntimeError(f'Worker not ready after {WORKER_START_TIMEOUT}s')
+
+def benchmark_engine(args):
+    """Measure one engine, the one selected by ASR_ENGINE, and return its results"""
+    work_directory = tempfile.mkdtemp(prefix='reaspeech-benchmark-')
+
+    # Everything the worker and webservice share lives in the work directory,
+    # and caches are off so that every run transcribes
+    os.environ.update({
+        'CELERY_BROKER_URL': 'filesystem://',
+        'CELERY_RESULT_BACKEND': f'file://{work_directory}/results',
+        'ASR_QUEUE_DIRECTORY': f'{work_directory}/queue',
+        'ASR_STATE_DIRECTORY': f'{work_directory}/state',
+        'ASR_MEDIA_DIRECTORY': f'{work_directory}/media',
+        'OUTPUT_DIRECTORY': f'{work_directory}/output',
+        'ASR_MODEL': args.model,
+        'ASR_RESULT_CACHE_MB': '0',
+        'ASR_MEDIA_CACHE_MB': '0',
+        'CUDA_VISIBLE_DEVICES': '',
+    })
+    os.makedirs(os.environ['OUTPUT_DIRECTORY'])
+
+    from app.util.audio import load_audio
+    from app.worker import asr_engine
+
+    asr_options = {'task': 'transcribe', 'language': args.language}
+
+    audio_paths = {}
+    for seconds in args.lengths:
+        audio = reference_audio(args.audio, seconds) if args.audio else synthesize_speech(seconds)
+        audio_paths[seconds] = os.path.join(work_directory, f'audio-{seconds:g}.wav')
+        write_wav(audio_paths[seconds], audio)
+
+    # The first load reads the model from disk; later ones are cache hits
+    reset_peak_rss()
+    started = time.perf_counter()
+    asr_engine.load_model(args.model)
+    model_load = {
+        'cold_seconds': round(time.perf_counter() - started, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    model_load['warm'], _ = measure(lambda: asr_engine.load_model(args.model), args.runs)
+
+    lengths = []
+    for seconds, audio_path in audio_paths.items():
+        load, audio = measure(lambda: load_audio(audio_path, True), args.runs)
+        # One untimed run, so the first timed one isn't slowed by warm-up
+        result = asr_engine.transcribe_result(audio, asr_options)
+        transcribe, result = measure(lambda: asr_engine.transcribe_result(audio, asr_options), args.runs)
+        write, _ = measure(lambda: asr_engine.write_result(result, io.StringIO(), args.output), args.runs)
+        lengths.append({
+            'audio_seconds': seconds,
+            'load_audio': load,
+            'transcribe': transcribe,
+            'write_result': write,
+            'rtf': round(transcribe['p50'] / seconds, 4),
+            'segments': len(result['segments']),
+        })
+
+    if not args.skip_api:
+        benchmark_api(args, audio_paths, lengths)
+
+    shutil.rmtree(work_directory, ignore_errors=True)
+
+    return {
+        'engine': os.environ['ASR_ENGINE'],
+        'model': args.model,
+        'language': args.language,
+        'runs': args.runs,
+        'load_model': model_load,
+        'lengths': lengths,
+    }
+
+def benchmark_api(args, audio_paths, lengths):
+    """Time /asr requests through the webservice, adding them to each length's results"""
+    from fastapi.testclient import TestClient
+    from app.webservice import app
+
+    worker = start_worker(os.environ['ASR_ENGINE'], dict(os.environ))
+    try:
+        with TestClient(app) as client:
+            wait_for_worker(client, worker)
+
+            for entry in lengths:
+                audio_path = audio_paths[entry['audio_seconds']]
+
+                def request():
+                    with open(audio_path, 'rb') as f:
+                        response = client.post('/asr',
+                                               params={'language': args.language, 'output': args.output, 'model_name': args.model},
+                                               files={'audio_file': (os.path.basename(audio_path), f, 'audio/wav')},
+                                               timeout=REQUEST_TIMEOUT)
+                    response.raise_for_status()
+
+                # The first request also loads the model in the worker
+                request()
+                entry['asr_request'], _ = measure(request, args.runs, worker.pid)
+                entry['asr_rtf'] = round(entry['asr_request']['p50'] / entry['audio_seconds'], 4)
+    finally:
+        worker.terminate()
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+def run_engine(engine, argv):
+    """Benchmark an engine in a fresh interpreter and return its results"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-engine', *argv],
+                            cwd=REPOSITORY_ROOT,
+                            env=dict(os.environ, ASR_ENGINE=engine),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        return {'engine': engine, 'error': error[-1] if error else f'Exited with status {result.returncode}'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES,
+                        help='Engines to measure (default: all)')
+    parser.add_argument('--model', default='tiny',
+                        help='Model to use (default: %(default)s)')
+    parser.add_argument('--lengths', nargs='+', type=float, default=[10, 60, 300],
+                        help='Lengths of audio to transcribe, in seconds (default: %(default)s)')
+    parser.add_argument('--audio',
+                        help='Recording to use instead of synthesized audio, cut or repeated to each length')
+    parser.add_argument('--language', default='en',
+                        help='Language of the audio, so detection is not timed (default: %(default)s)')
+    parser.add_argument('--output', default='srt', choices=['txt', 'vtt', 'srt', 'tsv', 'json'],
+                        help='Output format written (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of timed runs of each stage (default: %(default)s)')
+    parser.add_argument('--skip-api', action='store_true',
+                        help='Only time the stages, not /asr requests')
+    parser.add_argument('--max-rtf', type=float,
+                        help='Fail if any engine takes longer than this fraction of the audio length to transcribe it')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    parser.add_argument('--run-engine', action='store_true',
+                        help=argparse.SUPPRESS)
+    args, _ = parser.parse_known_args()
+
+    if args.audio:
+        args.audio = os.path.abspath(args.audio)
+
+    if args.run_engine:
+        print(json.dumps(benchmark_engine(args)))
+        return
+
+    argv = [arg for arg in sys.argv[1:] if arg != '--json']
+    results = [run_engine(engine, argv) for engine in args.engines]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            if 'error' in result:
+                print(f"{result['engine']}: {result['error']}")
+                continue
+            load_model = result['load_model']
+            print(f"{result['engine']} ({result['model']}): model loaded in {load_model['cold_seconds']:.2f}s, "
+                  f"peak RSS {load_model['peak_rss_mb']:.0f} MB")
+            for entry in result['lengths']:
+                line = (f"  {entry['audio_seconds']:6g}s audio: transcribed in {entry['transcribe']['p50']:.2f}s "
+                        f"(p95 {entry['transcribe']['p95']:.2f}s, RTF {entry['rtf']:.3f}, "
+                        f"peak RSS {entry['transcribe']['peak_rss_mb']:.0f} MB)")
+                if 'asr_request' in entry:
+                    line += f", /asr in {entry['asr_request']['p50']:.2f}s (RTF {entry['asr_rtf']:.3f})"
+                print(line)
+
+    failed = False
+    for result in results:
+        if 'error' in result:
+            print(f"Error: {result['engine']} failed: {result['error']}", file=sys.stderr)
+            failed = True
+            continue
+        if args.max_rtf is None:
+            continue
+        for entry in result['lengths']:
+            if entry['rtf'] > args.max_rtf:
+                print(f"Error: {result['engine']} transcribed {entry['audio_seconds']:g}s of audio "
+                      f"with RTF {entry['rtf']:.3f}, more than {args.max_rtf}", file=sys.stderr)
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -102,7 +102,7 @@ function CurlRequest._init()
       return false
     end
 
-    local http_status, body = self:http_status_and_body(f)
+    local http_status, body, headers = self:http_status_and_body(f)
     f:close()
 
     if http_status == -1 then
@@ -113,6 +113,9 @@ function CurlRequest._init()
     Tempfile:remove(self.output_file)
     Tempfile:remove(self.progress_file)
 
+    self.http_status = http_status
+    self.retry_after = tonumber(API._header_value(headers, 'Retry-After'))
+
     if http_status ~= 200 then
       self.error_msg = "Server responded with status " .. http_status
       self.error_handler(self.error_msg)
@@ -372,7 +375,8 @@ function CurlRequest._init()
   function API:http_status_and_body(response)
     local headers, content = API._split_curl_response(response)
     -- self:debug('Parsing response: ' .. dump(headers) .. ', ' .. dump(content))
-    local last_status_line = headers[#headers] and headers[#headers][1] or ''
+    local last_headers = headers[#headers] or {}
+    local last_status_line = last_headers[1] or ''
 
     local status = last_status_line:match("^HTTP/%d%.%d%s+(%d+)")
     if not status then
@@ -384,7 +388,17 @@ function CurlRequest._init()
       table.insert(body, table.concat(chunk, "\n"))
     end
 
-    return tonumber(status), table.concat(body, "\n")
+    return tonumber(status), table.concat(body, "\n"), last_headers
+  end
+
+  function API._header_value(header_lines, name)
+    local prefix = name:lower() .. ':'
+    for _, line in ipairs(header_lines or {}) do
+      if line:lower():sub(1, #prefix) == prefix then
+        return line:sub(#prefix + 1):match("^%s*(.-)%s*$")
+      end
+    end
+    return nil
   end
 
   function API._split_curl_response(input)
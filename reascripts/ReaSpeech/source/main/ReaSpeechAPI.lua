@@ -7,11 +7,14 @@
 ReaSpeechAPI = {
   CURL_TIMEOUT_SECONDS = 5,
   base_url = nil,
+  client_id = nil,
 }
 
 function ReaSpeechAPI:init(host, protocol)
   protocol = protocol or 'http:'
   self.base_url = protocol .. '//' .. host
+  -- identifies this session to the server, which shares its capacity between clients
+  self.client_id = ('%08x%08x'):format(math.random(0, 0x7fffffff), math.random(0, 0x7fffffff))
 end
 
 function ReaSpeechAPI:get_api_url(remote_path)
@@ -57,6 +60,7 @@ function ReaSpeechAPI:post_request(url_path, data, file_uploads)
     method = 'POST',
     headers = {
       ['Content-Type'] = 'multipart/form-data',
+      ['X-ReaSpeech-Client'] = self.client_id,
     },
     query_data = data,
     file_uploads = file_uploads or {},
@@ -6,6 +6,12 @@
 
 ReaSpeechWorker = Polo {}
 
+ReaSpeechWorker.DEFAULT_RETRY_SECONDS = 10
+
+-- Media keys sample this many bytes from each of this many places in a file
+ReaSpeechWorker.FINGERPRINT_CHUNK_SIZE = 4096
+ReaSpeechWorker.FINGERPRINT_CHUNKS = 16
+
 function ReaSpeechWorker:init()
   assert(self.requests, 'missing requests')
   assert(self.responses, 'missing responses')
@@ -15,6 +21,9 @@ function ReaSpeechWorker:init()
   self.active_job = nil
   self.pending_jobs = {}
   self.job_count = 0
+
+  -- hashes of media the server has stored, so it needn't be uploaded again
+  self.media_hashes = {}
 end
 
 function ReaSpeechWorker:react()
@@ -271,8 +280,58 @@ function ReaSpeechWorker:start_active_job()
 
   local active_job = self.active_job
   active_job.requests = {}
-  active_job.initial_request = ReaSpeechAPI:post_request(
-    active_job.endpoint, active_job.data, active_job.file_uploads)
+  active_job.media_key = self:media_key(active_job.file_uploads)
+  active_job.media_hash = active_job.media_key and self.media_hashes[active_job.media_key]
+
+  if active_job.media_hash then
+    local data = {}
+    for k, v in pairs(active_job.data) do
+      data[k] = v
+    end
+    data.media_hash = active_job.media_hash
+
+    active_job.initial_request = ReaSpeechAPI:post_request(
+      active_job.endpoint, data, {})
+  else
+    active_job.initial_request = ReaSpeechAPI:post_request(
+      active_job.endpoint, active_job.data, active_job.file_uploads)
+  end
+end
+
+-- Identifies uploaded audio by path, size and a fingerprint of its content,
+-- so a file that has been re-rendered since it was last sent is uploaded
+-- again, even if its size is unchanged, as it usually is for WAV files
+function ReaSpeechWorker:media_key(file_uploads)
+  local path = file_uploads and file_uploads.audio_file
+  if not path then return nil end
+
+  local file = io.open(path, 'rb')
+  if not file then return nil end
+
+  local size = file:seek('end')
+  local fingerprint = self:fingerprint(file, size)
+  file:close()
+
+  return path .. ':' .. tostring(size) .. ':' .. fingerprint
+end
+
+-- Hashes chunks spread evenly through a file, which is much cheaper than
+-- reading all of it
+function ReaSpeechWorker:fingerprint(file, size)
+  local chunk_size = self.FINGERPRINT_CHUNK_SIZE
+  local chunks = self.FINGERPRINT_CHUNKS
+  local step = math.max(size - chunk_size, 0) // math.max(chunks - 1, 1)
+
+  local hash = 5381
+  for i = 0, chunks - 1 do
+    file:seek('set', i * step)
+    local data = file:read(chunk_size) or ''
+    for j = 1, #data do
+      hash = (hash * 33 + data:byte(j)) & 0xFFFFFFFF
+    end
+  end
+
+  return string.format('%08x', hash)
 end
 
 function ReaSpeechWorker:check_active_job()
@@ -280,6 +339,14 @@ function ReaSpeechWorker:check_active_job()
 
   local active_job = self.active_job
 
+  if active_job.retry_time then
+    -- The server was busy, so send the job again once it asked us to
+    if reaper.time_precise() < active_job.retry_time then return end
+    active_job.retry_time = nil
+    self:start_active_job()
+    return
+  end
+
   if active_job.initial_request then
     self:check_active_job_request_status()
   end
@@ -318,10 +385,30 @@ function ReaSpeechWorker:check_active_job_request_status()
   local request = active_job.initial_request
 
   if request:ready() then
-    if self:handle_job_status(active_job, request:result()) then
+    local response = request:result()
+    if active_job.media_key and response.media_hash then
+      self.media_hashes[active_job.media_key] = response.media_hash
+    end
+
+    if self:handle_job_status(active_job, response) then
       self.active_job = nil
     end
   elseif request:error() then
+    if active_job.media_hash and request.http_status == 404 then
+      -- The server no longer has the media, so send it again
+      self.media_hashes[active_job.media_key] = nil
+      self:start_active_job()
+      return
+    end
+
+    if request.http_status == 429 then
+      local delay = request.retry_after or self.DEFAULT_RETRY_SECONDS
+      self:log('Server is busy, retrying in ' .. delay .. ' seconds')
+      active_job.initial_request = nil
+      active_job.retry_time = reaper.time_precise() + delay
+      return
+    end
+
     self:handle_error(active_job, request:error())
     self.active_job = nil
   end
@@ -69,6 +69,11 @@ function ASRPlugin:asr(jobs)
     table.insert(project_entries, { item = job.item, take = job.take })
   end
 
+  -- let single items jump ahead of long runs on a shared server
+  if #consolidated_jobs > 1 then
+    data.priority = 'batch'
+  end
+
   local request = {
     data = data,
     file_uploads = {
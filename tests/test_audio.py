@@ -0,0 +1,156 @@
+from unittest import mock
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from app.util import audio
+from app.util.audio import FFMPEG_BIN, load_audio, stream_audio
+
+SR = 16000
+
+needs_ffmpeg = unittest.skipUnless(shutil.which(FFMPEG_BIN), "ffmpeg is not installed")
+
+
+def make_pcm(seconds: float) -> np.ndarray:
+    # A ramp, so samples out of place are noticed
+    return (np.arange(int(seconds * SR)) % 65536 - 32768).astype(np.int16)
+
+
+class AudioTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_raw(self, data: bytes) -> str:
+        path = os.path.join(self.directory, "audio.raw")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def write_wav(self, pcm: np.ndarray) -> str:
+        path = os.path.join(self.directory, "audio.wav")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SR)
+            f.writeframes(pcm.tobytes())
+        return path
+
+    def assertAudioEqual(self, audio: np.ndarray, pcm: np.ndarray):
+        self.assertEqual(audio.dtype, np.float32)
+        np.testing.assert_array_equal(audio, pcm / np.float32(32768))
+
+
+@needs_ffmpeg
+class LoadAudioTest(AudioTestCase):
+    def test_path(self):
+        pcm = make_pcm(3)
+        self.assertAudioEqual(load_audio(self.write_wav(pcm)), pcm)
+
+    def test_file_object(self):
+        pcm = make_pcm(3)
+        with open(self.write_wav(pcm), "rb") as f:
+            self.assertAudioEqual(load_audio(f), pcm)
+
+    def test_grows_buffer_past_estimate(self):
+        pcm = make_pcm(3)
+        with mock.patch.object(audio, "DEFAULT_BUFFER_SECONDS", 1), mock.patch.object(audio, "BLOCK_SIZE", 1001):
+            with open(self.write_wav(pcm), "rb") as f:
+                self.assertAudioEqual(load_audio(f), pcm)
+
+    def test_invalid_input(self):
+        with self.assertRaises(RuntimeError):
+            load_audio(io.BytesIO(b"not audio"))
+
+
+class RawAudioTest(AudioTestCase):
+    def test_path_is_memory_mapped(self):
+        pcm = make_pcm(3)
+        path = self.write_raw(pcm.tobytes())
+        with mock.patch.object(audio, "_read_blocks") as read_blocks:
+            self.assertAudioEqual(load_audio(path, encode=False), pcm)
+        read_blocks.assert_not_called()
+
+    def test_blocks(self):
+        pcm = make_pcm(3)
+        with mock.patch.object(audio, "BLOCK_SIZE", 1000):
+            blocks = [block.copy() for block in audio._mapped_blocks(self.write_raw(pcm.tobytes()))]
+
+        self.assertEqual(len(blocks), 96)
+        np.testing.assert_array_equal(np.concatenate(blocks), pcm)
+
+    def test_file_object(self):
+        pcm = make_pcm(3)
+        with mock.patch.object(audio, "BLOCK_SIZE", 1001):
+            self.assertAudioEqual(load_audio(io.BytesIO(pcm.tobytes()), encode=False), pcm)
+
+    def test_odd_trailing_byte_is_ignored(self):
+        pcm = make_pcm(1)
+        path = self.write_raw(pcm.tobytes() + b"\x01")
+        self.assertAudioEqual(load_audio(path, encode=False), pcm)
+        self.assertAudioEqual(load_audio(io.BytesIO(pcm.tobytes() + b"\x01"), encode=False), pcm)
+
+    def test_empty(self):
+        self.assertEqual(len(load_audio(self.write_raw(b""), encode=False)), 0)
+
+
+@needs_ffmpeg
+class StreamAudioTest(AudioTestCase):
+    def test_windows(self):
+        pcm = make_pcm(2.5)
+        windows = [window.copy() for window in stream_audio(self.write_wav(pcm), window_seconds=1)]
+
+        self.assertEqual([len(window) for window in windows], [SR, SR, SR // 2])
+        self.assertAudioEqual(np.concatenate(windows), pcm)
+
+    def test_close_early(self):
+        windows = stream_audio(self.write_wav(make_pcm(5)), window_seconds=1)
+        self.assertEqual(len(next(windows)), SR)
+        windows.close()
+
+
+class SeekTest(AudioTestCase):
+    def test_slice_blocks(self):
+        blocks = [np.arange(start, start + 10) for start in range(0, 50, 10)]
+
+        sliced = list(audio._slice_blocks(iter(blocks), 15, 20))
+        self.assertEqual([len(block) for block in sliced], [5, 10, 5])
+        np.testing.assert_array_equal(np.concatenate(sliced), np.arange(15, 35))
+
+        np.testing.assert_array_equal(np.concatenate(list(audio._slice_blocks(iter(blocks), 42, None))), np.arange(42, 50))
+        self.assertEqual(list(audio._slice_blocks(iter(blocks), 60, None)), [])
+
+    def test_raw_range(self):
+        pcm = make_pcm(3)
+        path = self.write_raw(pcm.tobytes())
+        with mock.patch.object(audio, "BLOCK_SIZE", 1001):
+            self.assertAudioEqual(load_audio(path, encode=False, start=0.5, duration=1), pcm[SR // 2:SR * 3 // 2])
+            self.assertAudioEqual(load_audio(io.BytesIO(pcm.tobytes()), encode=False, start=2.5), pcm[SR * 5 // 2:])
+
+    def test_raw_past_end(self):
+        path = self.write_raw(make_pcm(1).tobytes())
+        self.assertEqual(len(load_audio(path, encode=False, start=2)), 0)
+
+    @needs_ffmpeg
+    def test_encoded_range(self):
+        pcm = make_pcm(3)
+        path = self.write_wav(pcm)
+
+        self.assertAudioEqual(load_audio(path, start=1, duration=1), pcm[SR:SR * 2])
+        self.assertAudioEqual(load_audio(path, start=2), pcm[SR * 2:])
+        windows = list(stream_audio(path, window_seconds=1, start=0.5, duration=1.5))
+        self.assertAudioEqual(np.concatenate(windows), pcm[SR // 2:SR * 2])
+
+    @needs_ffmpeg
+    def test_encoded_past_end(self):
+        self.assertEqual(len(load_audio(self.write_wav(make_pcm(1)), start=2)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
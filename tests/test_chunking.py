@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from app.util.chunking import merge_results, shift_segment, split_on_silence
+
+SR = 16000
+
+
+class ShiftSegmentTest(unittest.TestCase):
+    def test_shift(self):
+        segment = {
+            "id": 1,
+            "seek": 0,
+            "start": 1.0,
+            "end": 2.5,
+            "text": " Hello",
+            "words": [{"word": " Hello", "start": 1.0, "end": 2.5}],
+        }
+        shifted = shift_segment(segment, 300.0)
+
+        self.assertEqual((shifted["start"], shifted["end"]), (301.0, 302.5))
+        self.assertEqual(shifted["seek"], 30000)
+        self.assertEqual((shifted["words"][0]["start"], shifted["words"][0]["end"]), (301.0, 302.5))
+        self.assertEqual(segment["start"], 1.0)
+        self.assertEqual(segment["words"][0]["start"], 1.0)
+
+    def test_negative_shift_stops_at_zero(self):
+        segment = {"seek": 50, "start": 0.5, "end": 2.0, "words": [{"start": 0.5, "end": 2.0}]}
+        shifted = shift_segment(segment, -1.0)
+
+        self.assertEqual((shifted["start"], shifted["end"]), (0, 1.0))
+        self.assertEqual(shifted["seek"], 0)
+        self.assertEqual((shifted["words"][0]["start"], shifted["words"][0]["end"]), (0, 1.0))
+
+    def test_without_seek_or_words(self):
+        self.assertEqual(shift_segment({"start": 1.0, "end": 2.0}, 1.0), {"start": 2.0, "end": 3.0})
+
+
+class MergeResultsTest(unittest.TestCase):
+    def test_merge(self):
+        results = [
+            {"language": "en", "text": " One.", "segments": [{"id": 1, "start": 0.0, "end": 1.0}]},
+            {"language": None, "text": " ", "segments": []},
+            {"language": "en", "text": " Two.", "segments": [{"id": 1, "start": 0.5, "end": 1.0}]},
+        ]
+        merged = merge_results(results, [0.0, 300.0, 600.0])
+
+        self.assertEqual(merged["language"], "en")
+        self.assertEqual(merged["text"], "One. Two.")
+        self.assertEqual(merged["segments"], [
+            {"id": 1, "start": 0.0, "end": 1.0},
+            {"id": 2, "start": 600.5, "end": 601.0},
+        ])
+
+
+class SplitOnSilenceTest(unittest.TestCase):
+    def test_short_audio_is_one_chunk(self):
+        self.assertEqual(split_on_silence(np.zeros(5 * SR, dtype=np.float32), 10, SR), [(0, 5 * SR)])
+
+    def test_splits_at_pauses(self):
+        audio = np.full(22 * SR, 0.5, dtype=np.float32)
+        audio[11 * SR:12 * SR] = 0
+        chunks = split_on_silence(audio, 10, SR)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(audio))
+        self.assertEqual(chunks[0][1], chunks[1][0])
+        self.assertTrue(11 * SR <= chunks[0][1] <= 12 * SR)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+from app.util.audio import FFMPEG_BIN
+from app.util.dedup import ENVELOPE_RATE, energy_envelope, envelope_similarity, find_duplicates
+
+
+def bursts(seconds: float, seed: int = 0) -> np.ndarray:
+    """An envelope of loud and quiet frames, so that any shift of it is told apart."""
+    return np.random.default_rng(seed).random(int(seconds * ENVELOPE_RATE)) ** 4
+
+
+def delay(envelope: np.ndarray, seconds: float) -> np.ndarray:
+    frames = int(round(seconds * ENVELOPE_RATE))
+    return np.concatenate([np.zeros(frames), envelope[:len(envelope) - frames]])
+
+
+class EnvelopeSimilarityTest(unittest.TestCase):
+    def test_identical(self):
+        envelope = bursts(10)
+        similarity, offset = envelope_similarity(envelope, envelope)
+        self.assertAlmostEqual(similarity, 1.0)
+        self.assertEqual(offset, 0.0)
+
+    def test_offset(self):
+        envelope = bursts(10)
+
+        similarity, offset = envelope_similarity(delay(envelope, 0.5), envelope)
+        self.assertGreater(similarity, 0.9)
+        self.assertAlmostEqual(offset, 0.5)
+
+        similarity, offset = envelope_similarity(envelope, delay(envelope, 1.25))
+        self.assertGreater(similarity, 0.9)
+        self.assertAlmostEqual(offset, -1.25)
+
+    def test_offset_beyond_limit(self):
+        envelope = bursts(10)
+        similarity, _ = envelope_similarity(delay(envelope, 3), envelope, max_offset=2)
+        self.assertLess(similarity, 0.5)
+
+    def test_different(self):
+        similarity, _ = envelope_similarity(bursts(10, seed=1), bursts(10, seed=2))
+        self.assertLess(similarity, 0.5)
+
+    def test_silence(self):
+        self.assertEqual(envelope_similarity(np.zeros(100), bursts(1)), (0.0, 0.0))
+        self.assertEqual(envelope_similarity(np.zeros(0), bursts(1)), (0.0, 0.0))
+
+
+class FindDuplicatesTest(unittest.TestCase):
+    def test_groups(self):
+        first = bursts(10, seed=1)
+        second = bursts(10, seed=2)
+        envelopes = [first, second, delay(first, 0.3), second, bursts(5, seed=2)]
+
+        duplicates = find_duplicates(envelopes)
+
+        self.assertEqual(duplicates[:2], [None, None])
+        self.assertEqual(duplicates[2][0], 0)
+        self.assertAlmostEqual(duplicates[2][1], 0.3)
+        self.assertEqual(duplicates[3], (1, 0.0))
+        # Too short to be the same recording
+        self.assertIsNone(duplicates[4])
+
+    def test_empty(self):
+        self.assertEqual(find_duplicates([np.zeros(0), np.zeros(0)]), [None, None])
+
+
+@unittest.skipUnless(shutil.which(FFMPEG_BIN), "ffmpeg is not installed")
+class EnergyEnvelopeTest(unittest.TestCase):
+    def test_envelope(self):
+        sr = 16000
+        # Half a second of silence, then a second of a 400 Hz tone, a whole number of cycles per frame
+        tone = np.sin(2 * np.pi * 400 * np.arange(sr) / sr) * 0.5
+        pcm = (np.concatenate([np.zeros(sr // 2), tone]) * 32767).astype(np.int16)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "audio.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(sr)
+                f.writeframes(pcm.tobytes())
+
+            envelope = energy_envelope(path, True)
+
+        self.assertEqual(len(envelope), int(1.5 * ENVELOPE_RATE))
+        np.testing.assert_allclose(envelope[:ENVELOPE_RATE // 2], 0)
+        np.testing.assert_allclose(envelope[ENVELOPE_RATE // 2:], 0.5 / np.sqrt(2), rtol=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
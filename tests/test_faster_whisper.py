@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+import unittest
+
+import numpy as np
+
+try:
+    from faster_whisper.feature_extractor import FeatureExtractor
+    from faster_whisper.transcribe import WhisperModel
+
+    from app.faster_whisper import core
+except ImportError:
+    core = None
+
+
+class FakeModel:
+    """Runs faster-whisper's language detection with a stand-in for the model's network."""
+
+    def __init__(self):
+        self.feature_extractor = FeatureExtractor()
+        self.model = SimpleNamespace(is_multilingual=True, detect_language=self.detect_tokens)
+        self.samples = []
+
+    def encode(self, features):
+        return features
+
+    def detect_tokens(self, encoder_output):
+        return [[("<|de|>", 0.3), ("<|en|>", 0.2)]]
+
+    def detect_language(self, audio):
+        self.samples.append(audio.size)
+        return WhisperModel.detect_language(self, audio)
+
+
+@unittest.skipIf(core is None, "faster-whisper engine is not installed")
+class LanguageProbabilitiesTest(unittest.TestCase):
+    def setUp(self):
+        self.model = FakeModel()
+
+        @contextmanager
+        def checkout():
+            yield self.model
+
+        patcher = mock.patch.object(core, "current", SimpleNamespace(pool=SimpleNamespace(checkout=checkout)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_probabilities(self):
+        audio = np.zeros(core.SAMPLE_RATE, dtype=np.float32)
+
+        self.assertEqual(core.language_probabilities(audio), [("de", 0.3), ("en", 0.2)])
+        self.assertEqual(self.model.samples, [core.SAMPLE_RATE])
+
+    def test_empty_audio(self):
+        audio = np.zeros(0, dtype=np.float32)
+
+        self.assertEqual(core.language_probabilities(audio), [("de", 0.3), ("en", 0.2)])
+        self.assertEqual(core.language_detection(audio), "de")
+        # Judged as a window of silence
+        self.assertEqual(self.model.samples, [30 * core.SAMPLE_RATE] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
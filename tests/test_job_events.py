@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from app.util.job_events import EVENTS_FILENAME, JobEventLog, follow_events
+
+
+def read_events(directory: str) -> list:
+    with open(os.path.join(directory, EVENTS_FILENAME)) as f:
+        return [json.loads(line) for line in f]
+
+
+class JobEventLogTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, "job")
+
+    def test_append(self):
+        log = JobEventLog(self.directory)
+        log.append("state", state="STARTED")
+        log.append("success", state="SUCCESS", result={"text": "Hello"})
+
+        events = read_events(self.directory)
+        self.assertEqual([event["event"] for event in events], ["state", "success"])
+        self.assertEqual(events[1]["result"], {"text": "Hello"})
+        self.assertIn("time", events[0])
+
+    def test_progress_adds_state_changes(self):
+        log = JobEventLog(self.directory)
+        log.append("progress", state="TRANSCRIBING", progress={"current": 1})
+        log.append("progress", state="TRANSCRIBING", progress={"current": 2})
+        log.append("progress", state="ENCODING", progress={"current": 1})
+
+        self.assertEqual(
+            [(event["event"], event["state"]) for event in read_events(self.directory)],
+            [
+                ("state", "TRANSCRIBING"),
+                ("progress", "TRANSCRIBING"),
+                ("progress", "TRANSCRIBING"),
+                ("state", "ENCODING"),
+                ("progress", "ENCODING"),
+            ])
+
+
+class FollowEventsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, EVENTS_FILENAME)
+
+    async def collect(self, finished_event=lambda: None, **kwargs) -> list:
+        events = follow_events(self.path, finished_event, poll_interval=0.01, **kwargs)
+        return [event async for event in events]
+
+    def write(self, text: str):
+        with open(self.path, "a") as f:
+            f.write(text)
+
+    async def test_follows_until_terminal_event(self):
+        async def write_later():
+            await asyncio.sleep(0.05)
+            self.write('{"event": "state", "state": "STARTED"}\n{"event": "progr')
+            await asyncio.sleep(0.05)
+            self.write('ess", "state": "STARTED"}\n')
+            await asyncio.sleep(0.05)
+            self.write('{"event": "success", "state": "SUCCESS"}\n{"event": "ignored"}\n')
+
+        writer = asyncio.create_task(write_later())
+        events = await asyncio.wait_for(self.collect(), 5)
+        await writer
+
+        self.assertEqual([event["event"] for event in events], ["state", "progress", "success"])
+
+    async def test_finished_without_terminal_event(self):
+        self.write('{"event": "state", "state": "PENDING"}\n')
+        finished = {"event": "failure", "state": "FAILURE", "error": "expired"}
+
+        events = await asyncio.wait_for(self.collect(lambda: finished, check_interval=0.05), 5)
+
+        self.assertEqual(events, [{"event": "state", "state": "PENDING"}, finished])
+
+    async def test_checks_quiet_jobs_until_finished(self):
+        checks = []
+
+        def finished_event():
+            checks.append(1)
+            return {"event": "revoked"} if len(checks) == 3 else None
+
+        events = await asyncio.wait_for(self.collect(finished_event, check_interval=0.02), 5)
+
+        self.assertEqual(events, [{"event": "revoked"}])
+        self.assertEqual(len(checks), 3)
+
+    async def test_timeout(self):
+        self.write('{"event": "state", "state": "STARTED"}\n')
+        events = []
+
+        with self.assertRaises(asyncio.TimeoutError):
+            async for event in follow_events(self.path, lambda: None, poll_interval=0.01, timeout=0.1):
+                events.append(event)
+
+        self.assertEqual(events, [{"event": "state", "state": "STARTED"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
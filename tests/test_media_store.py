@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+
+from app.util import media_store
+from app.util.media_store import MediaStore
+
+
+def media_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class MediaStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.store = MediaStore(self.directory, 100)
+
+    def add(self, data: bytes) -> str:
+        path = self.store.upload_path()
+        with open(path, "wb") as f:
+            f.write(data)
+        self.store.add(path, media_hash(data))
+        return media_hash(data)
+
+    def test_add_and_checkout(self):
+        stored = self.add(b"audio")
+        self.assertEqual(self.store.size(stored), 5)
+
+        job_path = self.store.checkout(stored)
+        with open(job_path, "rb") as f:
+            self.assertEqual(f.read(), b"audio")
+
+        # The job may delete its link without affecting the store
+        os.remove(job_path)
+        self.assertEqual(self.store.size(stored), 5)
+
+    def test_unknown_media(self):
+        self.assertIsNone(self.store.size(media_hash(b"missing")))
+        self.assertIsNone(self.store.checkout(media_hash(b"missing")))
+
+    def test_invalid_hash(self):
+        self.add(b"audio")
+        self.assertIsNone(self.store.size("../" + media_hash(b"audio")))
+        self.assertIsNone(self.store.checkout("upload"))
+
+    def test_evicts_least_recently_used(self):
+        first = self.add(b"a" * 40)
+        second = self.add(b"b" * 40)
+        # Checking out media marks it as used
+        old = time.time() - 60
+        os.utime(self.store.path(first), (old, old))
+        os.utime(self.store.path(second), (old - 60, old - 60))
+        os.remove(self.store.checkout(first))
+
+        third = self.add(b"c" * 40)
+
+        self.assertIsNotNone(self.store.size(first))
+        self.assertIsNone(self.store.size(second))
+        self.assertIsNotNone(self.store.size(third))
+
+    def test_keeps_new_media_over_budget(self):
+        large = self.add(b"a" * 200)
+        self.assertEqual(self.store.size(large), 200)
+
+    def test_job_links_outlive_eviction(self):
+        first = self.add(b"a" * 60)
+        job_path = self.store.checkout(first)
+        old = time.time() - 60
+        os.utime(self.store.path(first), (old, old))
+
+        self.add(b"b" * 60)
+
+        self.assertIsNone(self.store.size(first))
+        with open(job_path, "rb") as f:
+            self.assertEqual(f.read(), b"a" * 60)
+
+    def test_removes_stale_files(self):
+        stale_path = self.store.upload_path()
+        stale = time.time() - media_store.STALE_SECONDS - 60
+        os.utime(stale_path, (stale, stale))
+        fresh_path = self.store.upload_path()
+
+        self.add(b"audio")
+
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertTrue(os.path.exists(fresh_path))
+
+    def test_disabled(self):
+        self.assertTrue(self.store.enabled)
+        self.assertFalse(MediaStore(self.directory, 0).enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
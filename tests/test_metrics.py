@@ -0,0 +1,77 @@
+import unittest
+
+from app.util.metrics import WorkerMetrics, render_metrics
+
+SCHEDULER_STATS = {"queued": {"detect": 0, "interactive": 2, "batch": 1}, "clients": 2}
+
+
+class WorkerMetricsTest(unittest.TestCase):
+    def test_snapshot(self):
+        metrics = WorkerMetrics(buckets=(1, 10))
+        metrics.observe_job("transcribe", "SUCCESS", {"decode": {"wall": 0.5, "cpu": 0.25}, "inference": {"wall": 5.0}})
+        metrics.observe_job("transcribe", "SUCCESS", {"decode": {"wall": 2.0, "cpu": 1.0}})
+        metrics.observe_job("transcribe", "FAILURE", {})
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot["buckets"], [1, 10])
+        self.assertEqual(snapshot["jobs"], {"transcribe:SUCCESS": 2, "transcribe:FAILURE": 1})
+        self.assertEqual(snapshot["stages"]["decode"], {"buckets": [1, 2], "count": 2, "sum": 2.5, "cpu": 1.25})
+        self.assertEqual(snapshot["stages"]["inference"], {"buckets": [0, 1], "count": 1, "sum": 5.0, "cpu": 0.0})
+
+    def test_snapshot_is_a_copy(self):
+        metrics = WorkerMetrics(buckets=(1,))
+        metrics.observe_job("transcribe", "SUCCESS", {"decode": {"wall": 0.5}})
+        snapshot = metrics.snapshot()
+        metrics.observe_job("transcribe", "SUCCESS", {"decode": {"wall": 0.5}})
+
+        self.assertEqual(snapshot["stages"]["decode"]["buckets"], [1])
+        self.assertEqual(snapshot["jobs"], {"transcribe:SUCCESS": 1})
+
+
+class RenderMetricsTest(unittest.TestCase):
+    def test_render(self):
+        metrics = WorkerMetrics(buckets=(1, 10))
+        metrics.observe_job("detect_language", "SUCCESS", {"inference": {"wall": 0.5, "cpu": 0.25}})
+        workers = [{
+            "name": 'node "1"',
+            "active": 1,
+            "capacity": 2,
+            "model_cache": {"models": ["small"], "memory_used_mb": 1.5, "hits": 3, "misses": 1, "evictions": 0},
+            "metrics": metrics.snapshot(),
+        }]
+
+        lines = render_metrics(workers, SCHEDULER_STATS).splitlines()
+
+        for line in [
+            "# TYPE reaspeech_queued_jobs gauge",
+            'reaspeech_queued_jobs{job_class="interactive"} 2',
+            "reaspeech_queued_clients 2",
+            "reaspeech_workers 1",
+            'reaspeech_worker_active_jobs{worker="node \\"1\\""} 1',
+            'reaspeech_model_cache_memory_bytes{worker="node \\"1\\""} 1572864',
+            'reaspeech_model_cache_hits_total{worker="node \\"1\\""} 3',
+            'reaspeech_jobs_total{worker="node \\"1\\"",task="detect_language",status="SUCCESS"} 1',
+            "# TYPE reaspeech_stage_seconds histogram",
+            'reaspeech_stage_seconds_bucket{worker="node \\"1\\"",stage="inference",le="1"} 1',
+            'reaspeech_stage_seconds_bucket{worker="node \\"1\\"",stage="inference",le="+Inf"} 1',
+            'reaspeech_stage_seconds_sum{worker="node \\"1\\"",stage="inference"} 0.5',
+            'reaspeech_stage_cpu_seconds_total{worker="node \\"1\\"",stage="inference"} 0.25',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_large_values_are_exact(self):
+        workers = [{"name": "node-1", "active": 0, "capacity": 1, "model_cache": {
+            "models": [], "memory_used_mb": 1500.25, "hits": 12345678, "misses": 0, "evictions": 0}}]
+
+        text = render_metrics(workers, SCHEDULER_STATS)
+
+        self.assertIn('reaspeech_model_cache_memory_bytes{worker="node-1"} 1573126144\n', text)
+        self.assertIn('reaspeech_model_cache_hits_total{worker="node-1"} 12345678\n', text)
+
+    def test_no_workers(self):
+        text = render_metrics([], SCHEDULER_STATS)
+
+        self.assertIn("reaspeech_workers 0\n", text)
+        self.assertNotIn("reaspeech_jobs_total{", text)
+        self.assertTrue(text.endswith("\n"))
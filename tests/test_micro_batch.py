@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+import unittest
+
+from app.util.micro_batch import MicroBatcher
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.executor = ThreadPoolExecutor(4)
+        self.addCleanup(self.executor.shutdown)
+
+    def run_batch(self, key, items: list) -> list:
+        self.batches.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+    def submit_all(self, batcher: MicroBatcher, calls: list) -> list:
+        futures = []
+        for key, item in calls:
+            futures.append(self.executor.submit(batcher.submit, key, item))
+            time.sleep(0.01)
+        return [future.result(5) for future in futures]
+
+    def test_batches_concurrent_calls(self):
+        batcher = MicroBatcher(self.run_batch, max_size=8, max_wait=0.2)
+
+        results = self.submit_all(batcher, [("small", 1), ("small", 2), ("large", 3), ("small", 4)])
+
+        self.assertEqual(results, ["small:1", "small:2", "large:3", "small:4"])
+        self.assertEqual(sorted(self.batches), [("large", [3]), ("small", [1, 2, 4])])
+
+    def test_full_batch_runs_early(self):
+        batcher = MicroBatcher(self.run_batch, max_size=2, max_wait=60)
+
+        started = time.monotonic()
+        results = self.submit_all(batcher, [("small", 1), ("small", 2)])
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(results, ["small:1", "small:2"])
+        self.assertEqual(self.batches, [("small", [1, 2])])
+
+    def test_later_calls_start_new_batch(self):
+        batcher = MicroBatcher(self.run_batch, max_size=8, max_wait=0.05)
+
+        self.assertEqual(batcher.submit("small", 1), "small:1")
+        self.assertEqual(batcher.submit("small", 2), "small:2")
+        self.assertEqual(self.batches, [("small", [1]), ("small", [2])])
+
+    def test_errors_reach_every_caller(self):
+        def run_batch(key, items):
+            raise RuntimeError("Out of memory")
+
+        batcher = MicroBatcher(run_batch, max_size=2, max_wait=5)
+        futures = [self.executor.submit(batcher.submit, "small", item) for item in (1, 2)]
+
+        for future in futures:
+            with self.assertRaisesRegex(RuntimeError, "Out of memory"):
+                future.result(5)
+
+    def test_enabled(self):
+        self.assertTrue(MicroBatcher(self.run_batch, max_size=2, max_wait=0).enabled)
+        self.assertFalse(MicroBatcher(self.run_batch, max_size=1, max_wait=0).enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
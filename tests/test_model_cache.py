@@ -0,0 +1,111 @@
+from threading import Event, Thread
+import unittest
+
+from app.util.model_cache import MEGABYTE, ModelCache, ModelKey, estimate_model_size
+
+TINY = ModelKey("tiny", "cpu", "int8")
+BASE = ModelKey("base", "cpu", "int8")
+SMALL = ModelKey("small", "cpu", "int8")
+
+
+def loader():
+    return object()
+
+
+class ModelCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ModelCache(estimate_model_size(TINY) + estimate_model_size(SMALL))
+        cache.get(TINY, loader)
+        cache.get(BASE, loader)
+        cache.get(TINY, loader)
+        cache.get(SMALL, loader)
+
+        self.assertEqual(cache.keys(), [TINY, SMALL])
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (1, 3, 1))
+
+    def test_keeps_latest_model_over_budget(self):
+        cache = ModelCache(0)
+        cache.get(TINY, loader)
+        cache.get(SMALL, loader)
+
+        self.assertEqual(cache.keys(), [SMALL])
+        self.assertEqual(cache.stats()["memory_used_mb"], estimate_model_size(SMALL) // MEGABYTE)
+
+    def test_pinned_models_are_kept(self):
+        cache = ModelCache(0)
+        cache.get(TINY, loader)
+        cache.pin(TINY)
+        cache.get(BASE, loader)
+        cache.get(SMALL, loader)
+
+        self.assertEqual(cache.keys(), [TINY, SMALL])
+        self.assertEqual(cache.stats()["pinned"], ["tiny"])
+
+    def test_models_in_use_are_kept(self):
+        cache = ModelCache(0)
+        pool = cache.get(TINY, loader)
+        with pool.checkout():
+            cache.get(BASE, loader)
+            self.assertEqual(cache.keys(), [TINY, BASE])
+
+        cache.get(SMALL, loader)
+        self.assertEqual(cache.keys(), [SMALL])
+
+    def test_models_held_by_a_job_are_kept(self):
+        cache = ModelCache(0)
+        with cache.job():
+            cache.get(TINY, loader)
+            cache.get(BASE, loader)
+            self.assertEqual(cache.keys(), [TINY, BASE])
+
+        cache.get(SMALL, loader)
+        self.assertEqual(cache.keys(), [SMALL])
+
+    def test_failed_load_is_not_cached(self):
+        def fail():
+            raise OSError("missing")
+
+        cache = ModelCache(0)
+        with self.assertRaises(OSError):
+            cache.get(TINY, fail)
+
+        self.assertEqual(cache.keys(), [])
+        cache.get(TINY, loader)
+        self.assertEqual(cache.keys(), [TINY])
+
+    def test_hits_dont_wait_for_other_loads(self):
+        cache = ModelCache(estimate_model_size(TINY) + estimate_model_size(SMALL))
+        cache.get(TINY, loader)
+
+        loading, release = Event(), Event()
+
+        def slow_loader():
+            loading.set()
+            release.wait(5)
+            return object()
+
+        thread = Thread(target=cache.get, args=(SMALL, slow_loader))
+        thread.start()
+        try:
+            self.assertTrue(loading.wait(5))
+            cache.get(TINY, loader)
+            self.assertEqual(cache.hits, 1)
+        finally:
+            release.set()
+            thread.join()
+
+    def test_replicas(self):
+        cache = ModelCache(0)
+        loads = []
+        pool = cache.get(TINY, lambda: loads.append(1) or object(), replicas=2)
+
+        with pool.checkout() as first, pool.checkout() as second:
+            self.assertIsNot(first, second)
+        with pool.checkout():
+            pass
+
+        self.assertEqual(len(loads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+from unittest import mock
+import os
+import pstats
+import tempfile
+import unittest
+
+from app.util import profiling
+from app.util.profiling import PROFILE_FILENAME, SUMMARY_FILENAME, profiled
+
+
+def profiled_function():
+    return sum(range(1000))
+
+
+class ProfiledTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, "job")
+
+    def test_writes_profile(self):
+        with profiled(self.directory) as files:
+            profiled_function()
+
+        self.assertEqual(files, {"summary": SUMMARY_FILENAME, "profile": PROFILE_FILENAME})
+        with open(os.path.join(self.directory, SUMMARY_FILENAME)) as f:
+            self.assertIn("profiled_function", f.read())
+        stats = pstats.Stats(os.path.join(self.directory, PROFILE_FILENAME))
+        self.assertIn("profiled_function", [name for _, _, name in stats.stats])
+
+    def test_large_profile_is_not_written(self):
+        with mock.patch.object(profiling, "MAX_PROFILE_MB", 0):
+            with self.assertLogs("app.util.profiling", "WARNING"):
+                with profiled(self.directory) as files:
+                    profiled_function()
+
+        self.assertEqual(files, {"summary": SUMMARY_FILENAME})
+        self.assertEqual(os.listdir(self.directory), [SUMMARY_FILENAME])
+
+    def test_writes_profile_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with profiled(self.directory):
+                raise RuntimeError("Failed")
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory, SUMMARY_FILENAME)))
+
+    def test_write_errors_are_logged(self):
+        with open(self.directory, "w"):
+            pass
+
+        with self.assertLogs("app.util.profiling", "ERROR"):
+            with profiled(self.directory) as files:
+                profiled_function()
+
+        self.assertEqual(files, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import time
+import unittest
+
+from app.util.progress import ProgressReporter
+
+
+class ProgressReporterTest(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+
+    def reporter(self, **kwargs) -> ProgressReporter:
+        reporter = ProgressReporter(self.reports.append, **kwargs)
+        self.addCleanup(reporter.close)
+        return reporter
+
+    def wait_for_reports(self, count: int):
+        deadline = time.monotonic() + 5
+        while len(self.reports) < count:
+            if time.monotonic() > deadline:
+                self.fail(f"Only {len(self.reports)} of {count} reports were made")
+            time.sleep(0.01)
+
+    def progress(self) -> list:
+        return [(report["units"], report["total"], report["current"]) for report in self.reports]
+
+    def test_coalesces_updates_within_interval(self):
+        progress = self.reporter(min_interval=0.2, min_delta=0)
+        progress("frames", 100, 1)
+        self.wait_for_reports(1)
+        for current in range(2, 51):
+            progress("frames", 100, current)
+
+        self.wait_for_reports(2)
+        time.sleep(0.1)
+        self.assertEqual(self.progress(), [("frames", 100, 1), ("frames", 100, 50)])
+
+    def test_waits_for_minimum_advance(self):
+        progress = self.reporter(min_interval=0, min_delta=0.1)
+        progress("frames", 100, 0)
+        self.wait_for_reports(1)
+        progress("frames", 100, 5)
+        time.sleep(0.1)
+        self.assertEqual(len(self.reports), 1)
+
+        progress("frames", 100, 10)
+        self.wait_for_reports(2)
+        self.assertEqual(self.progress()[-1], ("frames", 100, 10))
+
+    def test_always_reports_completion_and_new_units(self):
+        progress = self.reporter(min_interval=0, min_delta=0.5)
+        progress("frames", 100, 90)
+        self.wait_for_reports(1)
+        progress("frames", 100, 100)
+        self.wait_for_reports(2)
+        progress("chunks", 4, 0)
+        self.wait_for_reports(3)
+
+        self.assertEqual(self.progress(), [("frames", 100, 90), ("frames", 100, 100), ("chunks", 4, 0)])
+
+    def test_close_reports_latest(self):
+        progress = ProgressReporter(self.reports.append, min_interval=60, min_delta=0)
+        progress("frames", 100, 1)
+        self.wait_for_reports(1)
+        progress("frames", 100, 2)
+        progress.close()
+
+        self.assertEqual(self.progress(), [("frames", 100, 1), ("frames", 100, 2)])
+
+    def test_eta(self):
+        progress = ProgressReporter(self.reports.append, min_interval=0, min_delta=0)
+        time.sleep(0.1)
+        progress("frames", 100, 50)
+        progress.close()
+
+        report = self.reports[0]
+        self.assertGreater(report["elapsed"], 0)
+        self.assertAlmostEqual(report["eta"], report["elapsed"], delta=0.1)
+
+    def test_report_errors_are_ignored(self):
+        def report(progress):
+            self.reports.append(progress)
+            raise RuntimeError("Broken")
+
+        with self.assertLogs("app.util.progress", "ERROR") as logs:
+            progress = ProgressReporter(report, min_interval=0, min_delta=0)
+            progress("frames", 100, 1)
+            self.wait_for_reports(1)
+            progress("frames", 100, 2)
+            progress.close()
+
+        self.assertEqual(len(logs.records), 2)
+
+        self.assertEqual(len(self.reports), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
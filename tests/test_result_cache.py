@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from app.util.result_cache import ResultCache
+
+RESULT = {"language": "en", "text": " Hello.", "segments": [{"id": 1, "start": 0.0, "end": 1.0, "text": " Hello."}]}
+
+
+class ResultCacheKeyTest(unittest.TestCase):
+    def test_ignores_unset_options_and_order(self):
+        self.assertEqual(
+            ResultCache.key("abc", "faster_whisper", "small", {"language": "en", "task": "transcribe", "initial_prompt": None}),
+            ResultCache.key("abc", "faster_whisper", "small", {"task": "transcribe", "language": "en", "hotwords": ""}),
+        )
+
+    def test_depends_on_audio_engine_model_and_options(self):
+        key = ResultCache.key("abc", "faster_whisper", "small", {"language": "en"})
+        self.assertNotEqual(key, ResultCache.key("abd", "faster_whisper", "small", {"language": "en"}))
+        self.assertNotEqual(key, ResultCache.key("abc", "openai_whisper", "small", {"language": "en"}))
+        self.assertNotEqual(key, ResultCache.key("abc", "faster_whisper", "large-v3", {"language": "en"}))
+        self.assertNotEqual(key, ResultCache.key("abc", "faster_whisper", "small", {"language": "de"}))
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache", "results.sqlite")
+
+    def test_put_and_get(self):
+        cache = ResultCache(self.path, 1024 * 1024)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", RESULT)
+
+        self.assertEqual(cache.get("a"), RESULT)
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (1, 1, 1))
+
+    def test_evicts_least_recently_used(self):
+        # Room for about two entries
+        cache = ResultCache(self.path, 250)
+        results = {key: dict(RESULT, text=f" {key * 50}") for key in "abc"}
+        cache.put("a", results["a"])
+        cache.put("b", results["b"])
+        cache.get("a")
+        cache.put("c", results["c"])
+
+        self.assertEqual(cache.get("a"), results["a"])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), results["c"])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_disabled(self):
+        self.assertEqual(ResultCache(self.path, 0).stats(), {"enabled": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from app.util.scheduler import DEFAULT_RETRY_AFTER, JobScheduler, QueueFull
+
+
+class JobSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.slots = None
+        self.sent = []
+        self.scheduler = JobScheduler(lambda: self.slots, max_queued=10, max_client_queued=5)
+
+    def submit(self, job_class, client, job_id, **kwargs):
+        self.scheduler.admit(client)
+        self.scheduler.submit(job_class, client, job_id, lambda: self.sent.append(job_id), **kwargs)
+
+    async def wait_for_sent(self, count):
+        for _ in range(200):
+            if len(self.sent) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"Only {self.sent} were sent")
+
+    async def test_classes_and_clients_take_turns(self):
+        self.submit("batch", "c", "c1")
+        self.submit("interactive", "a", "a1")
+        self.submit("interactive", "a", "a2")
+        self.submit("interactive", "a", "a3")
+        self.submit("interactive", "b", "b1")
+        self.submit("detect", "b", "b2")
+
+        await self.wait_for_sent(6)
+        self.assertEqual(self.sent, ["b2", "a1", "b1", "a2", "a3", "c1"])
+
+    async def test_waits_for_free_slots(self):
+        self.slots = (0, 2)
+        self.submit("interactive", "a", "a1")
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.sent, [])
+        self.assertTrue(self.scheduler.is_queued("a1"))
+
+        self.slots = (2, 2)
+        await self.wait_for_sent(1)
+        self.assertEqual(self.sent, ["a1"])
+        self.assertFalse(self.scheduler.is_queued("a1"))
+
+    async def test_batch_jobs_leave_interactive_slots(self):
+        self.slots = (1, 2)
+        self.submit("batch", "a", "a1")
+        self.submit("interactive", "b", "b1")
+
+        await self.wait_for_sent(1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.sent, ["b1"])
+        self.assertEqual(self.scheduler.stats()["queued"], {"detect": 0, "interactive": 0, "batch": 1})
+
+    async def test_queue_limits(self):
+        self.slots = (0, 1)
+        for i in range(5):
+            self.submit("interactive", "a", f"a{i}")
+        with self.assertRaises(QueueFull) as raised:
+            self.scheduler.admit("a")
+        self.assertEqual(raised.exception.retry_after, DEFAULT_RETRY_AFTER)
+
+        for i in range(5):
+            self.submit("interactive", "b", f"b{i}")
+        with self.assertRaises(QueueFull):
+            self.scheduler.admit("c")
+
+    async def test_cancel(self):
+        self.slots = (0, 1)
+        cancelled = []
+        self.submit("interactive", "a", "a1", cancel=lambda: cancelled.append("a1"))
+
+        self.assertTrue(self.scheduler.cancel("a1"))
+        self.assertFalse(self.scheduler.cancel("a1"))
+        self.assertEqual(cancelled, ["a1"])
+        self.assertEqual(self.scheduler.stats(), {"queued": {"detect": 0, "interactive": 0, "batch": 0}, "clients": 0})
+
+        self.slots = (1, 1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
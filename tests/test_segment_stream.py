@@ -0,0 +1,40 @@
+import json
+import unittest
+
+from app.util.segment_stream import format_segment, format_timestamp, stream_header
+
+SEGMENT = {"id": 1, "start": 3661.5, "end": 3663.25, "text": " Hello --> there\tyou"}
+
+
+class SegmentStreamTest(unittest.TestCase):
+    def test_format_timestamp(self):
+        self.assertEqual(format_timestamp(0), "00:00.000")
+        self.assertEqual(format_timestamp(3661.5), "01:01:01.500")
+        self.assertEqual(format_timestamp(1.5, always_include_hours=True, decimal_marker=","), "00:00:01,500")
+
+    def test_headers(self):
+        self.assertEqual(stream_header("vtt"), "WEBVTT\n\n")
+        self.assertEqual(stream_header("tsv"), "start\tend\ttext\n")
+        self.assertEqual(stream_header("srt"), "")
+        self.assertEqual(stream_header("json"), "")
+
+    def test_txt(self):
+        self.assertEqual(format_segment(SEGMENT, 1, "txt"), "Hello --> there\tyou\n")
+
+    def test_srt(self):
+        self.assertEqual(format_segment(SEGMENT, 2, "srt"), "2\n01:01:01,500 --> 01:01:03,250\nHello -> there\tyou\n\n")
+
+    def test_vtt(self):
+        self.assertEqual(format_segment(SEGMENT, 2, "vtt"), "01:01:01.500 --> 01:01:03.250\nHello -> there\tyou\n\n")
+
+    def test_tsv(self):
+        self.assertEqual(format_segment(SEGMENT, 2, "tsv"), "3661500\t3663250\tHello --> there you\n")
+
+    def test_json(self):
+        line = format_segment(SEGMENT, 2, "json")
+        self.assertTrue(line.endswith("\n"))
+        self.assertEqual(json.loads(line), SEGMENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
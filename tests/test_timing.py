@@ -0,0 +1,48 @@
+from unittest import mock
+import time
+import unittest
+
+from app.util import timing
+from app.util.timing import JobTimings
+
+
+class JobTimingsTest(unittest.TestCase):
+    def test_stage(self):
+        timings = JobTimings()
+        with timings.stage("decode"):
+            time.sleep(0.05)
+
+        stage = timings.as_dict()["decode"]
+        self.assertGreaterEqual(stage["wall"], 0.05)
+        self.assertIn("cpu", stage)
+        self.assertGreater(stage["peak_rss_mb"], 0)
+
+    def test_process_peak_rss(self):
+        timings = JobTimings(per_stage_rss=False)
+        with mock.patch.object(timing, "reset_peak_rss") as reset_peak_rss:
+            with timings.stage("inference"):
+                pass
+
+        reset_peak_rss.assert_not_called()
+        self.assertEqual(set(timings.as_dict()["inference"]), {"wall", "cpu", "process_peak_rss_mb"})
+
+    def test_stages_add_up(self):
+        timings = JobTimings()
+        timings.add("inference", 1.0, 0.5, 100)
+        timings.add("inference", 2.0, 1.5, 50)
+
+        self.assertEqual(timings.as_dict(), {"inference": {"wall": 3.0, "cpu": 2.0, "peak_rss_mb": 100}})
+
+    def test_order(self):
+        timings = JobTimings({"upload": {"wall": 0.5}})
+        timings.add("write", 0.1)
+        timings.add("custom", 0.1)
+        timings.add("queue_wait", 0.1)
+        timings.add("decode", 0.1)
+
+        self.assertEqual(list(timings.as_dict()), ["queue_wait", "upload", "decode", "write", "custom"])
+
+    def test_initial_stages_are_copied(self):
+        stages = {"upload": {"wall": 0.5}}
+        JobTimings(stages).add("upload", 0.5)
+        self.assertEqual(stages, {"upload": {"wall": 0.5}})
@@ -0,0 +1,86 @@
+from unittest import mock
+import unittest
+
+import numpy as np
+
+from app.util import vad
+from app.util.vad import GAP_SECONDS, SpeechTimeline, compact_speech
+
+SR = 16000
+
+
+class SpeechTimelineTest(unittest.TestCase):
+    def setUp(self):
+        # Speech at 2-3s and 10-12s, compacted with a gap between them
+        self.timeline = SpeechTimeline([(0.0, 2.0, 1.0), (1.2, 10.0, 2.0)])
+
+    def test_restore(self):
+        self.assertEqual(self.timeline.restore(0.0), 2.0)
+        self.assertAlmostEqual(self.timeline.restore(0.5), 2.5)
+        self.assertAlmostEqual(self.timeline.restore(1.2), 10.0)
+        self.assertAlmostEqual(self.timeline.restore(2.7), 11.5)
+
+    def test_restore_in_gap(self):
+        # Times in the gap belong to the region before it
+        self.assertAlmostEqual(self.timeline.restore(1.1), 3.1)
+
+    def test_restore_segment(self):
+        segment = {
+            "id": 1,
+            "seek": 50,
+            "start": 0.5,
+            "end": 1.5,
+            "text": " Hello",
+            "words": [{"word": " Hello", "start": 0.5, "end": 1.5}],
+        }
+        restored = self.timeline.restore_segment(segment)
+
+        self.assertAlmostEqual(restored["start"], 2.5)
+        self.assertAlmostEqual(restored["end"], 10.3)
+        self.assertEqual(restored["seek"], 250)
+        self.assertAlmostEqual(restored["words"][0]["start"], 2.5)
+        self.assertAlmostEqual(restored["words"][0]["end"], 10.3)
+        self.assertEqual(segment["start"], 0.5)
+
+    def test_clips(self):
+        self.assertEqual(self.timeline.clips(), [(0.0, 1.0), (1.2, 3.2)])
+        self.assertEqual(SpeechTimeline([(0.0, 0.0, 0.0)]).clips(), [])
+
+
+class CompactSpeechTest(unittest.TestCase):
+    def test_removes_silence(self):
+        audio = np.zeros(20 * SR, dtype=np.float32)
+        audio[2 * SR:3 * SR] = 0.5
+        audio[10 * SR:12 * SR] = 0.25
+
+        with mock.patch.object(vad, "speech_regions", return_value=[(2 * SR, 3 * SR), (10 * SR, 12 * SR)]):
+            compacted, timeline = compact_speech(audio, SR)
+
+        self.assertEqual(len(compacted), 3 * SR + int(GAP_SECONDS * SR))
+        self.assertEqual(compacted[0], 0.5)
+        self.assertEqual(compacted[-1], 0.25)
+        self.assertAlmostEqual(timeline.restore(0.5), 2.5)
+        self.assertAlmostEqual(timeline.restore(1.0 + GAP_SECONDS + 1.5), 11.5)
+
+    def test_keeps_audio_with_little_silence(self):
+        audio = np.ones(10 * SR, dtype=np.float32)
+
+        with mock.patch.object(vad, "speech_regions", return_value=[(0, 10 * SR)]):
+            compacted, timeline = compact_speech(audio, SR)
+
+        self.assertIs(compacted, audio)
+        self.assertEqual(timeline.restore(4.0), 4.0)
+        self.assertEqual(timeline.clips(), [(0.0, 10.0)])
+
+    def test_no_speech(self):
+        audio = np.zeros(10 * SR, dtype=np.float32)
+
+        with mock.patch.object(vad, "speech_regions", return_value=[]):
+            compacted, timeline = compact_speech(audio, SR)
+
+        self.assertEqual(len(compacted), 0)
+        self.assertEqual(timeline.clips(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
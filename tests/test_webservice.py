@@ -0,0 +1,406 @@
+from unittest import mock
+import hashlib
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+from app import webservice
+from app.util.job_events import JobEventLog
+from app.util.media_store import MediaStore
+from app.util.scheduler import JobScheduler
+
+
+class WebserviceTestCase(unittest.TestCase):
+    """
+    Runs requests against the webservice with jobs recorded instead of sent
+    to Celery, and the media store and job output in a temporary directory.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.sent = []
+        # Called with each job as it is sent, standing in for a worker
+        self.run_job = None
+        self.workers = []
+        self.media_store = MediaStore(os.path.join(self.directory, "media"), 1024 * 1024)
+        for name, value in {
+            "output_directory": os.path.join(self.directory, "output"),
+            "media_store": self.media_store,
+            "scheduler": JobScheduler(lambda: None),
+            "send_job": self.send_job,
+            "read_workers": lambda: self.workers,
+        }.items():
+            patcher = mock.patch.object(webservice, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Entered, so requests share one event loop for the scheduler to run in
+        self.client = TestClient(webservice.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def send_job(self, task_name: str, args: list, model_name: str, **options):
+        self.sent.append((task_name, args, options))
+        if self.run_job:
+            self.run_job(JobEventLog(os.path.join(webservice.output_directory, options["task_id"])), args)
+
+    def wait_for_sent(self, count: int):
+        deadline = time.monotonic() + 5
+        while len(self.sent) < count:
+            if time.monotonic() > deadline:
+                self.fail(f"Only {len(self.sent)} of {count} jobs were sent")
+            time.sleep(0.01)
+
+
+class MediaTest(WebserviceTestCase):
+    def upload(self, data: bytes) -> dict:
+        response = self.client.post("/media", files={"audio_file": ("audio.wav", data)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_upload(self):
+        self.assertEqual(self.upload(b"audio"), {"media_hash": hashlib.sha256(b"audio").hexdigest(), "size": 5})
+
+    def test_info(self):
+        media_hash = self.upload(b"audio")["media_hash"]
+
+        response = self.client.get(f"/media/{media_hash}")
+        self.assertEqual(response.json(), {"media_hash": media_hash, "size": 5})
+        self.assertEqual(self.client.head(f"/media/{media_hash}").status_code, 200)
+        self.assertEqual(self.client.get(f"/media/{hashlib.sha256(b'other').hexdigest()}").status_code, 404)
+
+    def test_asr_with_media_hash(self):
+        media_hash = self.upload(b"audio")["media_hash"]
+
+        response = self.client.post("/asr", params={"media_hash": media_hash, "use_async": True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["media_hash"], media_hash)
+
+        self.wait_for_sent(1)
+        task_name, args, options = self.sent[0]
+        self.assertEqual(task_name, "transcribe")
+        self.assertEqual(options["task_id"], response.json()["job_id"])
+        with open(args[0], "rb") as f:
+            self.assertEqual(f.read(), b"audio")
+        self.assertEqual(args[3], media_hash)
+
+    def test_asr_upload_is_stored(self):
+        response = self.client.post("/asr", params={"use_async": True}, files={"audio_file": ("audio.wav", b"audio")})
+        media_hash = response.json()["media_hash"]
+
+        self.assertEqual(media_hash, hashlib.sha256(b"audio").hexdigest())
+        self.assertEqual(self.client.get(f"/media/{media_hash}").status_code, 200)
+
+    def test_asr_with_unknown_media_hash(self):
+        response = self.client.post("/asr", params={"media_hash": hashlib.sha256(b"other").hexdigest(), "use_async": True})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.sent, [])
+
+    def test_disabled(self):
+        with mock.patch.object(webservice, "media_store", MediaStore(self.media_store.directory, 0)):
+            self.assertEqual(self.client.post("/media", files={"audio_file": ("audio.wav", b"audio")}).status_code, 501)
+
+            response = self.client.post("/asr", params={"use_async": True}, files={"audio_file": ("audio.wav", b"audio")})
+            self.assertIsNone(response.json()["media_hash"])
+
+        self.wait_for_sent(1)
+        os.remove(self.sent[0][1][0])
+
+
+class JobEventsTest(WebserviceTestCase):
+    def read_stream(self, job_id: str) -> list:
+        response = self.client.get(f"/jobs/{job_id}/events")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+
+        events = []
+        for message in response.text.split("\n\n"):
+            if message:
+                name, data = message.split("\n")
+                events.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+    def test_streams_logged_events(self):
+        log = JobEventLog(os.path.join(webservice.output_directory, "job-1"))
+        log.append("progress", state="TRANSCRIBING", progress={"current": 1, "total": 2})
+        log.append("success", state="SUCCESS", result={"output_filename": "audio.txt"})
+
+        events = self.read_stream("job-1")
+
+        self.assertEqual([name for name, _ in events], ["state", "progress", "success"])
+        self.assertEqual(events[1][1]["progress"], {"current": 1, "total": 2})
+        self.assertEqual(events[2][1]["result"], {"output_filename": "audio.txt"})
+
+    def test_revoked_job(self):
+        with mock.patch.object(webservice.celery, "AsyncResult") as async_result:
+            async_result.return_value.status = "REVOKED"
+            self.assertEqual(self.client.delete("/jobs/job-1").status_code, 200)
+
+        self.assertEqual([name for name, _ in self.read_stream("job-1")], ["revoked"])
+
+    def test_invalid_job_id(self):
+        response = self.client.get("/jobs/job.1/events")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": "Job not found: job.1"})
+
+
+class SyncAsrTest(WebserviceTestCase):
+    def test_result(self):
+        def run_job(log, args):
+            os.remove(args[0])
+            output_path = os.path.join(self.directory, "audio.txt")
+            with open(output_path, "w") as f:
+                f.write("Hello.\n")
+            log.append("success", state="SUCCESS", result={"output_path": output_path, "output_filename": "audio.txt"})
+
+        self.run_job = run_job
+        response = self.client.post("/asr", files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "Hello.\n")
+        self.assertEqual(response.headers["content-disposition"], 'attachment; filename="audio.txt"')
+
+    def test_failure(self):
+        self.run_job = lambda log, args: log.append("failure", state="FAILURE", error="Bad audio")
+        response = self.client.post("/asr", files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {"error": "Bad audio"})
+
+    def test_lost_job(self):
+        with mock.patch.object(webservice, "SYNC_JOB_TIMEOUT", 0.2):
+            response = self.client.post("/asr", files={"audio_file": ("audio.wav", b"audio")})
+
+        job_id = self.sent[0][2]["task_id"]
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.headers["job-id"], job_id)
+        self.assertIn(f"/jobs/{job_id}", response.json()["error"])
+
+    def test_lost_streamed_job(self):
+        with mock.patch.object(webservice, "SYNC_JOB_TIMEOUT", 0.2):
+            response = self.client.post("/asr", params={"stream": True, "output": "json"}, files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("did not finish", response.json()["error"])
+
+
+class StreamTest(WebserviceTestCase):
+    def setUp(self):
+        super().setUp()
+
+        def run_job(log, args):
+            os.remove(args[0])
+            log.append("state", state="STARTED")
+            log.append("segment", segment={"id": 1, "start": 0.0, "end": 1.5, "text": " Hello."})
+            log.append("segment", segment={"id": 2, "start": 1.5, "end": 3.0, "text": " Goodbye."})
+            log.append("success", state="SUCCESS", result={})
+
+        self.run_job = run_job
+
+    def test_srt(self):
+        response = self.client.post("/asr", params={"stream": True, "output": "srt"}, files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["job-id"], self.sent[0][2]["task_id"])
+        self.assertEqual(response.text, (
+            "1\n00:00:00,000 --> 00:00:01,500\nHello.\n\n"
+            "2\n00:00:01,500 --> 00:00:03,000\nGoodbye.\n\n"
+        ))
+
+    def test_json(self):
+        response = self.client.post("/asr", params={"stream": True, "output": "json"}, files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line)["text"] for line in response.text.splitlines()], [" Hello.", " Goodbye."])
+
+    def test_failure(self):
+        def run_job(log, args):
+            os.remove(args[0])
+            log.append("failure", state="FAILURE", error="Bad audio")
+
+        self.run_job = run_job
+        response = self.client.post("/asr", params={"stream": True, "output": "json"}, files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"error": "Bad audio"})
+
+
+class AdmissionTest(WebserviceTestCase):
+    def setUp(self):
+        super().setUp()
+        # No free worker slots, so jobs stay queued in the webservice
+        patcher = mock.patch.object(webservice, "scheduler", JobScheduler(lambda: (0, 1), max_client_queued=1))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, client: str):
+        return self.client.post(
+            "/asr", params={"use_async": True}, headers={"X-ReaSpeech-Client": client},
+            files={"audio_file": ("audio.wav", b"audio")})
+
+    def test_rejects_client_over_limit(self):
+        first = self.post("client-1")
+        self.assertEqual(first.status_code, 200)
+        self.addCleanup(self.client.delete, f"/jobs/{first.json()['job_id']}")
+
+        response = self.post("client-1")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "10")
+        self.assertIn("client-1", response.json()["error"])
+
+        other = self.post("client-2")
+        self.assertEqual(other.status_code, 200)
+        self.addCleanup(self.client.delete, f"/jobs/{other.json()['job_id']}")
+        self.assertEqual(self.sent, [])
+
+
+class BatchTest(WebserviceTestCase):
+    def test_batch(self):
+        media_hash = self.client.post("/media", files={"audio_file": ("stored.wav", b"stored")}).json()["media_hash"]
+
+        response = self.client.post(
+            "/asr_batch", params={"media_hashes": [media_hash], "output": "srt", "deduplicate": True},
+            files=[("audio_files", ("first.wav", b"first")), ("audio_files", ("second.wav", b"second"))])
+
+        self.assertEqual(response.status_code, 200)
+        media_hashes = [hashlib.sha256(data).hexdigest() for data in (b"first", b"second", b"stored")]
+        self.assertEqual(response.json()["media_hashes"], media_hashes)
+
+        self.wait_for_sent(1)
+        task_name, (items, asr_options, deduplicate), options = self.sent[0]
+        self.assertEqual(task_name, "transcribe_batch")
+        self.assertEqual(options["task_id"], response.json()["job_id"])
+        self.assertEqual([(filename, item_hash) for _, filename, item_hash in items], [
+            ("first.wav", media_hashes[0]), ("second.wav", media_hashes[1]), (media_hash, media_hash)])
+        with open(items[2][0], "rb") as f:
+            self.assertEqual(f.read(), b"stored")
+        self.assertEqual(asr_options["output"], "srt")
+        self.assertTrue(deduplicate)
+
+    def test_no_files(self):
+        response = self.client.post("/asr_batch")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.sent, [])
+
+    def test_too_many_files(self):
+        with mock.patch.object(webservice, "MAX_BATCH_FILES", 1):
+            response = self.client.post(
+                "/asr_batch", files=[("audio_files", ("first.wav", b"first")), ("audio_files", ("second.wav", b"second"))])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Too many files: 2, the limit is 1"})
+
+    def test_unknown_media_hash(self):
+        response = self.client.post(
+            "/asr_batch", params={"media_hashes": [hashlib.sha256(b"other").hexdigest()]},
+            files={"audio_files": ("first.wav", b"first")})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.sent, [])
+        # The first file's job link was removed
+        self.assertEqual([name for name in os.listdir(self.media_store.directory) if name.startswith("job-")], [])
+
+
+class DetectLanguageTest(WebserviceTestCase):
+    def test_top_k(self):
+        response = self.client.post(
+            "/detect_language", params={"top_k": 3, "model_name": "small"}, files={"audio_file": ("audio.wav", b"audio")})
+
+        self.assertEqual(response.status_code, 200)
+        self.wait_for_sent(1)
+        task_name, args, options = self.sent[0]
+        self.assertEqual(task_name, "detect_language")
+        self.assertEqual(options["task_id"], response.json()["job_id"])
+        self.assertEqual(args[1:], [True, "small", 3])
+
+    def test_invalid_top_k(self):
+        for top_k in (0, len(webservice.LANGUAGE_CODES) + 1):
+            response = self.client.post("/detect_language", params={"top_k": top_k}, files={"audio_file": ("audio.wav", b"audio")})
+            self.assertEqual(response.status_code, 422)
+
+        self.assertEqual(self.sent, [])
+
+
+class ProfileTest(WebserviceTestCase):
+    def post(self, **headers):
+        return self.client.post(
+            "/detect_language", params={"profile": True}, headers=headers, files={"audio_file": ("audio.wav", b"audio")})
+
+    def test_needs_admin_token(self):
+        self.assertEqual(self.post().status_code, 403)
+        with mock.patch.object(webservice, "ADMIN_TOKEN", "secret"):
+            self.assertEqual(self.post(**{"X-ReaSpeech-Admin-Token": "wrong"}).status_code, 403)
+        self.assertEqual(self.sent, [])
+
+    def test_profiles_job(self):
+        with mock.patch.object(webservice, "ADMIN_TOKEN", "secret"):
+            response = self.post(**{"X-ReaSpeech-Admin-Token": "secret"})
+
+        self.assertEqual(response.status_code, 200)
+        self.wait_for_sent(1)
+        self.assertTrue(self.sent[0][2]["headers"]["profile"])
+
+
+class DispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.workers = [
+            {"name": "node-1", "engine": webservice.ASR_ENGINE, "queue": "node.node-1", "models": ["small"], "active": 0, "capacity": 1},
+            {"name": "node-2", "engine": webservice.ASR_ENGINE, "queue": "node.node-2", "models": [], "active": 0, "capacity": 1},
+        ]
+        self.job_ids = iter(range(100))
+        for name, value in {
+            "read_workers": lambda: self.workers,
+            "dispatched": {},
+        }.items():
+            patcher = mock.patch.object(webservice, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(webservice.celery, "send_task", side_effect=self.send_task)
+        self.send_task = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send_task(self, task_name: str, **options):
+        return mock.Mock(id=f"job-{next(self.job_ids)}")
+
+    def sent_queues(self) -> list:
+        return [call.kwargs.get("queue") for call in self.send_task.call_args_list]
+
+    def test_counts_jobs_until_started(self):
+        webservice.send_job("transcribe", [], "small")
+        webservice.send_job("transcribe", [], "small")
+        self.assertEqual(webservice.worker_loads()[1], {"node-1": 1, "node-2": 1})
+        self.assertEqual(webservice.worker_slots(), (0, 2))
+
+        self.workers[0] = dict(self.workers[0], active=1, started=["job-0"])
+        self.assertEqual(webservice.worker_loads()[1], {"node-1": 0, "node-2": 1})
+        self.assertEqual(self.sent_queues(), ["node.node-1", "node.node-2"])
+
+    def test_expires_unstarted_jobs(self):
+        webservice.send_job("transcribe", [], "small")
+        with mock.patch.object(webservice.time, "time", return_value=time.time() + webservice.DISPATCH_TIMEOUT + 1):
+            self.assertEqual(webservice.worker_loads()[1], {"node-1": 0, "node-2": 0})
+
+    def test_forgets_missing_workers(self):
+        webservice.send_job("transcribe", [], "small")
+        self.workers.pop(0)
+
+        self.assertEqual(webservice.worker_loads()[1], {"node-2": 0})
+        self.assertNotIn("node-1", webservice.dispatched)
+
+    def test_shared_queue_without_workers(self):
+        self.workers.clear()
+        webservice.send_job("transcribe", [], "small")
+
+        self.assertEqual(self.sent_queues(), [None])
+        self.assertIsNone(webservice.worker_slots())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+from unittest import mock
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from app.util import worker_state
+from app.util.worker_state import Heartbeat, choose_worker, read_workers
+
+
+def worker(name: str, models=(), active: int = 0, capacity: int = 2) -> dict:
+    return {"name": name, "models": list(models), "active": active, "capacity": capacity}
+
+
+class ChooseWorkerTest(unittest.TestCase):
+    def test_no_workers(self):
+        self.assertIsNone(choose_worker([], "small"))
+
+    def test_prefers_warm_worker(self):
+        workers = [worker("cold"), worker("warm", ["small"], active=1)]
+        self.assertEqual(choose_worker(workers, "small")["name"], "warm")
+
+    def test_least_loaded_warm_worker(self):
+        workers = [worker("busy", ["small"], active=1), worker("idle", ["small"])]
+        self.assertEqual(choose_worker(workers, "small")["name"], "idle")
+
+    def test_full_warm_worker(self):
+        workers = [worker("full", ["small"], active=2), worker("cold", active=1)]
+        self.assertEqual(choose_worker(workers, "small")["name"], "cold")
+
+    def test_everything_full(self):
+        workers = [worker("cold", active=2), worker("warm", ["small"], active=2)]
+        self.assertEqual(choose_worker(workers, "small")["name"], "warm")
+
+    def test_counts_pending_jobs(self):
+        workers = [worker("first", ["small"]), worker("second", ["small"], active=1)]
+        self.assertEqual(choose_worker(workers, "small", {"first": 2})["name"], "second")
+
+
+class HeartbeatTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(worker_state, "STATE_DIRECTORY", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_workers(self, condition) -> list:
+        deadline = time.monotonic() + 5
+        while not condition(workers := read_workers()):
+            if time.monotonic() > deadline:
+                self.fail(f"Unexpected workers: {workers}")
+            time.sleep(0.01)
+        return workers
+
+    def test_publishes_state(self):
+        state = {"active": 0}
+        heartbeat = Heartbeat("node-1", lambda: dict(state))
+        heartbeat.start()
+        self.addCleanup(heartbeat.stop)
+
+        workers = self.wait_for_workers(lambda workers: len(workers) == 1)
+        self.assertEqual(workers[0]["name"], "node-1")
+        self.assertEqual(workers[0]["active"], 0)
+
+        state["active"] = 1
+        heartbeat.beat()
+        self.wait_for_workers(lambda workers: workers and workers[0]["active"] == 1)
+
+    def test_stop_removes_state(self):
+        heartbeat = Heartbeat("node-1", lambda: {})
+        heartbeat.start()
+        self.wait_for_workers(lambda workers: len(workers) == 1)
+
+        heartbeat.stop()
+        self.assertEqual(read_workers(), [])
+
+    def test_ignores_silent_workers(self):
+        worker_state.write_state("node-1", {})
+        path = worker_state.state_path("node-2")
+        with open(path, "w") as f:
+            json.dump({"name": "node-2", "time": time.time() - worker_state.HEARTBEAT_TIMEOUT - 1}, f)
+        with open(worker_state.state_path("node-3"), "w") as f:
+            f.write('{"name": ')
+
+        self.assertEqual([worker["name"] for worker in read_workers()], ["node-1"])
+
+    def test_no_state_directory(self):
+        with mock.patch.object(worker_state, "STATE_DIRECTORY", os.path.join(worker_state.STATE_DIRECTORY, "missing")):
+            self.assertEqual(read_workers(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()